@@ -4,11 +4,41 @@ import PyPDF2
 from langchain import LLMChain
 from langchain.prompts import PromptTemplate
 from langchain_groq import ChatGroq
-from langchain.memory import ConversationBufferMemory
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
-from typing import Dict, List, Optional
+import logging
+import queue
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from history_view import HistoryRenderCache, TURN_SEPARATOR
+from assessment_pipeline import SECTIONS, run_assessment
+from cancellation import CancellationScope
+from consultation_index import ConsultationIndex
+from case_retrieval import CaseIndex, case_text, similar_cases_context
+from cassette import Cassette, RecordingChatModel, ReplayChatModel
+from hedging import HedgedRunner
+from lab_history import LabHistoryStore
+from lab_parsing import parse_lab_values
+from model_router import FinishReasonRecorder, ModelRouter, estimate_tokens
+from llm_transport import get_async_http_client, get_http_client, pool_stats, prewarm
+from preflight import preflight
+from profiling import profiled, requested_mode
+from report_cleaning import clean_pages
+from report_ingest import ingest_reports
+from report_revisions import extract_pages, lab_value_changes
+from upload_spool import open_mapped, purge, spill
+from session_manager import SessionManager
+from session_store import InProcessSessionStore, RedisSessionStore, SessionStore
+from shared_cache import SharedCache
+from speculation import SpeculativeSummary, summary_key
+from structured_output import (
+    ASSESSMENT_SCHEMA_PROMPT, IncrementalJSONHandler, parse_assessment, render_assessment, validate_assessment
+)
+from triage import CONSCIOUSNESS_LEVELS, VITAL_COLUMNS, VITAL_RANGES, assess, emergency_assessment, normalize_vitals
 
 # Page configuration
 st.set_page_config(
@@ -146,12 +176,36 @@ load_dotenv()
 TEMPERATURE = 0.7
 MAX_TOKENS = 1000
 CONVERSATION_TIMEOUT = 30  # minutes
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com")
+LLM_PREWARM_CONNECTIONS = int(os.getenv("LLM_PREWARM_CONNECTIONS", "2"))
+FALLBACK_MODEL = os.getenv("FALLBACK_MODEL", "llama-3.1-8b-instant")  # backup for hedged requests
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL")  # set to hedge against a local Ollama model instead
+LLM_HEDGING = os.getenv("LLM_HEDGING", "0") == "1"  # opt-in: a hedge may double the tokens of a slow call
+STRUCTURED_ASSESSMENT = os.getenv("STRUCTURED_ASSESSMENT", "0") == "1"  # JSON assessments with a fixed schema
+ASSESSMENT_FAN_OUT = os.getenv("ASSESSMENT_FAN_OUT", "0") == "1"  # one concurrent prompt per assessment section
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_MB", "20")) * 1024 * 1024
+SESSIONS_MAX_TOTAL_BYTES = int(os.getenv("SESSIONS_MAX_TOTAL_MB", "1024")) * 1024 * 1024
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR")  # unset: evicted sessions are dropped, not spilled
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL")  # e.g. redis://host:6379/0; unset keeps consultations in-process
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", ".cache/shared_cache.sqlite")  # one file per host, shared by all workers
+SHARED_CACHE_MAX_BYTES = int(os.getenv("SHARED_CACHE_MAX_MB", "512")) * 1024 * 1024
+# Extracted report and page text and generated summaries hold PHI: shared-cache entries expire after this.
+PHI_CACHE_TTL = float(os.getenv("PHI_CACHE_TTL_S", "3600"))
+LLM_CASSETTE = os.getenv("LLM_CASSETTE")  # e.g. cassettes/session.jsonl.gz; unset disables record/replay
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "record")  # "record" live calls or "replay" them offline
+LLM_CASSETTE_LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "recorded")  # replay pacing: "recorded" or "zero"
+LLM_CASSETTE_STRICT = os.getenv("LLM_CASSETTE_STRICT", "1") == "1"  # "0" replays a stand-in for unrecorded prompts
+# Skip the LLM for rule-detected emergencies: "vitals" (NEWS2 and critical vitals only), "all" (also
+# critical lab values parsed from reports) or "off".
+TRIAGE_SHORT_CIRCUIT = os.getenv("TRIAGE_SHORT_CIRCUIT", "vitals").lower()
+TRIAGE_SHORT_CIRCUIT = {"1": "all", "0": "off"}.get(TRIAGE_SHORT_CIRCUIT, TRIAGE_SHORT_CIRCUIT)
 
 # Initialize session state variables
 if "history" not in st.session_state:
     st.session_state.history = ""
 if "patient_data" not in st.session_state:
     st.session_state.patient_data = {
+        "patient_id": None,
         "age": None,
         "gender": None,
         "medical_history": [],
@@ -162,26 +216,162 @@ if "patient_data" not in st.session_state:
     }
 if "consultation_summary" not in st.session_state:
     st.session_state.consultation_summary = None
+if "profile_inputs" not in st.session_state:
+    st.session_state.profile_inputs = {}
+if "spooled_reports" not in st.session_state:
+    st.session_state.spooled_reports = []
+if "uploader_generation" not in st.session_state:
+    st.session_state.uploader_generation = 0
+if "report_versions" not in st.session_state:
+    st.session_state.report_versions = {}
+if "report_changes" not in st.session_state:
+    st.session_state.report_changes = "None"
+if "profile_commits" not in st.session_state:
+    st.session_state.profile_commits = 0
+if "rerun_count" not in st.session_state:
+    st.session_state.rerun_count = 0
+if "trimmed_turns" not in st.session_state:
+    st.session_state.trimmed_turns = 0
+if "history_render_cache" not in st.session_state:
+    st.session_state.history_render_cache = HistoryRenderCache()
+if "llm_cancellation" not in st.session_state:
+    st.session_state.llm_cancellation = CancellationScope()
+if "last_assessment" not in st.session_state:
+    st.session_state.last_assessment = None
+if "summary_speculator" not in st.session_state:
+    st.session_state.summary_speculator = SpeculativeSummary()
 
 class MedicalAssistant:
-    def __init__(self, api_key: str):
-        self.llm = ChatGroq(
-            groq_api_key=api_key,
-            model_name="llama-3.2-1b-preview",
-            temperature=TEMPERATURE,
-            max_tokens=MAX_TOKENS
-        )
-        self.memory = ConversationBufferMemory(memory_key="chat_history")
+    def __init__(
+        self,
+        api_key: str,
+        router: Optional[ModelRouter] = None,
+        hedger: Optional[HedgedRunner] = None,
+        cassette: Optional[Cassette] = None,
+        profile_calls: bool = False
+    ):
+        self.api_key = api_key
+        self.router = router or ModelRouter()
+        self.hedger = hedger
+        self.cassette = cassette
+        self.profile_calls = profile_calls
+        self.llm = self._create_llm("llama-3.2-1b-preview", TEMPERATURE, MAX_TOKENS)
         
         # Initialize chains with enhanced prompts
         self.diagnosis_chain = self._create_diagnosis_chain()
         self.follow_up_chain = self._create_follow_up_chain()
         self.summary_chain = self._create_summary_chain()
         
-    def _create_diagnosis_chain(self) -> LLMChain:
+        self._chain_factories = {
+            "diagnosis": self._create_diagnosis_chain,
+            "diagnosis_structured": self._create_structured_diagnosis_chain,
+            "diagnosis_section": self._create_diagnosis_section_chain,
+            "follow_up": self._create_follow_up_chain,
+            "summary": self._create_summary_chain
+        }
+        self._routed_chains = {}
+        
+    def _create_llm(self, model_name: str, temperature: float, max_tokens: int, json_mode: bool = False) -> ChatGroq:
+        """Create a ChatGroq backend on the shared HTTP transport."""
+        return self._with_cassette(model_name, lambda: ChatGroq(
+            groq_api_key=self.api_key,
+            model_name=model_name,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            streaming=True,
+            model_kwargs={"response_format": {"type": "json_object"}} if json_mode else {},
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client()
+        ))
+        
+    def _create_fallback_llm(self, temperature: float, max_tokens: int, json_mode: bool = False):
+        """Create the backup backend used for hedged requests: a local Ollama model if configured, else FALLBACK_MODEL."""
+        if OLLAMA_MODEL:
+            from langchain_community.chat_models import ChatOllama
+            return self._with_cassette(OLLAMA_MODEL, lambda: ChatOllama(
+                model=OLLAMA_MODEL,
+                temperature=temperature,
+                num_predict=max_tokens,
+                format="json" if json_mode else None
+            ))
+        return self._create_llm(FALLBACK_MODEL, temperature, max_tokens, json_mode)
+        
+    def _with_cassette(self, model_name: str, create):
+        """Record calls to the backend `create()` builds, or replay them instead, when a cassette is configured."""
+        if self.cassette is None:
+            return create()
+        if LLM_CASSETTE_MODE == "replay":
+            return ReplayChatModel(
+                cassette=self.cassette, model_name=model_name, latency=LLM_CASSETTE_LATENCY, strict=LLM_CASSETTE_STRICT
+            )
+        return RecordingChatModel(inner=create(), cassette=self.cassette, model_name=model_name)
+        
+    def _routed_chain(self, chain_type: str, decision: Dict, fallback: bool = False) -> LLMChain:
+        key = (chain_type, fallback, decision["model"], decision["temperature"], decision["max_tokens"])
+        chain = self._routed_chains.get(key)
+        if chain is None:
+            if fallback:
+                llm = self._create_fallback_llm(decision["temperature"], decision["max_tokens"], decision["json_mode"])
+            else:
+                llm = self._create_llm(
+                    decision["model"], decision["temperature"], decision["max_tokens"], decision["json_mode"]
+                )
+            chain = self._routed_chains[key] = self._chain_factories[chain_type](llm)
+        return chain
+        
+    def run(self, chain_type: str, callbacks: Optional[List] = None, **inputs) -> str:
+        """Run a chain with the model and token budget the router picks for this chain type and input size."""
+        with profiled(f"llm_{chain_type}", self.profile_calls):
+            return self._run(chain_type, callbacks, **inputs)
+        
+    def _run(self, chain_type: str, callbacks: Optional[List], **inputs) -> str:
+        decision = self.router.route(chain_type, sum(len(str(value)) for value in inputs.values()))
+        start = time.perf_counter()
+        response, truncated = self._call(chain_type, decision, callbacks or [], inputs)
+        if truncated:
+            # Cut off at max_tokens: retry once with a larger budget so the answer is complete,
+            # and learn from the retried length rather than the cut-off one.
+            self.router.record(decision, (time.perf_counter() - start) * 1000, estimate_tokens(response), truncated=True)
+            retry = self.router.retry_decision(decision)
+            if retry is not None:
+                logging.getLogger(__name__).info(
+                    "%s hit max_tokens=%d; retrying with %d", chain_type, decision["max_tokens"], retry["max_tokens"]
+                )
+                start = time.perf_counter()
+                response, truncated = self._call(chain_type, retry, callbacks or [], inputs)
+                decision = retry
+            if truncated:
+                logging.getLogger(__name__).warning(
+                    "%s completion truncated at max_tokens=%d", chain_type, decision["max_tokens"]
+                )
+        self.router.record(decision, (time.perf_counter() - start) * 1000, estimate_tokens(response))
+        return response
+        
+    def _call(self, chain_type: str, decision: Dict, callbacks: List, inputs: Dict) -> Tuple[str, bool]:
+        """One routed (and possibly hedged) call; returns the response and whether it hit max_tokens."""
+        chain = self._routed_chain(chain_type, decision)
+        inputs, _ = preflight(chain_type, chain.prompt, inputs, decision["model"], decision["max_tokens"])
+        finish = FinishReasonRecorder()
+        callbacks = callbacks + [finish]
+        # Tells a StreamWatcher this run's budget, even when it watches several concurrent runs.
+        metadata = {"max_tokens": decision["max_tokens"]}
+        
+        if self.hedger is None:
+            response = chain.run(callbacks=callbacks, metadata=metadata, **inputs)
+        else:
+            backup = self._routed_chain(chain_type, decision, fallback=True)
+            response = self.hedger.run(
+                decision["model"],
+                lambda hedge_callbacks: chain.run(callbacks=hedge_callbacks + callbacks, metadata=metadata, **inputs),
+                OLLAMA_MODEL or FALLBACK_MODEL,
+                lambda hedge_callbacks: backup.run(callbacks=hedge_callbacks + callbacks, metadata=metadata, **inputs)
+            )
+        return response, finish.truncated
+        
+    def _create_diagnosis_chain(self, llm: Optional[ChatGroq] = None) -> LLMChain:
         """Create an enhanced diagnostic chain with medical context."""
         prompt = PromptTemplate(
-            input_variables=["symptoms", "history", "lab_report", "patient_data"],
+            input_variables=["symptoms", "history", "lab_report", "lab_trends", "patient_data", "similar_cases"],
             template="""
             Given the following patient information:
             - Age: {patient_data[age]}
@@ -194,6 +384,10 @@ class MedicalAssistant:
             Current Symptoms: {symptoms}
             Previous Conversation: {history}
             Lab Reports: {lab_report}
+            Lab Trends Across Previous Reports:
+            {lab_trends}
+            Similar Past Cases (for reference only; do not assume the same diagnosis):
+            {similar_cases}
             
             Please provide:
             1. Potential diagnoses (primary and differential)
@@ -205,12 +399,88 @@ class MedicalAssistant:
             Remember to maintain a professional tone and emphasize that this is an AI-generated preliminary assessment.
             """
         )
-        return LLMChain(llm=self.llm, prompt=prompt, memory=self.memory)
+        return LLMChain(llm=llm or self.llm, prompt=prompt)
+
+    def _create_diagnosis_section_chain(self, llm: Optional[ChatGroq] = None) -> LLMChain:
+        """Create a chain that generates a single section of the diagnostic assessment."""
+        prompt = PromptTemplate(
+            input_variables=["symptoms", "history", "lab_report", "lab_trends", "patient_data", "similar_cases", "section"],
+            template="""
+            Given the following patient information:
+            - Age: {patient_data[age]}
+            - Gender: {patient_data[gender]}
+            - Medical History: {patient_data[medical_history]}
+            - Current Medications: {patient_data[current_medications]}
+            - Allergies: {patient_data[allergies]}
+            - Vital Signs: {patient_data[vital_signs]}
+            
+            Current Symptoms: {symptoms}
+            Previous Conversation: {history}
+            Lab Reports: {lab_report}
+            Lab Trends Across Previous Reports:
+            {lab_trends}
+            Similar Past Cases (for reference only; do not assume the same diagnosis):
+            {similar_cases}
+            
+            {section}
+            
+            Respond with this part of the assessment only, concisely and in a professional tone, without headings.
+            """
+        )
+        return LLMChain(llm=llm or self.llm, prompt=prompt)
+
+    def assess(self, callbacks: Optional[List] = None, on_section=None, **inputs) -> str:
+        """Generate the diagnostic assessment as concurrent per-section prompts merged into one text."""
+        return run_assessment(
+            lambda section, section_callbacks: self.run(
+                "diagnosis_section",
+                callbacks=section_callbacks,
+                section=section["instruction"],
+                **inputs
+            ),
+            callbacks,
+            on_section
+        )
 
-    def _create_follow_up_chain(self) -> LLMChain:
+    def _create_structured_diagnosis_chain(self, llm: Optional[ChatGroq] = None) -> LLMChain:
+        """Create a diagnostic chain that answers with a JSON object matching ASSESSMENT_SCHEMA_PROMPT."""
+        prompt = PromptTemplate(
+            input_variables=["symptoms", "history", "lab_report", "lab_trends", "patient_data", "similar_cases"],
+            partial_variables={"schema": ASSESSMENT_SCHEMA_PROMPT},
+            template="""
+            Given the following patient information:
+            - Age: {patient_data[age]}
+            - Gender: {patient_data[gender]}
+            - Medical History: {patient_data[medical_history]}
+            - Current Medications: {patient_data[current_medications]}
+            - Allergies: {patient_data[allergies]}
+            - Vital Signs: {patient_data[vital_signs]}
+            
+            Current Symptoms: {symptoms}
+            Previous Conversation: {history}
+            Lab Reports: {lab_report}
+            Lab Trends Across Previous Reports:
+            {lab_trends}
+            Similar Past Cases (for reference only; do not assume the same diagnosis):
+            {similar_cases}
+            
+            Provide a preliminary diagnostic assessment.
+            {schema}
+            """
+        )
+        return LLMChain(llm=llm or self.llm, prompt=prompt)
+
+    def assess_structured(self, callbacks: Optional[List] = None, on_partial=None, **inputs) -> tuple[Dict, List[str]]:
+        """Generate a schema-validated assessment, reporting the partially parsed JSON while it streams."""
+        callbacks = list(callbacks or [])
+        if on_partial:
+            callbacks.append(IncrementalJSONHandler(on_partial))
+        return parse_assessment(self.run("diagnosis_structured", callbacks=callbacks, **inputs))
+
+    def _create_follow_up_chain(self, llm: Optional[ChatGroq] = None) -> LLMChain:
         """Create an enhanced follow-up chain with context awareness."""
         prompt = PromptTemplate(
-            input_variables=["follow_up", "history", "patient_data"],
+            input_variables=["follow_up", "history", "patient_data", "report_changes"],
             template="""
             Based on the patient profile:
             {patient_data}
@@ -218,6 +488,9 @@ class MedicalAssistant:
             Previous conversation:
             {history}
             
+            Changes in the latest revised lab report:
+            {report_changes}
+            
             Follow-up question:
             {follow_up}
             
@@ -228,9 +501,9 @@ class MedicalAssistant:
             4. Maintains medical accuracy and appropriate disclaimers
             """
         )
-        return LLMChain(llm=self.llm, prompt=prompt, memory=self.memory)
+        return LLMChain(llm=llm or self.llm, prompt=prompt)
 
-    def _create_summary_chain(self) -> LLMChain:
+    def _create_summary_chain(self, llm: Optional[ChatGroq] = None) -> LLMChain:
         """Create a chain for generating consultation summaries."""
         prompt = PromptTemplate(
             input_variables=["history", "patient_data"],
@@ -253,9 +526,320 @@ class MedicalAssistant:
             Format the summary in a professional medical notation style.
             """
         )
-        return LLMChain(llm=self.llm, prompt=prompt)
+        return LLMChain(llm=llm or self.llm, prompt=prompt)
+
+def trim_history(state, excess_bytes: int):
+    """Drop the oldest conversation turns until roughly `excess_bytes` have been freed.
+
+    The number of dropped turns is kept in `trimmed_turns` so the history panel can tell the user.
+    """
+    history = state["history"] if "history" in state else ""
+    freed = trimmed = 0
+    while freed < excess_bytes and TURN_SEPARATOR in history:
+        oldest, _, history = history.partition(TURN_SEPARATOR)
+        history = "User: " + history
+        freed += len(oldest.encode("utf-8"))
+        trimmed += 1
+    state["history"] = history
+    state["trimmed_turns"] = (state["trimmed_turns"] if "trimmed_turns" in state else 0) + trimmed
+
+@st.cache_resource
+def init_llm_transport():
+    """Open keep-alive connections to the LLM provider once per process."""
+    prewarm(GROQ_BASE_URL, LLM_PREWARM_CONNECTIONS)
+    return get_http_client()
+
+@st.cache_resource
+def get_cassette() -> Optional[Cassette]:
+    """Process-wide record/replay cassette, loaded once from LLM_CASSETTE."""
+    return Cassette(LLM_CASSETTE) if LLM_CASSETTE else None
+
+@st.cache_resource
+def get_consultation_index() -> ConsultationIndex:
+    """Process-wide full-text index over saved consultations."""
+    return ConsultationIndex()
+
+@st.cache_resource
+def get_case_index() -> CaseIndex:
+    """Process-wide similar-case index over saved consultations."""
+    return CaseIndex()
+
+@st.cache_resource
+def get_lab_history_store() -> LabHistoryStore:
+    """Process-wide per-patient lab time-series store."""
+    return LabHistoryStore()
+
+def record_lab_reports(patient_id: Optional[str], documents: List[Dict], uploads: List[Dict]) -> str:
+    """Add each report's values to the lab history of the patient it was uploaded for; returns the trend digest for prompts.
+
+    A report belongs to the patient ID set when it was uploaded (or, if none was set yet, the first
+    one entered afterwards) and is recorded once, so editing the ID later never files it under
+    another patient.
+    """
+    try:
+        store = get_lab_history_store()
+        by_hash = {upload["sha256"]: upload for upload in uploads}
+        for document in documents:
+            upload = by_hash.get(document["sha256"])
+            if upload is None or upload.get("lab_history_recorded"):
+                continue
+            upload["patient_id"] = upload.get("patient_id") or patient_id
+            if upload["patient_id"]:
+                store.record_report(upload["patient_id"], document["text"], document["sha256"])
+                upload["lab_history_recorded"] = True
+        if not patient_id:
+            return "Not available (no patient ID)"
+        return store.load(patient_id).digest()
+    except Exception as e:
+        logging.getLogger(__name__).warning("Lab history update failed: %s", e)
+        return "Not available"
+
+def find_similar_cases(symptoms: str, patient_data: Dict, k: int = 3) -> str:
+    """Compact context of the k past consultations most similar to this presentation."""
+    try:
+        return similar_cases_context(get_case_index().search(case_text(patient_data, symptoms), k=k, min_score=0.2))
+    except Exception as e:
+        logging.getLogger(__name__).warning("Similar-case retrieval failed: %s", e)
+        return "None found"
+
+@st.cache_resource
+def get_model_router() -> ModelRouter:
+    """Process-wide router, so learned budgets and latency stats outlive individual reruns."""
+    return ModelRouter()
+
+@st.cache_resource
+def get_hedged_runner() -> Optional[HedgedRunner]:
+    """Process-wide hedging state: first-token latency history and per-backend circuit breakers."""
+    return HedgedRunner() if LLM_HEDGING else None
+
+@st.cache_resource
+def get_session_manager() -> SessionManager:
+    """Process-wide session manager enforcing CONVERSATION_TIMEOUT and the memory ceilings."""
+    manager = SessionManager(
+        tracked_keys=(
+            "history", "patient_data", "consultation_summary", "profile_inputs", "last_assessment",
+            "history_render_cache", "summary_speculator", "llm_cancellation"
+        ),
+        spill_keys=("history", "patient_data", "consultation_summary", "profile_inputs", "last_assessment"),
+        measured_keys=(
+            "history", "patient_data", "consultation_summary", "profile_inputs", "last_assessment",
+            "history_render_cache"
+        ),
+        idle_timeout=CONVERSATION_TIMEOUT * 60,
+        max_session_bytes=SESSION_MAX_BYTES,
+        max_total_bytes=SESSIONS_MAX_TOTAL_BYTES,
+        spill_dir=SESSION_SPILL_DIR,
+        trim_session=trim_history
+    )
+    manager.start_sweeper()
+    return manager
+
+@st.cache_resource
+def get_shared_cache() -> SharedCache:
+    """Cache shared by every worker process on this host: extracted PDF text and generated summaries."""
+    return SharedCache(SHARED_CACHE_PATH, max_bytes=SHARED_CACHE_MAX_BYTES)
+
+@st.cache_resource
+def get_session_store() -> SessionStore:
+    """Where consultations live between runs; a networked store lets any worker serve any request."""
+    if SESSION_STORE_URL:
+        return RedisSessionStore(SESSION_STORE_URL, ttl=CONVERSATION_TIMEOUT * 60)
+    return InProcessSessionStore(ttl=CONVERSATION_TIMEOUT * 60)
+
+def consultation_id() -> str:
+    """The consultation's id, carried in the URL so it survives reconnecting to a different worker."""
+    consultation = st.query_params.get("consultation")
+    if not consultation:
+        consultation = uuid.uuid4().hex
+        st.query_params["consultation"] = consultation
+    return consultation
+
+def profile_mode() -> Optional[str]:
+    """Profiling for this request: PROFILE_REQUESTS=run (or 1) for the whole rerun, =llm per LLM call.
+
+    The same values in `?profile=` apply only where an operator set PROFILE_ALLOW_QUERY=1.
+    """
+    return requested_mode(st.query_params.get("profile"))
+
+@contextmanager
+def persisted_session():
+    """Load the consultation from the session store for this run and write back whatever changed."""
+    store = get_session_store()
+    consultation = consultation_id()
+    store.restore(consultation, st.session_state)
+    base = store.synced(consultation)
+    try:
+        yield
+    finally:
+        store.save(consultation, st.session_state, base)
+
+def update_history(history: str, user_input: str, model_response: str) -> str:
+    """Format and append messages to chat history."""
+    if not history:
+        return f"User: {user_input}\nBot: {model_response}"
+    return f"{history}\n\nUser: {user_input}\nBot: {model_response}"
+
+def read_pdf_text(pdf_file) -> Dict:
+    """Extract the text of each page and strip boilerplate repeated across pages.
+    
+    Pages are cached by content fingerprint, so a revised report only extracts the pages that changed.
+    """
+    cache = get_shared_cache()
+    pages, fingerprints, reused = extract_pages(
+        PyPDF2.PdfReader(pdf_file),
+        lambda fingerprint: cache.get("page_text", fingerprint),
+        lambda fingerprint, text: cache.set("page_text", fingerprint, text, ttl=PHI_CACHE_TTL)
+    )
+    text, cleaning = clean_pages(pages)
+    return {"text": text, "cleaning": cleaning, "fingerprints": fingerprints, "reused_pages": reused}
+
+def extract_report_text(upload: Dict) -> Dict:
+    """Extract and clean a spilled PDF through a memory map, reusing text any worker already extracted from the same file."""
+    def read() -> Dict:
+        with open_mapped(upload["path"]) as mapped:
+            return read_pdf_text(mapped)
+    
+    return get_shared_cache().get_or_compute("report", upload["sha256"], read, ttl=PHI_CACHE_TTL)
+
+def spill_uploads(uploaded_files: List):
+    """Move new uploads to the on-disk spool and reset the uploader so Streamlit drops its in-memory copies."""
+    purge()
+    for uploaded_file in uploaded_files:
+        st.session_state.spooled_reports.append({
+            "name": uploaded_file.name,
+            "patient_id": st.session_state.patient_data.get("patient_id"),
+            **spill(uploaded_file)
+        })
+    st.session_state.uploader_generation += 1
+    st.rerun()
+
+def track_report_revisions(documents: List[Dict]) -> Optional[str]:
+    """Remember each report's lab values; describe lab changes the first time a report supersedes an earlier upload."""
+    versions = st.session_state.report_versions
+    notice = None
+    for document in documents:
+        if document["sha256"] in versions:
+            continue
+        labs = parse_lab_values(document["text"])
+        superseded = document.get("supersedes")
+        if superseded is not None:
+            before = versions.get(superseded["sha256"], {}).get("labs")
+            if before is None:
+                before = parse_lab_values(superseded["text"])
+            changes = lab_value_changes(before, labs)
+            notice = f"{document['name']} revises {superseded['name']}: " + (
+                "changed lab values:\n" + "\n".join(changes) if changes else "no lab values changed"
+            )
+            st.session_state.report_changes = notice
+        versions[document["sha256"]] = {"name": document["name"], "labs": labs}
+    return notice
+
+def extract_pdf_contents(uploads: List[Dict]) -> Dict:
+    """Extract all spilled reports into one deduplicated lab context, with a status line per file."""
+    statuses = [st.empty() for _ in uploads]
+    for status, upload in zip(statuses, uploads):
+        status.caption(f"⏳ {upload['name']}…")
+    
+    def show_file(index: int, document: Dict):
+        if document["status"] == "extracted":
+            reused = document.get("reused_pages")
+            unchanged = f" · {reused}/{len(document['fingerprints'])} pages unchanged" if reused else ""
+            statuses[index].caption(f"✅ {document['name']}{unchanged}")
+        elif document["status"] in ("duplicate", "overlap"):
+            statuses[index].caption(f"♻️ {document['name']}: same content as {document['duplicate_of']}, skipped")
+        elif document["status"] == "superseded":
+            statuses[index].caption(f"📝 {document['name']}: superseded by revised {document['duplicate_of']}")
+        else:
+            statuses[index].error(f"Error reading {document['name']}: {document['error']}")
+    
+    return ingest_reports(
+        [(upload["name"], upload["sha256"], upload) for upload in uploads],
+        extract_report_text,
+        show_file
+    )
+
+def run_llm(medical_assistant: MedicalAssistant, chain_type: str, **inputs) -> str:
+    """Run a chain so that a rerun triggered while it is in flight aborts the upstream call."""
+    heartbeat = st.empty()
+    return st.session_state.llm_cancellation.run(
+        lambda callbacks: medical_assistant.run(chain_type, callbacks=callbacks, **inputs),
+        heartbeat.empty
+    )
+
+def run_assessment_panels(medical_assistant: MedicalAssistant, **inputs) -> str:
+    """Run the fanned-out assessment, filling one panel per section as each completes."""
+    status = st.empty()
+    panels = {section["key"]: st.empty() for section in SECTIONS}
+    for section in SECTIONS:
+        panels[section["key"]].caption(f"⏳ {section['title']}…")
+    completed = queue.Queue()
+    done = []
+    started = time.perf_counter()
+    
+    def show_completed():
+        while not completed.empty():
+            section, text = completed.get_nowait()
+            done.append(section["key"])
+            panels[section["key"]].markdown(f"**{section['title']}**\n\n{text}")
+        # Written on every tick: the heartbeat's UI update is what lets a rerun interrupt the wait.
+        status.caption(f"{len(done)}/{len(SECTIONS)} sections · {time.perf_counter() - started:.0f} s")
+    
+    assessment = st.session_state.llm_cancellation.run(
+        lambda callbacks: medical_assistant.assess(
+            callbacks=callbacks,
+            on_section=lambda section, text: completed.put((section, text)),
+            **inputs
+        ),
+        show_completed
+    )
+    show_completed()
+    status.empty()
+    return assessment
+
+def run_structured_assessment(medical_assistant: MedicalAssistant, **inputs) -> str:
+    """Run the JSON assessment, showing severity and diagnoses as soon as they are parsed from the stream."""
+    preview = st.empty()
+    partials = queue.Queue()
+    
+    def show_partial():
+        latest = None
+        while not partials.empty():
+            latest = partials.get_nowait()
+        if latest is not None:
+            assessment, _ = validate_assessment(latest)
+            names = ", ".join(d["name"] for d in assessment["diagnoses"]) or "…"
+            preview.info(f"Severity: **{assessment['severity'] or '…'}** · Diagnoses: {names}")
+    
+    assessment, repairs = st.session_state.llm_cancellation.run(
+        lambda callbacks: medical_assistant.assess_structured(
+            callbacks=callbacks,
+            on_partial=partials.put,
+            **inputs
+        ),
+        show_partial
+    )
+    st.session_state.last_assessment = assessment
+    if repairs:
+        logging.getLogger(__name__).info("Repaired structured assessment: %s", "; ".join(repairs))
+    return render_assessment(assessment)
+
+def speculate_summary(medical_assistant: MedicalAssistant):
+    """Start generating the consultation summary while the clinician reads the latest turn."""
+    history = st.session_state.history
+    patient_data = json.loads(json.dumps(st.session_state.patient_data, default=str))
+    key = summary_key(history, patient_data)
+    st.session_state.summary_speculator.start(
+        key,
+        lambda callbacks: get_shared_cache().get_or_compute(
+            "summary",
+            key,
+            lambda: medical_assistant.run("summary", callbacks=callbacks, history=history, patient_data=patient_data),
+            ttl=PHI_CACHE_TTL,
+            cancelled=callbacks[0].cancelled.is_set
+        )
+    )
 
-def save_consultation_summary(summary: str, patient_data: Dict):
+def save_consultation_summary(summary: str, patient_data: Dict, assessment: Optional[Dict] = None):
     """Save consultation summary and patient data to a file."""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     summary_data = {
@@ -263,74 +847,211 @@ def save_consultation_summary(summary: str, patient_data: Dict):
         "patient_data": patient_data,
         "consultation_summary": summary
     }
+    if assessment:
+        summary_data["assessment"] = assessment  # structured severity/diagnoses, for the analytics export
     
     filename = f"consultation_{timestamp}.json"
     with open(filename, "w") as f:
         json.dump(summary_data, f, indent=4)
     
+    try:
+        get_consultation_index().add(filename, summary_data)
+        get_case_index().add_consultation(filename, summary_data)
+    except Exception as e:
+        logging.getLogger(__name__).warning("Could not index %s: %s", filename, e)
+    
     return filename
 
 def validate_vital_signs(vitals: Dict) -> tuple[bool, str]:
     """Validate vital signs are within reasonable ranges."""
-    ranges = {
-        "temperature": (35.0, 42.0),  # °C
-        "heart_rate": (40, 200),      # bpm
-        "blood_pressure_systolic": (70, 200),  # mmHg
-        "blood_pressure_diastolic": (40, 130), # mmHg
-        "oxygen_saturation": (70, 100),        # %
-        "respiratory_rate": (8, 40)            # breaths per minute
-    }
-    
-    for vital, (min_val, max_val) in ranges.items():
+    for vital, (min_val, max_val) in VITAL_RANGES.items():
         if vital in vitals:
             if not min_val <= float(vitals[vital]) <= max_val:
                 return False, f"{vital} is outside normal range"
     
     return True, "All vital signs within acceptable ranges"
 
-def main():
-    # Initialize medical assistant
-    medical_assistant = MedicalAssistant(os.getenv("GROQ_API_KEY"))
+def should_short_circuit(triage: Dict) -> bool:
+    """Whether the rule-based result replaces the LLM assessment under TRIAGE_SHORT_CIRCUIT."""
+    if TRIAGE_SHORT_CIRCUIT == "all":
+        return triage["emergency"]
+    if TRIAGE_SHORT_CIRCUIT == "vitals":
+        return triage["vital_emergency"]
+    return False
+
+def render_triage_banner(triage: Dict):
+    """Show the instant rule-based triage result ahead of any LLM call."""
+    headline = f"NEWS2 {triage['news2']} · {triage['risk']} clinical risk"
+    if triage["news2_partial"]:
+        headline += f" · partial score ({triage['news2_recorded']}/{len(VITAL_COLUMNS)} parameters recorded)"
+    details = "".join(f"\n- {flag}" for flag in triage["red_flags"])
+    if triage["emergency"]:
+        st.error(f"🚨 **Emergency triage** — {headline}{details}")
+    elif triage["red_flags"] or triage["risk"] != "low":
+        st.warning(f"⚠️ **Triage** — {headline}{details}")
+    else:
+        st.success(f"✅ **Triage** — {headline}")
+    st.caption(f"Rule-based triage computed in {triage['elapsed_us']:.0f} µs")
+
+@st.fragment
+def render_history_panel():
+    """Render the conversation from per-turn cached HTML as a single element."""
+    cache = st.session_state.history_render_cache
+    st.markdown(cache.render(st.session_state.history), unsafe_allow_html=True)
+    st.caption(f"{len(cache)} turns rendered in {cache.last_render_ms:.1f} ms")
+
+def render_consultation_search():
+    """Search saved consultations by summary and patient fields."""
+    with st.expander("🔎 Search Consultations"):
+        query = st.text_input("Search summaries", placeholder="e.g. pneumonia")
+        days = st.selectbox(
+            "Saved within",
+            [None, 1, 7, 30, 365],
+            format_func=lambda d: "Any time" if d is None else f"Last {d} days"
+        )
+        if query:
+            since = datetime.now() - timedelta(days=days) if days else None
+            start = time.perf_counter()
+            results = get_consultation_index().search(query, since=since)
+            st.caption(f"{len(results)} results in {(time.perf_counter() - start) * 1000:.1f} ms")
+            for result in results:
+                st.markdown(f"**{result['saved_at']}** · `{result['filename']}`  \n{result['snippet']}")
+
+def split_lines(text: str) -> List[str]:
+    """Split a one-item-per-line text area into a clean list."""
+    return [x.strip() for x in text.split("\n") if x.strip()]
+
+def build_vital_signs(temp, hr, bp_sys, bp_dia, spo2, rr, consciousness=None, oxygen=None) -> Dict:
+    """Build the vital-sign dict from the sidebar inputs, leaving out unrecorded readings."""
+    vitals = {
+        "temperature": temp,
+        "heart_rate": hr,
+        "blood_pressure": f"{bp_sys}/{bp_dia}" if bp_sys is not None and bp_dia is not None else None,
+        "oxygen_saturation": spo2,
+        "respiratory_rate": rr,
+        "consciousness": consciousness or None,
+        "supplemental_oxygen": {"Room air": False, "Supplemental oxygen": True}.get(oxygen),
+    }
+    return {name: value for name, value in vitals.items() if value is not None}
+
+# Derived patient_data fields and how to compute them from the raw form inputs.
+PROFILE_FIELDS = {
+    "patient_id": (("patient_id",), lambda patient_id: patient_id.strip() or None),
+    "age": (("age",), lambda age: age),
+    "gender": (("gender",), lambda gender: gender),
+    "medical_history": (("history_input",), split_lines),
+    "current_medications": (("med_input",), split_lines),
+    "allergies": (("allergies_input",), split_lines),
+    "vital_signs": (("temp", "hr", "bp_sys", "bp_dia", "spo2", "rr", "consciousness", "oxygen"), build_vital_signs),
+}
+
+def render_patient_profile():
+    """Render the patient profile as a form so edits are committed in one batch instead of one rerun each."""
+    st.markdown("## 📋 Patient Profile")
     
-    # Enhanced Sidebar with Patient Profile
-    with st.sidebar:
-        st.markdown("## 📋 Patient Profile")
+    with st.form("patient_profile", border=False):
+        inputs = {}
         
         # Basic Information
-        st.session_state.patient_data["age"] = st.number_input("Age", 0, 120, step=1)
-        st.session_state.patient_data["gender"] = st.selectbox("Gender", ["", "Male", "Female", "Other"])
+        inputs["patient_id"] = st.text_input("Patient ID / MRN", help="Links uploaded lab reports into a trend history")
+        inputs["age"] = st.number_input("Age", 0, 120, step=1)
+        inputs["gender"] = st.selectbox("Gender", ["", "Male", "Female", "Other"])
         
         # Medical History
         with st.expander("🏥 Medical History"):
-            history_input = st.text_area("Enter medical conditions (one per line)")
-            st.session_state.patient_data["medical_history"] = [x.strip() for x in history_input.split("\n") if x.strip()]
+            inputs["history_input"] = st.text_area("Enter medical conditions (one per line)")
         
         # Current Medications
         with st.expander("💊 Current Medications"):
-            med_input = st.text_area("Enter medications (one per line)")
-            st.session_state.patient_data["current_medications"] = [x.strip() for x in med_input.split("\n") if x.strip()]
+            inputs["med_input"] = st.text_area("Enter medications (one per line)")
         
         # Allergies
         with st.expander("⚠️ Allergies"):
-            allergies_input = st.text_area("Enter allergies (one per line)")
-            st.session_state.patient_data["allergies"] = [x.strip() for x in allergies_input.split("\n") if x.strip()]
+            inputs["allergies_input"] = st.text_area("Enter allergies (one per line)")
         
-        # Vital Signs
+        # Vital Signs (left empty until measured, so triage never scores placeholder values)
         with st.expander("📊 Vital Signs"):
-            temp = st.number_input("Temperature (°C)", 35.0, 42.0, step=0.1)
-            hr = st.number_input("Heart Rate (bpm)", 40, 200, step=1)
-            bp_sys = st.number_input("Blood Pressure - Systolic", 70, 200, step=1)
-            bp_dia = st.number_input("Blood Pressure - Diastolic", 40, 130, step=1)
-            spo2 = st.number_input("Oxygen Saturation (%)", 70, 100, step=1)
-            rr = st.number_input("Respiratory Rate (breaths/min)", 8, 40, step=1)
-            
-            st.session_state.patient_data["vital_signs"] = {
-                "temperature": temp,
-                "heart_rate": hr,
-                "blood_pressure": f"{bp_sys}/{bp_dia}",
-                "oxygen_saturation": spo2,
-                "respiratory_rate": rr
-            }
+            inputs["temp"] = st.number_input("Temperature (°C)", 35.0, 42.0, value=None, step=0.1)
+            inputs["hr"] = st.number_input("Heart Rate (bpm)", 40, 200, value=None, step=1)
+            inputs["bp_sys"] = st.number_input("Blood Pressure - Systolic", 70, 200, value=None, step=1)
+            inputs["bp_dia"] = st.number_input("Blood Pressure - Diastolic", 40, 130, value=None, step=1)
+            inputs["spo2"] = st.number_input("Oxygen Saturation (%)", 70, 100, value=None, step=1)
+            inputs["rr"] = st.number_input("Respiratory Rate (breaths/min)", 8, 40, value=None, step=1)
+            inputs["consciousness"] = st.selectbox("Consciousness (ACVPU)", ("",) + CONSCIOUSNESS_LEVELS)
+            inputs["oxygen"] = st.selectbox("Oxygen", ["", "Room air", "Supplemental oxygen"])
+        
+        submitted = st.form_submit_button("💾 Save Profile", use_container_width=True)
+    
+    committed = st.session_state.profile_inputs
+    if submitted or not committed:
+        changed = {name for name, value in inputs.items() if committed.get(name, object()) != value}
+        for field, (sources, derive) in PROFILE_FIELDS.items():
+            if changed.intersection(sources):
+                st.session_state.patient_data[field] = derive(*(inputs[name] for name in sources))
+        st.session_state.profile_inputs = inputs
+        if submitted:
+            st.session_state.profile_commits += 1
+    
+    st.caption(
+        f"Profile saved {st.session_state.profile_commits} times · "
+        f"{st.session_state.rerun_count} page reruns this consultation"
+    )
+
+def main():
+    cassette = get_cassette()
+    replaying = cassette is not None and LLM_CASSETTE_MODE == "replay"
+    if not replaying:
+        init_llm_transport()
+    
+    # Initialize medical assistant
+    medical_assistant = MedicalAssistant(
+        os.getenv("GROQ_API_KEY"), get_model_router(), get_hedged_runner(), cassette,
+        profile_calls=profile_mode() == "llm"
+    )
+    
+    st.session_state.rerun_count += 1
+    
+    # A new run supersedes any LLM call the previous run left in flight
+    st.session_state.llm_cancellation.begin_run()
+    
+    # Session bookkeeping: restore if evicted, enforce memory ceilings
+    session_manager = get_session_manager()
+    ctx = get_script_run_ctx()
+    session_manager.touch(ctx.session_id, ctx.session_state)
+    session_manager.measure(ctx.session_id)
+    
+    # Enhanced Sidebar with Patient Profile
+    with st.sidebar:
+        render_patient_profile()
+        render_consultation_search()
+        session_stats = session_manager.stats()
+        st.caption(
+            f"🖥️ {session_stats['resident_sessions']} resident sessions · "
+            f"{session_stats['spilled_sessions']} spilled · "
+            f"{session_stats['resident_bytes'] / 1024 / 1024:.1f} MB"
+        )
+        transport_stats = pool_stats()
+        st.caption(
+            f"🔌 LLM pool: {transport_stats['open_connections']}/{transport_stats['pool_size']} connections, "
+            f"{transport_stats['utilisation']:.0%} busy, {transport_stats['requests']} requests"
+        )
+        if cassette is not None:
+            st.caption(
+                f"📼 Cassette {'replay' if replaying else 'recording'}: {len(cassette)} calls · "
+                f"{cassette.metrics['hits']} hits, {cassette.metrics['near_hits']} near hits, "
+                f"{cassette.metrics['misses']} misses"
+            )
+        store_stats = get_session_store().stats()
+        st.caption(
+            f"🗃️ Session store ({store_stats['backend']}): {store_stats['loads']} loads, "
+            f"{store_stats['saves']} saves ({store_stats['skipped_saves']} skipped), "
+            f"{store_stats['avg_store_ms']:.2f} ms avg"
+        )
+        for namespace, stats in get_shared_cache().stats().items():
+            st.caption(
+                f"🗄️ Shared cache {namespace}: {stats['entries']} entries, {stats['bytes'] / 1024:.0f} KB, "
+                f"{stats['hit_rate']:.0%} hit rate, {stats['evictions']} evicted"
+            )
     
     # Main Content Area
     col1, col2 = st.columns([2, 1])
@@ -346,19 +1067,66 @@ def main():
         )
         
         # File Upload
-        uploaded_file = st.file_uploader("Upload Medical Reports (PDF)", type="pdf")
+        uploaded_files = st.file_uploader(
+            "Upload Medical Reports (PDF)",
+            type="pdf",
+            accept_multiple_files=True,
+            key=f"report_uploader_{st.session_state.uploader_generation}"
+        )
+        if uploaded_files:
+            spill_uploads(uploaded_files)
         lab_report_content = ""
-        if uploaded_file:
-            lab_report_content = extract_pdf_content(uploaded_file)
+        documents = []
+        if st.session_state.spooled_reports:
+            reports = extract_pdf_contents(st.session_state.spooled_reports)
+            lab_report_content, documents = reports["text"], reports["documents"]
             with st.expander("📄 Report Content"):
                 st.text_area("Extracted Text", lab_report_content, height=200)
+                for document in documents:
+                    cleaning = document["cleaning"]
+                    st.caption(
+                        f"🧹 {document['name']}: removed {cleaning['boilerplate_lines']} repeated lines across "
+                        f"{cleaning['pages']} pages, {cleaning['bytes_removed'] / 1024:.1f} KB, "
+                        f"{cleaning['tokens_removed']} tokens "
+                        f"({cleaning['tokens_removed'] / max(cleaning['tokens_before'], 1):.0%})"
+                    )
+            if st.button("🗑️ Clear Reports"):
+                st.session_state.spooled_reports = []
+                st.session_state.report_versions = {}
+                st.session_state.report_changes = "None"
+                st.rerun()
+        revision_notice = track_report_revisions(documents)
+        if revision_notice:
+            st.info(f"📝 {revision_notice}")
+        lab_trends = record_lab_reports(
+            st.session_state.patient_data.get("patient_id"), documents, st.session_state.spooled_reports
+        )
+        if lab_trends.startswith("- "):
+            with st.expander("📈 Lab Trends"):
+                st.markdown(lab_trends)
+        
+        # Instant rule-based triage
+        vitals_ok, vitals_message = validate_vital_signs(
+            normalize_vitals(st.session_state.patient_data["vital_signs"])
+        )
+        if not vitals_ok:
+            st.warning(f"⚠️ {vitals_message}")
+        # Reports are in date order, so later values win
+        lab_values = {}
+        for document in documents:
+            lab_values.update(parse_lab_values(document["text"]))
+        triage = assess(st.session_state.patient_data["vital_signs"], lab_values, symptoms)
+        render_triage_banner(triage)
         
         # Consultation History
         if st.session_state.history:
             st.markdown("### Previous Messages")
-            messages = st.session_state.history.split("\n\n")
-            for msg in messages:
-                st.markdown(f">{msg}")
+            if st.session_state.trimmed_turns:
+                st.info(
+                    f"✂️ The {st.session_state.trimmed_turns} earliest turns were removed to keep this session "
+                    "under its memory limit; they are no longer shown or sent to the assistant."
+                )
+            render_history_panel()
     
     with col2:
         st.markdown("## 🎯 Actions")
@@ -367,17 +1135,32 @@ def main():
         if st.button("🔍 Generate Assessment", use_container_width=True):
             if symptoms or lab_report_content:
                 with st.spinner("Analyzing information..."):
-                    diagnosis = medical_assistant.diagnosis_chain.run(
-                        symptoms=symptoms,
-                        history=st.session_state.history,
-                        lab_report=lab_report_content,
-                        patient_data=st.session_state.patient_data
-                    )
+                    # Only a structured run of this assessment may leave a result for the saved summary.
+                    st.session_state.last_assessment = None
+                    if should_short_circuit(triage):
+                        diagnosis = emergency_assessment(triage)
+                    else:
+                        # Similar-case retrieval only feeds the LLM prompt, so emergencies never wait for it.
+                        inputs = dict(
+                            symptoms=symptoms,
+                            history=st.session_state.history,
+                            lab_report=lab_report_content,
+                            lab_trends=lab_trends,
+                            patient_data=st.session_state.patient_data,
+                            similar_cases=find_similar_cases(symptoms, st.session_state.patient_data)
+                        )
+                        if STRUCTURED_ASSESSMENT:
+                            diagnosis = run_structured_assessment(medical_assistant, **inputs)
+                        elif ASSESSMENT_FAN_OUT:
+                            diagnosis = run_assessment_panels(medical_assistant, **inputs)
+                        else:
+                            diagnosis = run_llm(medical_assistant, "diagnosis", **inputs)
                     st.session_state.history = update_history(
                         st.session_state.history,
                         f"Symptoms: {symptoms}",
                         diagnosis
                     )
+                    speculate_summary(medical_assistant)
                     st.rerun()
         
         # Follow-up Questions
@@ -386,32 +1169,50 @@ def main():
         if st.button("Send Question", use_container_width=True):
             if follow_up:
                 with st.spinner("Processing..."):
-                    response = medical_assistant.follow_up_chain.run(
+                    response = run_llm(
+                        medical_assistant,
+                        "follow_up",
                         follow_up=follow_up,
                         history=st.session_state.history,
-                        patient_data=st.session_state.patient_data
+                        patient_data=st.session_state.patient_data,
+                        report_changes=st.session_state.report_changes
                     )
                     st.session_state.history = update_history(
                         st.session_state.history,
                         follow_up,
                         response
                     )
+                    speculate_summary(medical_assistant)
                     st.rerun()
         
         # Generate Summary
         if st.button("📝 Generate Consultation Summary", use_container_width=True):
             if st.session_state.history:
                 with st.spinner("Generating summary..."):
-                    summary = medical_assistant.summary_chain.run(
-                        history=st.session_state.history,
-                        patient_data=st.session_state.patient_data
+                    history = st.session_state.history
+                    patient_data = json.loads(json.dumps(st.session_state.patient_data, default=str))
+                    key = summary_key(history, patient_data)
+                    summary = st.session_state.summary_speculator.get(
+                        key,
+                        lambda: get_shared_cache().get_or_compute(
+                            "summary",
+                            key,
+                            lambda: run_llm(
+                                medical_assistant,
+                                "summary",
+                                history=history,
+                                patient_data=patient_data
+                            ),
+                            ttl=PHI_CACHE_TTL
+                        )
                     )
                     st.session_state.consultation_summary = summary
                     
                     # Save summary to file
                     filename = save_consultation_summary(
                         summary,
-                        st.session_state.patient_data
+                        st.session_state.patient_data,
+                        st.session_state.last_assessment
                     )
                     
                     st.download_button(
@@ -422,6 +1223,36 @@ def main():
                     )
                     
                     st.markdown(f"### Consultation Summary\n{summary}")
+        
+        cancellation = st.session_state.llm_cancellation.metrics
+        if cancellation["cancelled_calls"]:
+            st.caption(
+                f"🛑 {cancellation['cancelled_calls']} superseded calls cancelled · "
+                f"~{cancellation['tokens_saved']} tokens saved"
+            )
+        speculator = st.session_state.summary_speculator
+        st.caption(
+            f"⚡ Summary pre-generation: {speculator.hit_rate:.0%} hit rate, "
+            f"{speculator.metrics['wasted']} wasted calls"
+        )
+        
+        route_stats = medical_assistant.router.stats()
+        if route_stats:
+            with st.expander("⏱️ Model routes"):
+                for route, stats in route_stats.items():
+                    st.caption(
+                        f"{route}: {stats['calls']} calls · p50 {stats['p50_ms']:.0f} ms · "
+                        f"p95 {stats['p95_ms']:.0f} ms · {stats['slo_breaches']} SLO breaches · "
+                        f"{stats['truncations']} truncated · "
+                        f"p95 {stats['p95_completion_tokens']:.0f} tokens"
+                    )
+                if medical_assistant.hedger is not None:
+                    hedge = medical_assistant.hedger.metrics
+                    st.caption(
+                        f"Hedging: {hedge['hedged']}/{hedge['calls']} calls hedged · "
+                        f"{hedge['backup_wins']} backup wins · {hedge['breaker_reroutes']} breaker reroutes"
+                    )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with persisted_session(), profiled("main", profile_mode() == "run"):
+        main()
\ No newline at end of file
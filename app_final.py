@@ -5,6 +5,9 @@ from langchain import LLMChain
 from langchain.prompts import PromptTemplate
 from langchain_groq import ChatGroq
 from dotenv import load_dotenv
+from history_view import HistoryRenderCache
+from report_ingest import ingest_reports
+from upload_spool import open_mapped, purge, spill
 
 
 # Must be the first Streamlit command
@@ -174,17 +177,43 @@ def update_history(history, user_input, model_response):
         return f"User: {user_input}\nBot: {model_response}"
     return f"{history}\n\nUser: {user_input}\nBot: {model_response}"
 
-def extract_pdf_content(pdf_file):
-    """Extract and format text from PDF file."""
-    try:
-        content = ""
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
+def extract_pdf_content(upload):
+    """Extract and format text from a spilled PDF file through a memory map."""
+    content = ""
+    with open_mapped(upload["path"]) as mapped:
+        pdf_reader = PyPDF2.PdfReader(mapped)
         for page in pdf_reader.pages:
             content += page.extract_text() or ""
-        return content.strip()
-    except Exception as e:
-        st.error(f"Error reading PDF: {str(e)}")
-        return ""
+    return {"text": content.strip()}
+
+def spill_uploads(uploaded_files):
+    """Move new uploads to the on-disk spool and reset the uploader so Streamlit drops its in-memory copies."""
+    purge()
+    for uploaded_file in uploaded_files:
+        st.session_state.spooled_reports.append({"name": uploaded_file.name, **spill(uploaded_file)})
+    st.session_state.uploader_generation += 1
+    st.rerun()
+
+def extract_pdf_contents(uploads):
+    """Extract all spilled reports concurrently into one deduplicated text, with a status line per file."""
+    statuses = [st.empty() for _ in uploads]
+    for status, upload in zip(statuses, uploads):
+        status.caption(f"⏳ {upload['name']}…")
+    
+    def show_file(index, document):
+        if document["status"] == "extracted":
+            statuses[index].caption(f"✅ {document['name']}")
+        elif document["status"] in ("duplicate", "overlap"):
+            statuses[index].caption(f"♻️ {document['name']}: same content as {document['duplicate_of']}, skipped")
+        else:
+            statuses[index].error(f"Error reading {document['name']}: {document['error']}")
+    
+    reports = ingest_reports(
+        [(upload["name"], upload["sha256"], upload) for upload in uploads],
+        extract_pdf_content,
+        show_file
+    )
+    return reports["text"]
 
 def get_diagnosis(symptoms, history, lab_report):
     """Generate diagnosis with loading animation."""
@@ -209,6 +238,17 @@ st.markdown("""
 # Initialize session state
 if "history" not in st.session_state:
     st.session_state.history = ""
+if "history_render_cache" not in st.session_state:
+    st.session_state.history_render_cache = HistoryRenderCache()
+if "spooled_reports" not in st.session_state:
+    st.session_state.spooled_reports = []
+if "uploader_generation" not in st.session_state:
+    st.session_state.uploader_generation = 0
+
+@st.fragment
+def render_history_panel():
+    """Render the chat history from per-turn cached HTML as a single element."""
+    st.markdown(st.session_state.history_render_cache.render(st.session_state.history), unsafe_allow_html=True)
 
 # Enhanced Sidebar
 with st.sidebar:
@@ -235,15 +275,19 @@ with st.sidebar:
         </div>
     """, unsafe_allow_html=True)
     
-    uploaded_file = st.file_uploader(
+    uploaded_files = st.file_uploader(
         "Upload Medical Reports (PDF)",
         type="pdf",
-        help="Upload relevant medical reports for better analysis"
+        accept_multiple_files=True,
+        help="Upload relevant medical reports for better analysis",
+        key=f"report_uploader_{st.session_state.uploader_generation}"
     )
+    if uploaded_files:
+        spill_uploads(uploaded_files)
     
     lab_report_content = ""
-    if uploaded_file:
-        lab_report_content = extract_pdf_content(uploaded_file)
+    if st.session_state.spooled_reports:
+        lab_report_content = extract_pdf_contents(st.session_state.spooled_reports)
         with st.expander("📄 View Report Content"):
             st.text_area(
                 "Extracted Content",
@@ -251,6 +295,9 @@ with st.sidebar:
                 height=200,
                 disabled=True
             )
+        if st.button("🗑️ Clear Reports", use_container_width=True):
+            st.session_state.spooled_reports = []
+            st.rerun()
 
 # Main Content Area
 col1, col2 = st.columns([2, 1])
@@ -265,13 +312,7 @@ with col1:
     
     # Display chat history with custom styling
     if st.session_state.history:
-        messages = st.session_state.history.split("\n\n")
-        for message in messages:
-            st.markdown(f"""
-                <div class="chat-message">
-                    {message.replace('User:', '<strong style="color: #1f77b4;">User:</strong>').replace('Bot:', '<strong style="color: #2ecc71;">Bot:</strong>')}
-                </div>
-            """, unsafe_allow_html=True)
+        render_history_panel()
     else:
         st.info("👋 Start by describing your symptoms or uploading a lab report!")
 
@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from hedging import GenerationCancelled
+from profiling import profiled_task
+from structured_output import DISCLAIMER
+
+# The five parts of the diagnosis prompt, each generated by its own smaller prompt.
+SECTIONS = [
+    {
+        "key": "diagnoses",
+        "title": "Potential diagnoses (primary and differential)",
+        "instruction": "List the most likely primary diagnosis and the main differential diagnoses, "
+                       "each with a one-line rationale.",
+    },
+    {
+        "key": "severity",
+        "title": "Severity assessment (Low/Medium/High)",
+        "instruction": "State the severity as exactly one of Low, Medium or High, followed by a "
+                       "one- or two-sentence justification.",
+    },
+    {
+        "key": "next_steps",
+        "title": "Recommended next steps",
+        "instruction": "List the recommended next steps: investigations, referrals and treatment "
+                       "considerations, most urgent first.",
+    },
+    {
+        "key": "red_flags",
+        "title": "Red flags to watch for",
+        "instruction": "List the red-flag symptoms or findings that should prompt urgent care.",
+    },
+    {
+        "key": "lifestyle",
+        "title": "Lifestyle recommendations",
+        "instruction": "List brief, practical lifestyle recommendations relevant to this presentation.",
+    },
+]
+
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="assessment-section")
+
+
+def merge_sections(results: Dict[str, str]) -> str:
+    """Join section outputs in the order of the original single prompt."""
+    parts = [
+        f"{number}. {section['title']}\n{results.get(section['key'], '').strip()}"
+        for number, section in enumerate(SECTIONS, start=1)
+    ]
+    return "\n\n".join(parts + [DISCLAIMER])
+
+
+def run_assessment(
+    run_section: Callable[[Dict, List], str],
+    callbacks: Optional[List] = None,
+    on_section: Optional[Callable[[Dict, str], None]] = None,
+) -> str:
+    """Generate every section concurrently and merge them.
+
+    `run_section(section, callbacks)` produces one section's text; `on_section(section, text)`
+    is called from a worker thread as each one completes. A section that fails is reported
+    inline instead of failing the whole assessment; cancellation still propagates.
+    """
+    callbacks = callbacks or []
+    futures = {_executor.submit(profiled_task(run_section), section, callbacks): section for section in SECTIONS}
+    results = {}
+    try:
+        for future in as_completed(futures):
+            section = futures[future]
+            try:
+                text = future.result()
+            except GenerationCancelled:
+                raise
+            except Exception as e:
+                text = f"_This section could not be generated ({type(e).__name__})._"
+            results[section["key"]] = text
+            if on_section:
+                on_section(section, text)
+    finally:
+        for future in futures:
+            future.cancel()
+    return merge_sections(results)
@@ -0,0 +1,84 @@
+"""Measure similar-case retrieval latency and IVF recall over a large synthetic case index.
+
+Builds a memory-mapped index of N generated consultations, then compares exact search with
+the approximate (IVF) option: p50/p95 latency including query embedding, and recall@k of
+the approximate results against the exact ones. Synthetic cases share a small vocabulary, so
+many tie; an approximate hit counts when its score reaches the exact k-th best score.
+
+Run from the repository root: python benchmarks/bench_case_retrieval.py [cases] [k]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from case_retrieval import CaseIndex, get_embedder  # noqa: E402
+
+CONDITIONS = ["pneumonia", "bronchitis", "asthma exacerbation", "influenza", "migraine", "hypertension",
+              "gastritis", "urinary tract infection", "type 2 diabetes", "iron deficiency anaemia",
+              "sinusitis", "cellulitis", "appendicitis", "pulmonary embolism", "heart failure", "gout"]
+SYMPTOMS = ["fever", "productive cough", "shortness of breath", "chest pain", "headache", "nausea",
+            "abdominal pain", "dysuria", "fatigue", "swelling", "wheeze", "dizziness", "rash", "joint pain"]
+MEDICATIONS = ["amoxicillin", "metformin", "salbutamol", "lisinopril", "ibuprofen", "omeprazole", "furosemide"]
+
+
+def synthetic_case(rng):
+    condition = rng.choice(CONDITIONS)
+    symptoms = ", ".join(rng.sample(SYMPTOMS, 3))
+    summary = f"Presented with {symptoms}. Assessment consistent with {condition}. Advised follow up."
+    patient = {"age": rng.randint(1, 95), "gender": rng.choice(["Male", "Female"]),
+               "medical_history": rng.sample(CONDITIONS, 1), "current_medications": rng.sample(MEDICATIONS, 2),
+               "allergies": []}
+    return summary, patient
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    rng = random.Random(0)
+    embedder = get_embedder()
+    with tempfile.TemporaryDirectory() as directory:
+        index = CaseIndex(directory, embedder)
+        start = time.perf_counter()
+        for batch in range(0, n, 10_000):
+            records = [synthetic_case(rng) for _ in range(min(10_000, n - batch))]
+            index.add_many(
+                [{"filename": f"c{batch + i}", "age": p["age"], "gender": p["gender"], "summary": s}
+                 for i, (s, p) in enumerate(records)],
+                [f"{s}\nHistory: {p['medical_history']}\nMedications: {p['current_medications']}" for s, p in records],
+            )
+        print(f"embedder {embedder.name}: indexed {len(index)} cases in {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        index.build_ann()
+        print(f"IVF build: {time.perf_counter() - start:.1f} s")
+
+        queries = [f"{', '.join(rng.sample(SYMPTOMS, 2))} history of {rng.choice(CONDITIONS)}" for _ in range(100)]
+        results = {}
+        for label, ann in (("exact", False), ("ivf", True)):
+            timings, results[label] = [], []
+            for query in queries:
+                start = time.perf_counter()
+                results[label].append(index.search(query, k=k, ann=ann))
+                timings.append((time.perf_counter() - start) * 1000)
+            p50, p95 = percentiles(timings)
+            print(f"{label:6s} top-{k}: p50 {p50:6.2f} ms  p95 {p95:6.2f} ms")
+
+        hits = sum(
+            sum(r["score"] >= exact[-1]["score"] - 1e-6 for r in approx)
+            for exact, approx in zip(results["exact"], results["ivf"]) if exact
+        )
+        total = sum(len(exact) for exact in results["exact"])
+        print(f"ivf recall@{k}: {hits / max(1, total):.0%}")
+
+
+if __name__ == "__main__":
+    main()
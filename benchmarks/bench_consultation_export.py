@@ -0,0 +1,109 @@
+"""Compare a cohort query over pretty-printed consultation JSON files with the Parquet export.
+
+Writes N synthetic consultations the way save_consultation_summary does, exports them, then
+runs the same aggregation (consultation count and mean temperature per severity for patients
+over 65 with a recorded SpO2 below 94) over the JSON files and over the Parquet dataset.
+Also times an incremental export after a few new saves.
+
+Run from the repository root: python benchmarks/bench_consultation_export.py [consultations]
+"""
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consultation_export import export  # noqa: E402
+
+
+def write_consultations(directory, n, rng, start_index=0):
+    now = datetime.now()
+    for i in range(start_index, start_index + n):
+        saved_at = now - timedelta(minutes=rng.randint(0, 3 * 525_600))
+        severity = rng.choice(["Low", "Medium", "High"])
+        record = {
+            "timestamp": saved_at.strftime("%Y%m%d_%H%M%S"),
+            "patient_data": {
+                "age": rng.randint(1, 95),
+                "gender": rng.choice(["Male", "Female"]),
+                "medical_history": rng.sample(["asthma", "COPD", "diabetes", "hypertension"], 2),
+                "current_medications": rng.sample(["metformin", "salbutamol", "lisinopril"], 1),
+                "allergies": [],
+                "vital_signs": {
+                    "temperature": round(rng.uniform(36, 40), 1),
+                    "heart_rate": rng.randint(50, 130),
+                    "blood_pressure": f"{rng.randint(90, 180)}/{rng.randint(50, 110)}",
+                    "oxygen_saturation": rng.randint(85, 100),
+                },
+                "consultation_datetime": None,
+            },
+            "consultation_summary": f"Chief complaints ... 2. Severity assessment: {severity}. " + "x" * 800,
+        }
+        # Named by save time like save_consultation_summary (plus a counter, as saves here collide).
+        with open(os.path.join(directory, f"consultation_{record['timestamp']}_{i:07d}.json"), "w") as f:
+            json.dump(record, f, indent=4)
+
+
+def query_json(directory):
+    totals = defaultdict(lambda: [0, 0.0])
+    for filename in glob.glob(os.path.join(directory, "consultation_*.json")):
+        with open(filename) as f:
+            record = json.load(f)
+        patient = record["patient_data"]
+        vitals = patient["vital_signs"]
+        if patient["age"] > 65 and vitals.get("oxygen_saturation", 100) < 94:
+            severity = record["consultation_summary"].split("Severity assessment: ")[1].split(".")[0]
+            totals[severity][0] += 1
+            totals[severity][1] += vitals["temperature"]
+    return {severity: (count, total / count) for severity, (count, total) in totals.items()}
+
+
+def query_parquet(dest):
+    dataset = ds.dataset(dest, partitioning="hive", format="parquet")
+    table = dataset.to_table(
+        columns=["severity", "temperature"],
+        filter=(ds.field("age") > 65) & (ds.field("oxygen_saturation") < 94),
+    )
+    grouped = table.group_by("severity").aggregate([("temperature", "count"), ("temperature", "mean")])
+    return {row["severity"]: (row["temperature_count"], row["temperature_mean"]) for row in grouped.to_pylist()}
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as dest:
+        write_consultations(source, n, rng)
+
+        start = time.perf_counter()
+        from_json = query_json(source)
+        print(f"query over {n} JSON files: {time.perf_counter() - start:7.2f} s")
+
+        start = time.perf_counter()
+        export(source, dest)
+        print(f"full export:                {time.perf_counter() - start:7.2f} s")
+
+        start = time.perf_counter()
+        from_parquet = query_parquet(dest)
+        print(f"query over Parquet:         {time.perf_counter() - start:7.2f} s")
+        same = all(from_json[s][0] == from_parquet[s][0] for s in from_json)
+        print(f"results match: {same} {sorted((s, c) for s, (c, _) in from_parquet.items())}")
+
+        write_consultations(source, 100, rng, start_index=n)
+        start = time.perf_counter()
+        added = export(source, dest)
+        print(f"incremental export of {added}: {time.perf_counter() - start:7.2f} s")
+        size = sum(os.path.getsize(p) for p in glob.glob(os.path.join(dest, "**", "*.parquet"), recursive=True))
+        print(f"dataset size: {size / 1024 / 1024:.1f} MB, {pc.sum(ds.dataset(dest, partitioning='hive').to_table(columns=['age']).column('age').is_valid()).as_py()} rows with age")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Measure full-text search latency over a large synthetic set of saved consultations.
+
+Builds an index of N generated consultations (bulk insert, as `reindex` does), then times
+typical queries with and without a date window.
+
+Run from the repository root: python benchmarks/bench_consultation_search.py [consultations]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from consultation_index import ConsultationIndex  # noqa: E402
+
+CONDITIONS = ["pneumonia", "bronchitis", "asthma", "influenza", "migraine", "hypertension", "gastritis",
+              "urinary tract infection", "type 2 diabetes", "anaemia", "sinusitis", "cellulitis"]
+MEDICATIONS = ["amoxicillin", "metformin", "salbutamol", "lisinopril", "ibuprofen", "omeprazole", "atorvastatin"]
+FILLER = ("patient presented with symptoms over several days review of systems otherwise unremarkable "
+          "advised rest fluids and follow up with primary care if symptoms persist or worsen").split()
+
+
+def consultation(rng, saved_at):
+    condition = rng.choice(CONDITIONS)
+    words = rng.sample(FILLER, 12)
+    summary = (f"Chief complaint and assessment consistent with {condition}. "
+               f"{' '.join(words)}. Differential includes {rng.choice(CONDITIONS)}.")
+    return {
+        "timestamp": saved_at.strftime("%Y%m%d_%H%M%S"),
+        "patient_data": {
+            "age": rng.randint(1, 95),
+            "gender": rng.choice(["Male", "Female", "Other"]),
+            "medical_history": rng.sample(CONDITIONS, 2),
+            "current_medications": rng.sample(MEDICATIONS, 2),
+            "allergies": rng.sample(["penicillin", "latex", "peanuts", "none known"], 1),
+            "vital_signs": {"temperature": round(rng.uniform(36, 40), 1), "heart_rate": rng.randint(50, 130)},
+        },
+        "consultation_summary": summary,
+    }
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rng = random.Random(0)
+    now = datetime.now()
+    with tempfile.TemporaryDirectory() as directory:
+        index = ConsultationIndex(os.path.join(directory, "index.sqlite"))
+        start = time.perf_counter()
+        # Saved over the past year in order, as the app saves them; a few are indexed late.
+        minutes = sorted((rng.randint(0, 525_600) for _ in range(n)), reverse=True)
+        index.add_many(
+            (f"consultation_{i}.json", consultation(rng, now - timedelta(minutes=m))) for i, m in enumerate(minutes)
+        )
+        print(f"indexed {len(index)} consultations in {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        index.add("consultation_new.json", consultation(rng, now))
+        print(f"incremental add: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        last_week = now - timedelta(days=7)
+        for text, since, order in [
+            ("pneumonia", None, "relevance"), ("pneumonia", None, "recent"), ("pneumonia", last_week, "relevance"),
+            ("amoxicillin penicillin", None, "relevance"), ("urinary tract", last_week, "relevance"),
+            ("asth", None, "recent"),
+        ]:
+            timings = []
+            for _ in range(20):
+                start = time.perf_counter()
+                results = index.search(text, since=since, order=order)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            label = f"{text}{' (last 7 days)' if since else ''}, {order}"
+            print(f"{label:42s} p50 {timings[10]:7.2f} ms  p95 {timings[18]:7.2f} ms  {len(results)} results")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Measure per-rerun history rendering cost over a simulated consultation.
+
+The legacy path mirrors app_final.py: split the history on blank lines and build one
+HTML element per message on every rerun, with each element's Markdown parsed again.
+The cached path is history_view.HistoryRenderCache as used by both apps.
+
+Run from the repository root: python benchmarks/bench_history_render.py [turns]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_view import HistoryRenderCache, _markdown  # noqa: E402
+
+RESPONSE = (
+    "**Potential diagnoses**\n\n"
+    "1. Viral upper respiratory infection\n"
+    "2. Early community-acquired pneumonia\n\n"
+    "**Severity:** Medium\n\n"
+    "- Recommended next steps: chest X-ray, CBC, CRP\n"
+    "- Red flags: SpO2 below 92%, confusion, chest pain\n\n"
+    "This is an AI-generated preliminary assessment. " * 3
+)
+
+
+def legacy_render(history):
+    elements = []
+    for message in history.split("\n\n"):
+        body = message.replace("User:", '<strong style="color: #1f77b4;">User:</strong>').replace(
+            "Bot:", '<strong style="color: #2ecc71;">Bot:</strong>'
+        )
+        elements.append(_markdown.render(f'<div class="chat-message">\n{body}\n</div>'))
+    return elements
+
+
+def simulate(turns, render):
+    history = ""
+    per_rerun = []
+    for turn in range(turns):
+        message = f"User: follow-up question {turn}\nBot: {RESPONSE}"
+        history = message if not history else f"{history}\n\n{message}"
+        start = time.perf_counter()
+        render(history)
+        per_rerun.append((time.perf_counter() - start) * 1e3)
+    return history, per_rerun
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    history, legacy = simulate(turns, legacy_render)
+    cache = HistoryRenderCache()
+    _, cached = simulate(turns, cache.render)
+    print(f"turns: {turns}")
+    print(f"{'':<8}{'last rerun (ms)':>18}{'whole session (ms)':>22}{'elements/rerun':>18}")
+    print(f"{'legacy':<8}{legacy[-1]:>18.2f}{sum(legacy):>22.1f}{len(history.split(chr(10) * 2)):>18}")
+    print(f"{'cached':<8}{cached[-1]:>18.2f}{sum(cached):>22.1f}{1:>18}")
+
+
+if __name__ == "__main__":
+    main()
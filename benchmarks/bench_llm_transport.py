@@ -0,0 +1,97 @@
+"""Verify connection reuse of the shared LLM transport against a local stub server.
+
+Starts a keep-alive HTTP/1.1 stub that mimics a chat-completions endpoint and counts
+accepted TCP connections, then compares a fresh client per backend (the previous
+behaviour, one client per ChatGroq instance) with the shared pooled client.
+
+Run from the repository root: python benchmarks/bench_llm_transport.py [requests] [backends]
+"""
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_transport  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubHandler.lock:
+            StubHandler.connections += 1
+
+    def _reply(self, body=b""):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._reply()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(0.005)
+        self._reply(json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def run(n_requests, n_backends, make_client, url):
+    StubHandler.connections = 0
+    payload = {"model": "stub", "messages": [{"role": "user", "content": "hi"}]}
+
+    def call(i):
+        client = make_client(i % n_backends)
+        client.post(url, json=payload).raise_for_status()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_backends) as executor:
+        list(executor.map(call, range(n_requests)))
+    return time.perf_counter() - start, StubHandler.connections
+
+
+def main():
+    n_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    n_backends = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    url = f"{base_url}/openai/v1/chat/completions"
+
+    # Previous behaviour: every MedicalAssistant rerun builds a new ChatGroq with its own client.
+    def fresh_client(_):
+        return httpx.Client()
+
+    fresh_time, fresh_connections = run(n_requests, n_backends, fresh_client, url)
+
+    StubHandler.connections = 0
+    warmed = llm_transport.prewarm(base_url, connections=n_backends)
+    warm_connections = StubHandler.connections
+    shared = llm_transport.get_http_client()
+    shared_time, shared_connections = run(n_requests, n_backends, lambda _: shared, url)
+
+    print(f"requests: {n_requests}, concurrent backends: {n_backends}")
+    print(f"client per call:  {fresh_time * 1e3:8.1f} ms  {fresh_connections:5d} TCP connections")
+    print(f"shared pool:      {shared_time * 1e3:8.1f} ms  {shared_connections:5d} TCP connections "
+          f"(+{warm_connections} pre-warmed, {warmed} ok)")
+    print("pool stats:", llm_transport.pool_stats())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
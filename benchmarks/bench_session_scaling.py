@@ -0,0 +1,174 @@
+"""Measure session-store round trips as stateless workers share consultations over the network.
+
+Starts a minimal Redis-protocol stand-in (GET/SET/DEL and WATCH/MULTI/EXEC, threaded) unless
+--redis-url is given, then runs 1, 2, 4, ... worker processes. Each worker serves requests for
+random consultations from a shared pool, so consecutive requests for a consultation land on
+different workers as they would behind a load balancer without sticky sessions. Every request
+restores the consultation, appends a turn and saves it back with a conditional write; only
+those store calls are timed. Reports store operations per second, p50/p95 restore+save latency
+and how many saves hit a version conflict. --work-ms adds an untimed pause between restore and
+save, which widens the window for overlapping updates.
+
+Run from the repository root:
+    python benchmarks/bench_session_scaling.py [--workers 1,2,4,8] [--seconds 3] [--work-ms 0]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import socketserver
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import RedisSessionStore  # noqa: E402
+
+
+class RespStandIn(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """Just enough of the Redis protocol for RedisSessionStore: PING, GET, SET [EX], DEL, WATCH/MULTI/EXEC."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, RespHandler)
+        self.data = {}
+        self.writes = {}  # key -> write count, to fail EXEC after a WATCHed key changed
+        self.lock = threading.Lock()
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True  # replies are small; Nagle plus delayed ACKs would add ~40 ms each
+
+    def read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def execute(self, args):
+        server = self.server
+        command = args[0].upper()
+        if command == b"GET":
+            value = server.data.get(args[1])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if command == b"SET":
+            server.data[args[1]] = args[2]
+            server.writes[args[1]] = server.writes.get(args[1], 0) + 1
+            return b"+OK\r\n"
+        if command == b"DEL":
+            removed = server.data.pop(args[1], None) is not None
+            server.writes[args[1]] = server.writes.get(args[1], 0) + 1
+            return b":%d\r\n" % removed
+        return b"-ERR unknown command\r\n"
+
+    def handle(self):
+        lock = self.server.lock
+        watched, queued = {}, None
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            with lock:
+                if command == b"WATCH":
+                    watched.update({key: self.server.writes.get(key, 0) for key in args[1:]})
+                    reply = b"+OK\r\n"
+                elif command == b"UNWATCH":
+                    watched.clear()
+                    reply = b"+OK\r\n"
+                elif command == b"MULTI":
+                    queued = []
+                    reply = b"+OK\r\n"
+                elif command == b"EXEC":
+                    if any(self.server.writes.get(key, 0) != count for key, count in watched.items()):
+                        reply = b"*-1\r\n"
+                    else:
+                        replies = [self.execute(queued_args) for queued_args in queued]
+                        reply = b"*%d\r\n" % len(replies) + b"".join(replies)
+                    watched.clear()
+                    queued = None
+                elif queued is not None:
+                    queued.append(args)
+                    reply = b"+QUEUED\r\n"
+                elif command == b"PING":
+                    reply = b"+PONG\r\n"
+                elif command in (b"CLIENT", b"SELECT"):
+                    reply = b"+OK\r\n"
+                else:
+                    reply = self.execute(args)
+            self.wfile.write(reply)
+
+
+def worker(url, seconds, work_ms, consultations, results):
+    store = RedisSessionStore(url)
+    rng = random.Random(os.getpid())
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        consultation = f"c{rng.randrange(consultations)}"
+        state = {"history": "", "patient_data": {"age": 40}, "consultation_summary": None}
+        start = time.perf_counter()
+        store.restore(consultation, state)
+        elapsed = time.perf_counter() - start
+        state["history"] = (state["history"] + f"\n\nUser: question {len(latencies)}\nBot: answer")[-4000:]
+        if work_ms:
+            time.sleep(work_ms / 1000)
+        start = time.perf_counter()
+        store.save(consultation, state)
+        latencies.append((elapsed + time.perf_counter() - start) * 1000)
+    results.put((latencies, store.stats()["conflicts"]))
+
+
+def run(url, n_workers, seconds, work_ms, consultations):
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(url, seconds, work_ms, consultations, results))
+        for _ in range(n_workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    latencies = sorted(ms for worker_latencies, _ in outcomes for ms in worker_latencies)
+    conflicts = sum(count for _, count in outcomes)
+    return len(latencies), latencies, conflicts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--work-ms", type=float, default=0.0)
+    parser.add_argument("--consultations", type=int, default=200)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    server = None
+    url = args.redis_url
+    if url is None:
+        server = RespStandIn(("127.0.0.1", 0))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"redis://127.0.0.1:{server.server_address[1]}/0"
+
+    print(f"store: {url}, pause between restore and save: {args.work_ms:.0f} ms, "
+          f"consultations: {args.consultations}")
+    for n_workers in (int(n) for n in args.workers.split(",")):
+        requests, latencies, conflicts = run(url, n_workers, args.seconds, args.work_ms, args.consultations)
+        p50 = latencies[len(latencies) // 2] if latencies else 0.0
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+        print(f"{n_workers:3d} workers: {requests / args.seconds:8.1f} restore+save/s  "
+              f"p50 {p50:6.2f} ms  p95 {p95:6.2f} ms  conflicts {conflicts}")
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Compare worker memory for large report uploads held in memory versus spilled to disk.
+
+Writes a synthetic PDF of about --size-mb MB (a few lab-result pages plus a large embedded
+image, as in a scanned report), then runs each mode in a fresh process for --uploads uploads
+in one session:
+
+  in-memory  keeps every upload as a BytesIO for the session (as Streamlit's UploadedFile) and
+             extracts text from a copy of its bytes, as the app did before spilling.
+  spooled    receives each upload, spills it to disk in chunks, drops the in-memory copy and
+             extracts text through a memory map.
+
+Reports peak RSS (VmHWM) and RSS after all uploads (VmRSS) above the process's baseline.
+
+Run from the repository root:
+    python benchmarks/bench_upload_memory.py [--size-mb 100] [--uploads 3]
+"""
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHUNK = 1024 * 1024
+LAB_LINES = ["Collected: 2026-03-01", "Creatinine 1.4 mg/dL", "Potassium 4.1 mmol/L", "Hemoglobin 12.9 g/dL"]
+
+
+def write_pdf(path, size_mb, text_pages=4):
+    """A PDF whose pages show lab text; the first page also draws one large uncompressed image."""
+    image_bytes = size_mb * CHUNK
+    side = int((image_bytes / 3) ** 0.5)
+    objects = []  # (number, header bytes, stream writer or None)
+    page_numbers = [5 + i * 2 for i in range(text_pages)]
+    kids = " ".join(f"{n} 0 R" for n in page_numbers)
+    objects.append((1, b"<< /Type /Catalog /Pages 2 0 R >>", None))
+    objects.append((2, f"<< /Type /Pages /Kids [{kids}] /Count {text_pages} >>".encode(), None))
+    objects.append((3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>", None))
+    objects.append((4, f"<< /Type /XObject /Subtype /Image /Width {side} /Height {side} "
+                       f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Length {side * side * 3} >>".encode(), "image"))
+    for i, number in enumerate(page_numbers):
+        lines = " ".join(f"({line}) Tj 0 -16 Td" for line in LAB_LINES + [f"Page {i + 1} of {text_pages}"])
+        draw = "q 200 0 0 200 300 500 cm /Im1 Do Q " if i == 0 else ""
+        content = f"{draw}BT /F1 12 Tf 72 720 Td {lines} ET".encode()
+        xobject = " /XObject << /Im1 4 0 R >>" if i == 0 else ""
+        objects.append((number, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                                f"/Resources << /Font << /F1 3 0 R >>{xobject} >> /Contents {number + 1} 0 R >>".encode(), None))
+        objects.append((number + 1, f"<< /Length {len(content)} >>".encode(), content))
+
+    offsets = {}
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        for number, header, stream in sorted(objects, key=lambda item: item[0]):
+            offsets[number] = f.tell()
+            f.write(f"{number} 0 obj\n".encode() + header)
+            if stream is not None:
+                f.write(b"\nstream\n")
+                if stream == "image":
+                    remaining = side * side * 3
+                    while remaining:
+                        chunk = os.urandom(min(CHUNK, remaining))
+                        f.write(chunk)
+                        remaining -= len(chunk)
+                else:
+                    f.write(stream)
+                f.write(b"\nendstream")
+            f.write(b"\nendobj\n")
+        xref = f.tell()
+        count = max(offsets) + 1
+        f.write(f"xref\n0 {count}\n0000000000 65535 f \n".encode())
+        for number in range(1, count):
+            f.write(f"{offsets[number]:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+def memory_kb():
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS", "VmHWM")):
+                name, value = line.split(":")
+                values[name] = int(value.split()[0])
+    return values
+
+
+def extract_text(reader):
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def run_mode(mode, path, uploads):
+    """Executed in a child process; prints peak and final RSS growth in MB."""
+    import PyPDF2
+    from upload_spool import open_mapped, spill
+
+    baseline = memory_kb()
+    session = []
+    with tempfile.TemporaryDirectory() as spool:
+        for _ in range(uploads):
+            with open(path, "rb") as f:
+                uploaded = io.BytesIO(f.read())  # what the upload widget hands the script
+            if mode == "in-memory":
+                session.append(uploaded)
+                text = extract_text(PyPDF2.PdfReader(io.BytesIO(uploaded.getvalue())))
+            else:
+                upload = spill(uploaded, spool)
+                del uploaded
+                with open_mapped(upload["path"]) as mapped:
+                    text = extract_text(PyPDF2.PdfReader(mapped))
+                session.append(upload)
+            assert "Creatinine" in text
+        after = memory_kb()
+    peak = (after["VmHWM"] - baseline["VmRSS"]) / 1024
+    final = (after["VmRSS"] - baseline["VmRSS"]) / 1024
+    print(f"{mode:10s} peak +{peak:7.1f} MB   after {uploads} uploads +{final:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--uploads", type=int, default=3)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        run_mode(args.mode, args.pdf, args.uploads)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "report.pdf")
+        write_pdf(path, args.size_mb)
+        print(f"{os.path.getsize(path) / CHUNK:.0f} MB PDF, {args.uploads} uploads per session")
+        for mode in ("in-memory", "spooled"):
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode, "--pdf", path, "--uploads", str(args.uploads)],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compare the scalar per-patient vital-sign check with the vectorized cohort validator.
+
+Run from the repository root: python benchmarks/bench_vitals_validation.py [n_patients]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from triage import VITAL_RANGES, normalize_vitals, validate_vital_signs_batch  # noqa: E402
+
+
+def scalar_validate(vitals):
+    """Same loop as app.validate_vital_signs (app.py cannot be imported outside Streamlit)."""
+    for vital, (min_val, max_val) in VITAL_RANGES.items():
+        if vital in vitals:
+            if not min_val <= float(vitals[vital]) <= max_val:
+                return False, f"{vital} is outside normal range"
+    return True, "All vital signs within acceptable ranges"
+
+
+def make_cohort(n_patients, seed=0):
+    rng = np.random.default_rng(seed)
+    systolic = rng.integers(60, 220, n_patients)
+    diastolic = rng.integers(30, 140, n_patients)
+    columns = {
+        "temperature": rng.normal(37.0, 1.2, n_patients).round(1),
+        "heart_rate": rng.integers(30, 210, n_patients),
+        "blood_pressure": np.char.add(np.char.add(systolic.astype(str), "/"), diastolic.astype(str)),
+        "oxygen_saturation": rng.integers(65, 101, n_patients),
+        "respiratory_rate": rng.integers(5, 45, n_patients),
+    }
+    records = [
+        {name: (values[i].item() if hasattr(values[i], "item") else values[i]) for name, values in columns.items()}
+        for i in range(n_patients)
+    ]
+    return columns, records
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    n_patients = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    columns, records = make_cohort(n_patients)
+
+    scalar_time, scalar = timed(lambda: [scalar_validate(normalize_vitals(r)) for r in records])
+    records_time, from_records = timed(lambda: validate_vital_signs_batch(records))
+    columnar_time, from_columns = timed(lambda: validate_vital_signs_batch(columns))
+
+    scalar_valid = np.array([ok for ok, _ in scalar])
+    assert (scalar_valid == from_columns["valid"]).all()
+    assert (from_records["violations"] == from_columns["violations"]).all()
+
+    print(f"patients: {n_patients}")
+    print(f"scalar loop (first failure only): {scalar_time * 1e3:9.1f} ms")
+    print(f"batch from per-patient dicts:     {records_time * 1e3:9.1f} ms  ({scalar_time / records_time:5.1f}x)")
+    print(f"batch from columnar arrays:       {columnar_time * 1e3:9.1f} ms  ({scalar_time / columnar_time:5.1f}x)")
+    print(f"patients with violations: {int((~from_columns['valid']).sum())}")
+    for name, count in zip(from_columns["columns"], from_columns["violations"].sum(axis=0)):
+        print(f"  {name:<26} {int(count)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Callable, List, TypeVar
+
+from hedging import StreamWatcher
+from profiling import profiled_task
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-call")
+
+
+class CancellationScope:
+    """Ties a session's in-flight LLM calls to its current script run so superseded calls are aborted.
+
+    Calls run in a worker thread while the script thread polls and calls `heartbeat`, a cheap
+    Streamlit update. When the user triggers a rerun, Streamlit raises its control exception
+    from that heartbeat; the call is then cancelled through its StreamWatcher, which aborts
+    the upstream token stream. `begin_run` also cancels leftovers from the previous run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: List[StreamWatcher] = []
+        self.metrics = {"calls": 0, "cancelled_calls": 0, "tokens_saved": 0}
+
+    def begin_run(self) -> None:
+        """Cancel every call still in flight from an earlier script run."""
+        with self._lock:
+            active, self._active = self._active, []
+        for watcher in active:
+            self._cancel(watcher)
+
+    def run(self, fn: Callable[[List], T], heartbeat: Callable[[], None], poll_interval: float = 0.25) -> T:
+        """Run `fn(callbacks)` in a worker, cancelling it if the script run is interrupted."""
+        watcher = StreamWatcher()
+        with self._lock:
+            self._active.append(watcher)
+            self.metrics["calls"] += 1
+
+        def call():
+            with watcher.watching():
+                return fn([watcher])
+
+        future = _executor.submit(profiled_task(call))
+        try:
+            while True:
+                try:
+                    return future.result(timeout=poll_interval)
+                except TimeoutError:
+                    heartbeat()
+        finally:
+            with self._lock:
+                if watcher in self._active:
+                    self._active.remove(watcher)
+                    if not future.done():
+                        self._cancel(watcher)
+
+    def _cancel(self, watcher: StreamWatcher) -> None:
+        if watcher.cancelled.is_set():
+            return
+        saved = watcher.unused_budget()  # before cancelling ends the runs
+        watcher.cancel()
+        self.metrics["cancelled_calls"] += 1
+        self.metrics["tokens_saved"] += saved
+
+    def shutdown(self) -> None:
+        """Cancel everything in flight; used when the session is evicted."""
+        self.begin_run()
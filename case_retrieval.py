@@ -0,0 +1,355 @@
+"""Similar-case retrieval over saved consultations.
+
+Usage:
+    python case_retrieval.py reindex [directory]   rebuild from consultation_*.json files
+    python case_retrieval.py build-ann             build IVF lists for approximate search
+"""
+import contextlib
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialised within the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CASE_INDEX_DIR = os.getenv("CASE_INDEX_DIR", "case_index")
+# Sentence-embedding model loaded from the local Hugging Face cache; the hashing embedder is used
+# when it (or torch) is unavailable. Each embedder keeps its own index under CASE_INDEX_DIR, so
+# switching embedders starts (or resumes) that embedder's index instead of discarding another's.
+EMBEDDING_MODEL = os.getenv("CASE_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_DOWNLOAD = os.getenv("CASE_EMBEDDING_DOWNLOAD", "0") == "1"
+HASHING_DIM = 512
+
+# Approximate search (inverted-file / IVF over k-means lists) is used once built and the index
+# has at least ANN_MIN_CASES rows; rows added after the build are always scanned exactly.
+ANN_MIN_CASES = int(os.getenv("CASE_ANN_MIN_CASES", "20000"))
+ANN_PROBES = int(os.getenv("CASE_ANN_PROBES", "16"))
+
+CONTEXT_CHARS = 240  # per retrieved case in the prompt
+REINDEX_BATCH = 1024  # consultations read per add_many call when rebuilding
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was were with "
+    "patient patients none not no history medications allergies".split()
+)
+
+
+class HashingEmbedder:
+    """Feature-hashed unigrams and bigrams with sublinear weights, L2-normalised; needs no model."""
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = [word for word in _TOKEN.findall(text.lower()) if word not in _STOPWORDS]
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                digest = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class TransformerEmbedder:
+    """Mean-pooled sentence embeddings from a local Hugging Face encoder."""
+
+    def __init__(self, model_name: str):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=not EMBEDDING_DOWNLOAD)
+        self.model = AutoModel.from_pretrained(model_name, local_files_only=not EMBEDDING_DOWNLOAD).eval()
+        self.dim = self.model.config.hidden_size
+        self.name = model_name
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        batch = self.tokenizer(list(texts), padding=True, truncation=True, max_length=256, return_tensors="pt")
+        with self._torch.no_grad():
+            hidden = self.model(**batch).last_hidden_state
+        mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1)
+        pooled = self._torch.nn.functional.normalize(pooled, dim=1)
+        return pooled.numpy().astype(np.float32)
+
+
+@functools.lru_cache(maxsize=1)
+def get_embedder():
+    """The configured sentence encoder if available offline, else the hashing embedder.
+
+    Only a missing dependency (ImportError) or missing model files (OSError from the offline
+    Hugging Face loader) fall back; any other failure is a real error and propagates.
+    """
+    try:
+        return TransformerEmbedder(EMBEDDING_MODEL)
+    except (ImportError, OSError) as e:
+        logger.warning("Embedding model %s unavailable (%s); using hashed features", EMBEDDING_MODEL, e)
+        return HashingEmbedder()
+
+
+def embedder_directory(root: str, embedder) -> str:
+    """Index directory for `embedder` under `root`."""
+    return os.path.join(root, re.sub(r"[^A-Za-z0-9._-]+", "_", embedder.name))
+
+
+def _text(value) -> str:
+    if isinstance(value, dict):
+        return ", ".join(f"{key} {item}" for key, item in value.items() if item is not None)
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(item) for item in value)
+    return "" if value is None else str(value)
+
+
+def case_text(patient_data: Dict, narrative: str) -> str:
+    """Text embedded for a case: the clinically relevant profile fields plus the narrative."""
+    patient_data = patient_data or {}
+    return (
+        f"{narrative}\nHistory: {_text(patient_data.get('medical_history'))}\n"
+        f"Medications: {_text(patient_data.get('current_medications'))}\n"
+        f"Allergies: {_text(patient_data.get('allergies'))}"
+    )
+
+
+def consultation_case(filename: str, record: Dict) -> Tuple[Dict, str]:
+    """Compact metadata and embedding text for a consultation saved by save_consultation_summary."""
+    summary = record.get("consultation_summary") or ""
+    patient_data = record.get("patient_data") or {}
+    case = {
+        "filename": os.path.basename(filename),
+        "timestamp": record.get("timestamp"),
+        "age": patient_data.get("age"),
+        "gender": patient_data.get("gender"),
+        "summary": " ".join(summary.split())[:CONTEXT_CHARS],
+    }
+    return case, case_text(patient_data, summary)
+
+
+class CaseIndex:
+    """Embeddings of past consultations in a memory-mapped float32 matrix, with exact or IVF search.
+
+    `vectors.f32` holds one L2-normalised row per case (appended as consultations are saved) and
+    `cases.jsonl` the matching compact metadata, so every worker process shares one copy through
+    the page cache and picks up rows appended by others on its next search. The files live in a
+    subdirectory of `root` named after the embedder (see `embedder_directory`).
+    """
+
+    def __init__(self, root: str = CASE_INDEX_DIR, embedder=None):
+        self.embedder = embedder or get_embedder()
+        self.directory = directory = embedder_directory(root, self.embedder)
+        self.dim = self.embedder.dim
+        self._lock = threading.Lock()
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._cases_path = os.path.join(directory, "cases.jsonl")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._ivf_path = os.path.join(directory, "ivf.npz")
+        self._matrix: Optional[np.ndarray] = None
+        self._cases: List[Dict] = []
+        self._cases_offset = 0
+        self._ivf = None
+        self._ivf_mtime = None
+        os.makedirs(directory, exist_ok=True)
+        self._check_embedder()
+
+    def _check_embedder(self) -> None:
+        """Refuse an index written by a different embedder (or dimension) rather than mixing rows."""
+        meta = {"embedder": self.embedder.name, "dim": self.dim}
+        with self._file_lock():
+            if os.path.exists(self._meta_path):
+                with open(self._meta_path) as f:
+                    stored = json.load(f)
+                if stored != meta:
+                    raise ValueError(
+                        f"Case index in {self.directory} was built with {stored}, not {meta}; "
+                        "remove the directory and run `python case_retrieval.py reindex` to rebuild it"
+                    )
+                return
+            with open(self._meta_path + ".tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(self._meta_path + ".tmp", self._meta_path)
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process writing to this index directory."""
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def clear(self) -> None:
+        """Remove every indexed case (and the IVF lists), e.g. before a rebuild."""
+        with self._file_lock():
+            for path in (self._vectors_path, self._cases_path, self._ivf_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        with self._lock:
+            self._matrix, self._cases, self._cases_offset = None, [], 0
+            self._ivf = self._ivf_mtime = None
+
+    def __len__(self) -> int:
+        self._refresh()
+        return 0 if self._matrix is None else len(self._matrix)
+
+    def _refresh(self) -> None:
+        """Map rows (and read metadata) appended since the last call, by this or another process."""
+        with self._lock:
+            size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+            rows = size // (4 * self.dim)
+            if os.path.exists(self._cases_path):
+                with open(self._cases_path) as f:
+                    f.seek(self._cases_offset)
+                    for line in f:
+                        if not line.endswith("\n"):
+                            break
+                        self._cases.append(json.loads(line))
+                        self._cases_offset += len(line.encode("utf-8"))
+            rows = min(rows, len(self._cases))
+            if rows and (self._matrix is None or len(self._matrix) != rows):
+                self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            ivf_mtime = os.path.getmtime(self._ivf_path) if os.path.exists(self._ivf_path) else None
+            if ivf_mtime != self._ivf_mtime:
+                self._ivf, self._ivf_mtime = None, ivf_mtime
+                if ivf_mtime is not None:
+                    with np.load(self._ivf_path) as ivf:
+                        self._ivf = {name: ivf[name] for name in ivf.files}
+
+    def add_many(self, cases: Sequence[Dict], texts: Sequence[str], batch_size: int = 256) -> None:
+        """Append cases (compact metadata dicts) with the texts to embed for them."""
+        with self._file_lock():
+            with open(self._vectors_path, "ab") as vectors, open(self._cases_path, "a") as meta:
+                for start in range(0, len(texts), batch_size):
+                    embedded = self.embedder.embed(texts[start:start + batch_size])
+                    for case in cases[start:start + batch_size]:
+                        meta.write(json.dumps(case, separators=(",", ":")) + "\n")
+                    meta.flush()
+                    vectors.write(embedded.astype(np.float32).tobytes())
+
+    def add_consultation(self, filename: str, record: Dict) -> None:
+        """Index a consultation as saved by save_consultation_summary."""
+        case, text = consultation_case(filename, record)
+        self.add_many([case], [text])
+
+    def build_ann(self, lists: Optional[int] = None, iterations: int = 10, sample: int = 50_000) -> None:
+        """Cluster the current rows into `lists` k-means lists (default about sqrt(n)) for IVF search."""
+        self._refresh()
+        if self._matrix is None:
+            return
+        n = len(self._matrix)
+        lists = lists or max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        training = np.asarray(self._matrix[np.sort(rng.choice(n, min(n, sample), replace=False))])
+        centroids = training[rng.choice(len(training), lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(training @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, training)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.where(norms > 0, sums / np.where(norms == 0, 1, norms), centroids)
+
+        assignment = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 65536):
+            assignment[start:start + 65536] = np.argmax(self._matrix[start:start + 65536] @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable").astype(np.int32)
+        offsets = np.searchsorted(assignment[order], np.arange(lists + 1)).astype(np.int64)
+        np.savez(self._ivf_path, centroids=centroids.astype(np.float32), order=order, offsets=offsets,
+                 rows=np.array([n]))
+
+    def _candidates(self, query: np.ndarray, probes: int) -> np.ndarray:
+        ivf = self._ivf
+        nearest = np.argpartition(-(ivf["centroids"] @ query), min(probes, len(ivf["centroids"]) - 1))[:probes]
+        offsets, order = ivf["offsets"], ivf["order"]
+        rows = [order[offsets[i]:offsets[i + 1]] for i in nearest]
+        tail = np.arange(int(ivf["rows"][0]), len(self._matrix), dtype=np.int32)
+        candidates = np.sort(np.concatenate(rows + [tail]))
+        return candidates[candidates < len(self._matrix)]
+
+    def search(self, text: str, k: int = 3, ann: Optional[bool] = None, min_score: float = 0.0) -> List[Dict]:
+        """Top-k most similar past cases to `text`, each with its cosine similarity as `score`."""
+        self._refresh()
+        matrix = self._matrix
+        if matrix is None or not text.strip():
+            return []
+        query = self.embedder.embed([text])[0]
+        use_ann = self._ivf is not None and (ann if ann is not None else len(matrix) >= ANN_MIN_CASES)
+        if use_ann:
+            rows = self._candidates(query, ANN_PROBES)
+            scores = matrix[rows] @ query
+        else:
+            rows = None
+            scores = matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for index in top:
+            if scores[index] <= min_score:
+                continue
+            row = int(rows[index]) if rows is not None else int(index)
+            results.append({**self._cases[row], "score": float(scores[index])})
+        return results
+
+
+def similar_cases_context(cases: List[Dict]) -> str:
+    """Compact prompt context for retrieved cases, one line each."""
+    if not cases:
+        return "None found"
+    lines = []
+    for case in cases:
+        who = ", ".join(str(part) for part in (case.get("age"), case.get("gender")) if part)
+        lines.append(f"- ({who or 'unknown'}; similarity {case['score']:.2f}) {case['summary']}")
+    return "\n".join(lines)
+
+
+def main():
+    import argparse
+    import glob
+    import time
+
+    parser = argparse.ArgumentParser(description="Similar-case index over saved consultations.")
+    parser.add_argument("--index", default=CASE_INDEX_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    reindex = commands.add_parser("reindex", help="rebuild the index from saved consultation files")
+    reindex.add_argument("directory", nargs="?", default=".")
+    commands.add_parser("build-ann", help="(re)build the IVF lists for approximate search")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "reindex":
+        index = CaseIndex(args.index)
+        index.clear()
+        cases, texts = [], []
+        for filename in sorted(glob.glob(os.path.join(args.directory, "consultation_*.json"))):
+            try:
+                with open(filename) as f:
+                    case, text = consultation_case(filename, json.load(f))
+            except (OSError, ValueError):
+                continue
+            cases.append(case)
+            texts.append(text)
+            if len(cases) == REINDEX_BATCH:
+                index.add_many(cases, texts)
+                cases, texts = [], []
+        if cases:
+            index.add_many(cases, texts)
+        print(f"Indexed {len(index)} cases in {time.perf_counter() - start:.1f} s")
+    else:
+        index = CaseIndex(args.index)
+        index.build_ann()
+        print(f"Built IVF lists over {len(index)} cases in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
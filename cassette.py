@@ -0,0 +1,230 @@
+import gzip
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel, generate_from_stream
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from model_router import estimate_tokens
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialised within the process
+    fcntl = None
+
+LATENCY_MODES = ("recorded", "zero")
+
+
+class CassetteMiss(KeyError):
+    """Replay was asked for a prompt the cassette has no recording of."""
+
+
+def _messages(messages: List[BaseMessage]) -> List[Dict[str, str]]:
+    return [{"role": message.type, "content": message.content} for message in messages]
+
+
+def cassette_key(model: str, messages: List[Dict[str, str]]) -> str:
+    """Fingerprint a call by model and exact prompt; generation settings are left out on purpose,
+    since the router's learned token budgets change them from run to run."""
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+class Cassette:
+    """Recorded LLM calls in a gzip-compressed JSON-lines file.
+
+    Each record holds the prompt, the response split into its streamed chunks, prompt and
+    completion token counts, time to first token and total latency. Recording appends one
+    gzip member per call under an exclusive lock on `<path>.lock`, so a cassette can grow
+    across sessions and worker processes without interleaved members.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict] = {}
+        self._by_model: Dict[str, List[Dict]] = {}
+        self.metrics = {"recorded": 0, "hits": 0, "near_hits": 0, "misses": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(path):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._add(json.loads(line))
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _add(self, record: Dict) -> None:
+        self._records[record["key"]] = record
+        self._by_model.setdefault(record["model"], []).append(record)
+
+    def append(self, record: Dict) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock, open(self.path + ".lock", "w") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            self._add(record)
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+            self.metrics["recorded"] += 1
+
+    def lookup(self, key: str, model: str, strict: bool = True) -> Dict:
+        """The recording for `key`; unless `strict`, a deterministic stand-in recorded for the same model."""
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                self.metrics["hits"] += 1
+                return record
+            candidates = self._by_model.get(model) or [r for rs in self._by_model.values() for r in rs]
+            if strict or not candidates:
+                self.metrics["misses"] += 1
+                raise CassetteMiss(f"no recording for {model} prompt {key[:12]}")
+            self.metrics["near_hits"] += 1
+            return candidates[int(key, 16) % len(candidates)]
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-model latency and token distributions of the recorded calls."""
+        with self._lock:
+            by_model = {model: list(records) for model, records in self._by_model.items()}
+        return {
+            model: {
+                "calls": len(records),
+                "p50_first_token_ms": _percentile([r["first_token_ms"] for r in records], 50),
+                "p95_first_token_ms": _percentile([r["first_token_ms"] for r in records], 95),
+                "p50_total_ms": _percentile([r["total_ms"] for r in records], 50),
+                "p95_total_ms": _percentile([r["total_ms"] for r in records], 95),
+                "p95_completion_tokens": _percentile([r["completion_tokens"] for r in records], 95),
+            }
+            for model, records in by_model.items()
+        }
+
+
+class RecordingChatModel(BaseChatModel):
+    """Pass calls through to a live chat model and append each one to a cassette."""
+
+    inner: BaseChatModel
+    cassette: Any
+    model_name: str
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-recording"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        start = time.perf_counter()
+        first_token_ms = None
+        if getattr(self.inner, "streaming", False):
+            chunks = []
+            for chunk in self.inner._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                chunks.append(chunk)
+            result = generate_from_stream(iter(chunks))
+            chunk_lengths = [len(chunk.text) for chunk in chunks if chunk.text]
+        else:
+            result = self.inner._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            chunk_lengths = [len(result.generations[0].text)]
+        total_ms = (time.perf_counter() - start) * 1000
+
+        prompt = _messages(messages)
+        text = result.generations[0].text
+        usage = getattr(result.generations[0].message, "usage_metadata", None) or {}
+        token_usage = (result.llm_output or {}).get("token_usage") or {}
+        self.cassette.append({
+            "key": cassette_key(self.model_name, prompt),
+            "model": self.model_name,
+            "messages": prompt,
+            "response": text,
+            "chunks": chunk_lengths,
+            "prompt_tokens": usage.get("input_tokens") or token_usage.get("prompt_tokens")
+                             or estimate_tokens("".join(m["content"] for m in prompt)),
+            "completion_tokens": usage.get("output_tokens") or token_usage.get("completion_tokens")
+                                 or estimate_tokens(text),
+            "first_token_ms": round(first_token_ms if first_token_ms is not None else total_ms, 1),
+            "total_ms": round(total_ms, 1),
+        })
+        return result
+
+
+class ReplayChatModel(BaseChatModel):
+    """Serve recorded responses instead of calling the provider.
+
+    Tokens are emitted through the callbacks chunk by chunk as they were recorded, with the
+    recorded time to first token and inter-chunk pacing (`latency="recorded"`) or none at all
+    (`latency="zero"`), so streaming, hedging and cancellation behave as they would live.
+    An unrecorded prompt raises CassetteMiss unless `strict` is turned off, in which case a
+    recording of another prompt for the same model stands in (for load tests only).
+    """
+
+    cassette: Any
+    model_name: str
+    latency: str = "recorded"
+    strict: bool = True
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette-replay"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = _messages(messages)
+        record = self.cassette.lookup(cassette_key(self.model_name, prompt), self.model_name, self.strict)
+        text = record["response"]
+        paced = self.latency == "recorded"
+        lengths = record["chunks"] or [len(text)]
+        interval = max(0.0, record["total_ms"] - record["first_token_ms"]) / 1000 / max(1, len(lengths) - 1)
+
+        if paced:
+            time.sleep(record["first_token_ms"] / 1000)
+        position = 0
+        for index, length in enumerate(lengths):
+            if paced and index:
+                time.sleep(interval)
+            token = text[position:position + length]
+            position += length
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+        message = AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": record["prompt_tokens"],
+                "output_tokens": record["completion_tokens"],
+                "total_tokens": record["prompt_tokens"] + record["completion_tokens"],
+            },
+        )
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"model_name": self.model_name, "replayed_from": record["key"]},
+        )
@@ -0,0 +1,235 @@
+"""Columnar (Parquet) export of saved consultations for analytics.
+
+Streams consultation_*.json files into a hive-partitioned Parquet dataset
+(`year=YYYY/month=MM/part-*.parquet`) with patient_data flattened into typed columns and each
+vital sign as its own numeric column. Runs are incremental: files already exported are listed
+in the dataset's `_manifest.txt` and skipped. Each batch's Parquet files are named after the
+batch's contents and announced in `_pending.json` before they are written, so a run interrupted
+before the manifest was updated is rolled back (not exported twice) by the next one.
+
+Usage:
+    python consultation_export.py [source_dir] [--dest consultation_export] [--full]
+
+Query with pyarrow (or DuckDB/Polars/Spark over the same files):
+    import pyarrow.dataset as ds
+    table = ds.dataset("consultation_export", partitioning="hive").to_table(
+        columns=["severity", "temperature"], filter=ds.field("year") == 2026)
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from triage import split_blood_pressure
+
+EXPORT_DIR = os.getenv("CONSULTATION_EXPORT_DIR", "consultation_export")
+FILE_PATTERN = "consultation_*.json"
+MANIFEST = "_manifest.txt"
+PENDING = "_pending.json"
+BATCH_SIZE = 5000
+
+NUMERIC_VITALS = ("temperature", "heart_rate", "oxygen_saturation", "respiratory_rate")
+LIST_FIELDS = ("medical_history", "current_medications", "allergies")
+
+SCHEMA = pa.schema([
+    ("consultation_id", pa.string()),
+    ("saved_at", pa.timestamp("s")),
+    ("age", pa.int16()),
+    ("gender", pa.string()),
+    *((field, pa.list_(pa.string())) for field in LIST_FIELDS),
+    ("temperature", pa.float32()),
+    ("heart_rate", pa.float32()),
+    ("blood_pressure_systolic", pa.float32()),
+    ("blood_pressure_diastolic", pa.float32()),
+    ("oxygen_saturation", pa.float32()),
+    ("respiratory_rate", pa.float32()),
+    ("severity", pa.string()),
+    ("diagnoses", pa.list_(pa.string())),
+    ("summary", pa.string()),
+])
+
+_SEVERITY = re.compile(r"severity[^:\n]{0,40}:\W*(low|medium|high)", re.IGNORECASE)
+
+
+def _saved_at(record: Dict, filename: str) -> datetime:
+    try:
+        return datetime.strptime(record["timestamp"], "%Y%m%d_%H%M%S")
+    except (KeyError, TypeError, ValueError):
+        return datetime.fromtimestamp(int(os.path.getmtime(filename)))
+
+
+def _severity(record: Dict) -> Optional[str]:
+    """Severity from the structured assessment if saved, else from the summary text."""
+    severity = (record.get("assessment") or {}).get("severity")
+    if severity:
+        return severity
+    match = _SEVERITY.search(record.get("consultation_summary") or "")
+    return match.group(1).capitalize() if match else None
+
+
+def _string_list(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = [value]
+    return [str(item) for item in value if str(item).strip()]
+
+
+def _float_column(values: Iterable) -> np.ndarray:
+    column = []
+    for value in values:
+        try:
+            column.append(float(value))
+        except (TypeError, ValueError):
+            column.append(np.nan)
+    return np.asarray(column, dtype=np.float32)
+
+
+def records_to_table(rows: List[tuple]) -> pa.Table:
+    """Flatten `(filename, record)` pairs into one Arrow table with SCHEMA."""
+    patients = [record.get("patient_data") or {} for _, record in rows]
+    vitals = [patient.get("vital_signs") or {} for patient in patients]
+    systolic, diastolic = split_blood_pressure([v.get("blood_pressure") or "" for v in vitals])
+    ages = [patient.get("age") for patient in patients]
+    columns = {
+        "consultation_id": [os.path.splitext(os.path.basename(filename))[0] for filename, _ in rows],
+        "saved_at": [_saved_at(record, filename) for filename, record in rows],
+        "age": [int(age) if isinstance(age, (int, float)) else None for age in ages],
+        "gender": [patient.get("gender") or None for patient in patients],
+        **{field: [_string_list(patient.get(field)) for patient in patients] for field in LIST_FIELDS},
+        **{name: _float_column(v.get(name) for v in vitals) for name in NUMERIC_VITALS},
+        "blood_pressure_systolic": systolic.astype(np.float32),
+        "blood_pressure_diastolic": diastolic.astype(np.float32),
+        "severity": [_severity(record) for _, record in rows],
+        "diagnoses": [
+            [d.get("name") for d in (record.get("assessment") or {}).get("diagnoses", []) if d.get("name")]
+            for _, record in rows
+        ],
+        "summary": [record.get("consultation_summary") or "" for _, record in rows],
+    }
+    arrays = []
+    for field in SCHEMA:
+        values = columns[field.name]
+        if pa.types.is_floating(field.type):
+            arrays.append(pa.array(values, type=field.type, from_pandas=True))  # NaN -> null
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=SCHEMA)
+
+
+def _read_records(filenames: Iterable[str]) -> Iterator[tuple]:
+    for filename in filenames:
+        try:
+            with open(filename) as f:
+                yield filename, json.load(f)
+        except (OSError, ValueError):
+            continue
+
+
+def _batches(items: Iterator[tuple], size: int) -> Iterator[List[tuple]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _load_manifest(dest: str) -> Set[str]:
+    path = os.path.join(dest, MANIFEST)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def _write_json(path: str, value) -> None:
+    with open(path + ".tmp", "w") as f:
+        json.dump(value, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def _recover(dest: str, exported: Set[str]) -> None:
+    """Settle a batch an earlier run left between writing its Parquet files and the manifest.
+
+    If the manifest lists all of the batch's consultations the files are kept; otherwise they are
+    deleted and the consultations are exported again.
+    """
+    path = os.path.join(dest, PENDING)
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        pending = json.load(f)
+    if not set(pending["files"]) <= exported:
+        for part in pending["parts"]:
+            if os.path.exists(os.path.join(dest, part)):
+                os.remove(os.path.join(dest, part))
+    os.remove(path)
+
+
+def export(source: str = ".", dest: str = EXPORT_DIR, full: bool = False, batch_size: int = BATCH_SIZE) -> int:
+    """Append consultations not yet exported to the partitioned dataset; returns how many were written."""
+    if full and os.path.exists(dest):
+        shutil.rmtree(dest)
+    os.makedirs(dest, exist_ok=True)
+    exported = _load_manifest(dest)
+    _recover(dest, exported)
+    pending = (
+        filename for filename in sorted(glob.glob(os.path.join(source, FILE_PATTERN)))
+        if os.path.basename(filename) not in exported
+    )
+    written = 0
+    with open(os.path.join(dest, MANIFEST), "a") as manifest:
+        for batch in _batches(_read_records(pending), batch_size):
+            names = [os.path.basename(filename) for filename, _ in batch]
+            digest = hashlib.sha256("\n".join(names).encode("utf-8")).hexdigest()[:16]
+            table = records_to_table(batch)
+            saved_at = table.column("saved_at").to_numpy()
+            partitions = saved_at.astype("datetime64[M]")
+            parts = {}
+            for month in np.unique(partitions):
+                year_value, month_value = str(month).split("-")  # month stays zero-padded: month=03
+                parts[month] = os.path.join(f"year={year_value}", f"month={month_value}", f"part-{digest}.parquet")
+            _write_json(os.path.join(dest, PENDING), {"files": names, "parts": list(parts.values())})
+            for month, part in parts.items():
+                path = os.path.join(dest, part)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                pq.write_table(
+                    table.filter(pa.array(partitions == month)), path + ".tmp", compression="zstd"
+                )
+                os.replace(path + ".tmp", path)
+            manifest.writelines(name + "\n" for name in names)
+            manifest.flush()
+            os.fsync(manifest.fileno())
+            os.remove(os.path.join(dest, PENDING))
+            written += len(batch)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export saved consultations to partitioned Parquet.")
+    parser.add_argument("source", nargs="?", default=".")
+    parser.add_argument("--dest", default=EXPORT_DIR)
+    parser.add_argument("--full", action="store_true", help="rebuild the dataset from scratch")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    count = export(args.source, args.dest, args.full)
+    print(f"Exported {count} consultations to {args.dest} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Full-text index over saved consultations.
+
+Usage:
+    python consultation_index.py reindex [directory]          rebuild from consultation_*.json files
+    python consultation_index.py search "pneumonia" [--days 7] [--limit 20] [--recent]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+INDEX_PATH = os.getenv("CONSULTATION_INDEX_PATH", "consultation_index.sqlite")
+FILE_PATTERN = "consultation_*.json"
+
+# Patient fields indexed alongside the summary, each searchable as its own FTS column.
+INDEXED_FIELDS = ("medical_history", "current_medications", "allergies", "vital_signs")
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS consultations (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL UNIQUE,
+    saved_at TEXT NOT NULL,
+    age INTEGER,
+    gender TEXT,
+    summary TEXT NOT NULL,
+    {", ".join(f"{field} TEXT" for field in INDEXED_FIELDS)}
+);
+CREATE INDEX IF NOT EXISTS consultations_saved_at ON consultations (saved_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS consultations_fts USING fts5(
+    summary, {", ".join(INDEXED_FIELDS)},
+    content='consultations', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS consultations_ai AFTER INSERT ON consultations BEGIN
+    INSERT INTO consultations_fts (rowid, summary, {", ".join(INDEXED_FIELDS)})
+    VALUES (new.id, new.summary, {", ".join(f"new.{field}" for field in INDEXED_FIELDS)});
+END;
+CREATE TRIGGER IF NOT EXISTS consultations_ad AFTER DELETE ON consultations BEGIN
+    INSERT INTO consultations_fts (consultations_fts, rowid, summary, {", ".join(INDEXED_FIELDS)})
+    VALUES ('delete', old.id, old.summary, {", ".join(f"old.{field}" for field in INDEXED_FIELDS)});
+END;
+"""
+
+
+def _field_text(value) -> str:
+    if isinstance(value, dict):
+        return " ".join(f"{key} {item}" for key, item in value.items() if item is not None)
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(item) for item in value)
+    return "" if value is None else str(value)
+
+
+def _saved_at(record: Dict, filename: str) -> str:
+    """ISO timestamp of a saved consultation, from its `timestamp` field or else the file's mtime."""
+    try:
+        return datetime.strptime(record["timestamp"], "%Y%m%d_%H%M%S").isoformat()
+    except (KeyError, TypeError, ValueError):
+        return datetime.fromtimestamp(os.path.getmtime(filename)).isoformat(timespec="seconds")
+
+
+def match_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching all of its words (prefix match on the last one)."""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+
+class ConsultationIndex:
+    """SQLite FTS5 index over saved consultation summaries and patient fields, ranked by BM25."""
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _row(self, filename: str, record: Dict) -> tuple:
+        patient = record.get("patient_data") or {}
+        return (
+            os.path.basename(filename),
+            _saved_at(record, filename),
+            patient.get("age"),
+            patient.get("gender"),
+            record.get("consultation_summary") or "",
+            *(_field_text(patient.get(field)) for field in INDEXED_FIELDS),
+        )
+
+    def _upsert(self, rows: Iterable[tuple]) -> int:
+        count = 0
+        for row in rows:
+            # Delete-then-insert keeps the FTS table in step through the triggers.
+            self._conn.execute("DELETE FROM consultations WHERE filename = ?", (row[0],))
+            self._conn.execute(
+                f"INSERT INTO consultations (filename, saved_at, age, gender, summary, {', '.join(INDEXED_FIELDS)}) "
+                f"VALUES ({', '.join('?' * (5 + len(INDEXED_FIELDS)))})",
+                row,
+            )
+            count += 1
+        return count
+
+    def add(self, filename: str, record: Dict) -> None:
+        """Index (or re-index) one saved consultation; called on every save."""
+        self.add_many([(filename, record)])
+
+    def add_many(self, records: Iterable[tuple]) -> int:
+        """Index `(filename, record)` pairs in a single transaction."""
+        with self._lock, self._conn:
+            return self._upsert(self._row(filename, record) for filename, record in records)
+
+    def reindex(self, directory: str = ".") -> int:
+        """Rebuild the index from every consultation file in `directory` in one transaction."""
+        def records():
+            for filename in sorted(glob.glob(os.path.join(directory, FILE_PATTERN))):
+                try:
+                    with open(filename) as f:
+                        yield filename, json.load(f)
+                except (OSError, ValueError):
+                    continue
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM consultations")
+            count = self._upsert(self._row(filename, record) for filename, record in records())
+        with self._lock:
+            self._conn.execute("INSERT INTO consultations_fts (consultations_fts) VALUES ('optimize')")
+            self._conn.commit()
+        return count
+
+    def _rowid_bounds(self, since: Optional[datetime], until: Optional[datetime]) -> tuple:
+        """Row-id range covering every consultation in the window, so FTS5 can skip the rest.
+
+        MIN/MAX over the saved_at index are exact bounds whatever order files were indexed in;
+        the saved_at condition is still applied to the joined rows. The unary `+` keeps SQLite
+        from answering MIN(id) by walking the primary key instead of the saved_at index.
+        """
+        low = high = None
+        if since is not None:
+            low = self._conn.execute(
+                "SELECT MIN(+id) FROM consultations WHERE saved_at >= ?", (since.isoformat(),)
+            ).fetchone()[0]
+        if until is not None:
+            high = self._conn.execute(
+                "SELECT MAX(+id) FROM consultations WHERE saved_at < ?", (until.isoformat(),)
+            ).fetchone()[0]
+        return low, high
+
+    def search(
+        self,
+        text: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 20,
+        order: str = "relevance",
+    ) -> List[Dict]:
+        """Matching consultations for `text`, optionally within a saved-at window.
+
+        `order` is "relevance" (BM25) or "recent" (latest indexed first, which avoids scoring
+        every match and stays sub-millisecond even for terms in most consultations).
+        """
+        query = match_query(text)
+        if not query:
+            return []
+        recent = order == "recent"
+        sql = (
+            "SELECT c.filename, c.saved_at, c.age, c.gender, snippet(consultations_fts, -1, '**', '**', '…', 12), "
+            + ("NULL " if recent else "bm25(consultations_fts) ") +
+            "FROM consultations_fts JOIN consultations c ON c.id = consultations_fts.rowid "
+            "WHERE consultations_fts MATCH ?"
+        )
+        params: list = [query]
+        with self._lock:
+            low, high = self._rowid_bounds(since, until)
+            if (since is not None and low is None) or (until is not None and high is None):
+                return []
+            if low is not None:
+                sql += " AND consultations_fts.rowid >= ? AND c.saved_at >= ?"
+                params += [low, since.isoformat()]
+            if high is not None:
+                sql += " AND consultations_fts.rowid <= ? AND c.saved_at < ?"
+                params += [high, until.isoformat()]
+            sql += " ORDER BY " + ("consultations_fts.rowid DESC" if recent else "bm25(consultations_fts)")
+            sql += " LIMIT ?"
+            params.append(limit)
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {"filename": filename, "saved_at": saved_at, "age": age, "gender": gender, "snippet": snippet, "rank": rank}
+            for filename, saved_at, age, gender, snippet, rank in rows
+        ]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM consultations").fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text index over saved consultations.")
+    parser.add_argument("--index", default=INDEX_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    reindex = commands.add_parser("reindex", help="rebuild the index from saved consultation files")
+    reindex.add_argument("directory", nargs="?", default=".")
+    search = commands.add_parser("search", help="search indexed consultations")
+    search.add_argument("text")
+    search.add_argument("--days", type=float, help="only consultations saved in the last N days")
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--recent", action="store_true", help="order by recency instead of relevance")
+    args = parser.parse_args()
+
+    index = ConsultationIndex(args.index)
+    if args.command == "reindex":
+        start = time.perf_counter()
+        count = index.reindex(args.directory)
+        print(f"Indexed {count} consultations in {time.perf_counter() - start:.1f} s")
+        return
+    since = datetime.now() - timedelta(days=args.days) if args.days else None
+    start = time.perf_counter()
+    results = index.search(args.text, since=since, limit=args.limit, order="recent" if args.recent else "relevance")
+    for result in results:
+        print(f"{result['saved_at']}  {result['filename']}  {result['snippet']}")
+    print(f"{len(results)} results in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
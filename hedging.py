@@ -0,0 +1,287 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+import groq
+import httpx
+import requests
+from langchain_core.callbacks import BaseCallbackHandler
+
+from llm_transport import watch_responses
+from profiling import profiled_task
+
+logger = logging.getLogger(__name__)
+
+# Hedge once the primary has produced no token for this percentile of past first-token latencies.
+# Primaries cancelled or timed out before their first token count as (at least) HEDGE_MAX_DELAY.
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = 10
+HEDGE_DEFAULT_DELAY = 2.0  # seconds, until enough samples are collected
+HEDGE_MIN_DELAY = 0.2
+HEDGE_MAX_DELAY = 5.0
+
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_RESET_TIMEOUT = 30.0  # seconds before an open breaker lets a probe request through (and probe timeout)
+# Failures that say something about a backend's health. Anything else (a prompt or parsing bug)
+# would fail on every backend and must not open the breaker. Ollama is reached through requests.
+BACKEND_ERRORS = (
+    httpx.HTTPError,
+    requests.RequestException,
+    TimeoutError,
+    ConnectionError,
+    groq.APIConnectionError,
+    groq.RateLimitError,
+    groq.InternalServerError,
+)
+
+
+class GenerationCancelled(Exception):
+    """Raised inside a streaming LLM call to abort it."""
+
+
+class StreamWatcher(BaseCallbackHandler):
+    """Callback that records the first streamed token and aborts the stream once cancelled.
+
+    Calls made inside `watching()` also register their HTTP responses, which `cancel` closes so
+    a stalled stream is cut off at once rather than at its next token. One watcher may see several
+    concurrent LLM runs (a fanned-out assessment); each run's token budget (`max_tokens` from the
+    run metadata, else `budget`) and streamed tokens are tracked separately for `unused_budget`.
+    """
+
+    raise_error = True
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token = threading.Event()
+        self.first_token_latency: Optional[float] = None
+        self.cancelled = threading.Event()
+        self.tokens = 0
+        self.budget = 0  # default max_tokens of a run, for cancellation savings accounting
+        self._lock = threading.Lock()
+        self._responses: List[httpx.Response] = []
+        self._runs: Dict = {}  # run id of each LLM run in flight -> [max_tokens, tokens streamed]
+
+    def start(self) -> None:
+        """Restart the first-token clock when the call actually begins (not when it was queued)."""
+        self.started = time.perf_counter()
+
+    def watching(self):
+        return watch_responses(self.attach)
+
+    def attach(self, response: httpx.Response) -> None:
+        with self._lock:
+            self._responses.append(response)
+        if self.cancelled.is_set():
+            _close(response)
+
+    def on_llm_start(self, serialized, prompts, *, run_id=None, metadata=None, **kwargs) -> None:
+        with self._lock:
+            self._runs[run_id] = [(metadata or {}).get("max_tokens") or self.budget, 0]
+
+    def on_llm_end(self, response, *, run_id=None, **kwargs) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+    def on_llm_error(self, error, *, run_id=None, **kwargs) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+    def unused_budget(self) -> int:
+        """Tokens the runs still in flight may yet generate: what cancelling them now saves."""
+        with self._lock:
+            return sum(max(0, budget - streamed) for budget, streamed in self._runs.values())
+
+    def on_llm_new_token(self, token: str, *, run_id=None, **kwargs) -> None:
+        if self.cancelled.is_set():
+            raise GenerationCancelled()
+        with self._lock:
+            self.tokens += 1
+            run = self._runs.get(run_id)
+            if run is not None:
+                run[1] += 1
+        if not self.first_token.is_set():
+            self.first_token_latency = time.perf_counter() - self.started
+            self.first_token.set()
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+        with self._lock:
+            responses, self._responses = self._responses, []
+        for response in responses:
+            _close(response)
+
+
+def _close(response: httpx.Response) -> None:
+    try:
+        response.close()
+    except (RuntimeError, httpx.HTTPError):  # async responses can only be closed from their event loop
+        pass
+
+
+class CircuitBreaker:
+    """Closed → open after consecutive failures; half-open after `reset_timeout`.
+
+    Half-open lets exactly one probe request through: its success closes the breaker, its failure
+    re-opens it. A probe that never reports back (cancelled as a hedge loser, say) frees the slot
+    for another probe after `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        """Whether to send a request; in the half-open state only the first caller gets a yes."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                return False  # a probe is already in flight
+            self._probe_started = now
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = self._probe_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probe_started is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+
+
+class HedgedRunner:
+    """Run an LLM call with a delayed backup request and per-backend circuit breakers.
+
+    Calls are `Callable[[List[callbacks]], str]`, so the runner can attach a StreamWatcher to
+    detect the first token and cancel the losing request.
+    """
+
+    def __init__(self, max_workers: int = 16):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge")
+        self._lock = threading.Lock()
+        self._first_token_latencies: deque = deque(maxlen=500)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.metrics = {"calls": 0, "hedged": 0, "backup_wins": 0, "breaker_reroutes": 0, "cancelled_losers": 0}
+
+    def breaker(self, backend: str) -> CircuitBreaker:
+        with self._lock:
+            return self._breakers.setdefault(backend, CircuitBreaker())
+
+    def _count(self, metric: str) -> None:
+        with self._lock:
+            self.metrics[metric] += 1
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the primary's first token before firing the backup."""
+        with self._lock:
+            samples = sorted(self._first_token_latencies)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        delay = samples[min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE / 100))]
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, delay))
+
+    def run(
+        self,
+        primary: str,
+        primary_call: Callable[[List], str],
+        backup: Optional[str] = None,
+        backup_call: Optional[Callable[[List], str]] = None,
+    ) -> str:
+        """Return the first successful response from the primary or, if it stalls or is degraded, the backup."""
+        self._count("calls")
+        candidates = [(primary, primary_call)]
+        if backup_call is not None:
+            candidates.append((backup, backup_call))
+        if not self.breaker(primary).allow() and backup_call is not None:
+            # Primary is degraded: route around it entirely.
+            self._count("breaker_reroutes")
+            candidates = candidates[1:]
+
+        running = {}
+        self._start(running, *candidates[0], track_latency=candidates[0][0] == primary)
+        waiting = candidates[1:]
+        watcher = running[next(iter(running))][1]
+        if waiting and not watcher.first_token.wait(self.hedge_delay()):
+            if self.breaker(waiting[0][0]).allow():
+                self._count("hedged")
+                logger.info("No first token from %s in time; hedging to %s", primary, backup)
+                self._start(running, *waiting.pop(0))
+
+        error: Optional[BaseException] = None
+        pending = set(running)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, watcher = running[future]
+                try:
+                    result = future.result()
+                except BaseException as e:
+                    if not (isinstance(e, GenerationCancelled) or watcher.cancelled.is_set()):
+                        if isinstance(e, BACKEND_ERRORS):
+                            self.breaker(name).record_failure()
+                        error = e
+                    if not pending and waiting:
+                        # Primary failed before the hedge fired: fall back to the backup now.
+                        self._start(running, *waiting.pop(0))
+                        pending = {f for f in running if not f.done()}
+                    continue
+                self.breaker(name).record_success()
+                for other in pending:
+                    running[other][1].cancel()
+                    self._count("cancelled_losers")
+                if name != primary:
+                    self._count("backup_wins")
+                return result
+        raise error if error is not None else GenerationCancelled()
+
+    def _start(self, running: Dict, name: str, call: Callable[[List], str], track_latency: bool = False) -> None:
+        watcher = StreamWatcher()
+
+        def invoke():
+            watcher.start()
+            latency = None
+            try:
+                with watcher.watching():
+                    result = call([watcher])
+                latency = watcher.first_token_latency
+            except BaseException as e:
+                stalled = watcher.cancelled.is_set() or isinstance(e, (GenerationCancelled, TimeoutError, httpx.TimeoutException))
+                if watcher.first_token_latency is None and stalled:
+                    # Censored sample: the first token would have come later than we waited, if at all.
+                    latency = max(HEDGE_MAX_DELAY, time.perf_counter() - watcher.started)
+                raise
+            finally:
+                # Also wakes the hedge timer when a backend answers without streaming.
+                watcher.first_token.set()
+                if track_latency and latency is not None:
+                    with self._lock:
+                        self._first_token_latencies.append(latency)
+            return result
+
+        # Copy the caller's context so response listeners of an enclosing scope (a CancellationScope) still apply.
+        running[self._executor.submit(contextvars.copy_context().run, profiled_task(invoke))] = (name, watcher)
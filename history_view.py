@@ -0,0 +1,61 @@
+import html
+import time
+from typing import List
+
+from markdown_it import MarkdownIt
+
+TURN_SEPARATOR = "\n\nUser: "
+
+_markdown = MarkdownIt("commonmark", {"html": False})
+
+
+def split_turns(history: str) -> List[str]:
+    """Split a history string built by update_history into "User: ...\\nBot: ..." turns."""
+    if not history:
+        return []
+    turns = history.split(TURN_SEPARATOR)
+    return [turns[0]] + [f"User: {turn}" for turn in turns[1:]]
+
+
+class HistoryRenderCache:
+    """Pre-render conversation turns to HTML once and only render turns appended since the last call."""
+
+    def __init__(self, user_color: str = "#1f77b4", bot_color: str = "#2ecc71"):
+        self.user_color = user_color
+        self.bot_color = bot_color
+        self._source = ""
+        self._turns: List[str] = []
+        self.turns_rendered = 0
+        self.last_render_ms = 0.0
+
+    def render_turn(self, turn: str) -> str:
+        """Render one turn as a chat-message block on a single line, so Markdown treats it as raw HTML."""
+        user_text, _, bot_text = turn.partition("\nBot: ")
+        if user_text.startswith("User: "):
+            user_text = user_text[len("User: "):]
+        body = (
+            f'<strong style="color: {self.user_color};">User:</strong> {html.escape(user_text)}'
+            f'<div><strong style="color: {self.bot_color};">Bot:</strong>{_markdown.render(bot_text)}</div>'
+        )
+        return f'<div class="chat-message">{body}</div>'.replace("\n", "&#10;")
+
+    def render(self, history: str) -> str:
+        """Return the HTML for the whole history, rendering only new turns."""
+        start = time.perf_counter()
+        if not history.startswith(self._source):
+            # History was reset or rewritten; start over.
+            self._source = ""
+            self._turns = []
+        new_text = history[len(self._source):]
+        if new_text:
+            if self._source:
+                new_text = new_text[len(TURN_SEPARATOR) - len("User: "):]
+            new_turns = [self.render_turn(turn) for turn in split_turns(new_text)]
+            self._turns.extend(new_turns)
+            self.turns_rendered += len(new_turns)
+            self._source = history
+        self.last_render_ms = (time.perf_counter() - start) * 1e3
+        return "".join(self._turns)
+
+    def __len__(self) -> int:
+        return len(self._turns)
@@ -0,0 +1,225 @@
+import contextlib
+import hashlib
+import logging
+import os
+import re
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from lab_parsing import LAB_ANALYTES, parse_lab_values
+
+try:
+    import fcntl
+except ImportError:  # Windows: updates are only serialised within the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LAB_HISTORY_DIR = os.getenv("LAB_HISTORY_DIR", "lab_history")
+DAY_FIRST = os.getenv("LAB_DATE_DAY_FIRST", "1") == "1"  # read 03/04/2026 as 3 April
+DIGEST_MAX_TESTS = 8
+
+_MONTHS = {month: number for number, month in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1)}
+_DATE = (
+    r"(?P<iso>\d{4}-\d{1,2}-\d{1,2})"
+    r"|(?P<numeric>\d{1,2}[/.-]\d{1,2}[/.-]\d{4})"
+    r"|(?P<named>\d{1,2}[\s-](?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*[\s-]\d{4})"
+)
+# A date on a collection/report line wins over any other date in the text (e.g. date of birth).
+_KEYWORD_DATE = re.compile(
+    r"(?:collect(?:ed|ion)|sample[d]?|report(?:ed)?|specimen|test)\s*(?:date|on|time)?[^\n\d]{0,20}(?:" + _DATE + ")",
+    re.IGNORECASE,
+)
+
+
+_PATIENT = re.compile(
+    r"\b(?:patient\s*(?:id|name)?|mrn|uhid|hospital\s*(?:no|number))\s*[:#.]\s*(?P<patient>[^\n:]{2,60}?)\s*(?:\s{2,}|\n|$)",
+    re.IGNORECASE,
+)
+
+
+def _to_date(match: re.Match) -> Optional[date]:
+    try:
+        if match.group("iso"):
+            return datetime.strptime(match.group("iso"), "%Y-%m-%d").date()
+        if match.group("numeric"):
+            first, second, year = re.split(r"[/.-]", match.group("numeric"))
+            day, month = (first, second) if DAY_FIRST else (second, first)
+            return date(int(year), int(month), int(day))
+        day, month, year = re.split(r"[\s-]+", match.group("named"))
+        return date(int(year), _MONTHS[month[:3].lower()], int(day))
+    except (ValueError, KeyError):
+        return None
+
+
+def report_date(text: str) -> Optional[date]:
+    """The collection or report date stated in a lab report, if one can be found."""
+    match = _KEYWORD_DATE.search(text or "")
+    return _to_date(match) if match else None
+
+
+def report_patient(text: str) -> Optional[str]:
+    """The patient ID or name stated in a lab report, normalised for comparison, if one can be found."""
+    match = _PATIENT.search(text or "")
+    return " ".join(match.group("patient").lower().split()) if match else None
+
+
+class LabHistory:
+    """One patient's lab results as parallel arrays (test code, date, value) sorted by test then date."""
+
+    def __init__(self, tests=None, dates=None, values=None, reports=()):
+        self.names = tuple(LAB_ANALYTES)
+        self.tests = np.asarray(tests if tests is not None else [], dtype=np.int16)
+        self.dates = np.asarray(dates if dates is not None else [], dtype="datetime64[D]")
+        self.values = np.asarray(values if values is not None else [], dtype=np.float32)
+        self.reports = set(reports)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def record(self, values: Dict[str, float], when: date, report_id: str) -> bool:
+        """Add one report's results; a later report for the same test and date replaces the value."""
+        if report_id in self.reports:
+            return False
+        self.reports.add(report_id)
+        known = [(self.names.index(name), value) for name, value in values.items() if name in self.names]
+        if not known:
+            return True
+        new_tests = np.array([code for code, _ in known], dtype=np.int16)
+        new_dates = np.full(len(known), np.datetime64(when, "D"))
+        new_values = np.array([value for _, value in known], dtype=np.float32)
+        tests = np.concatenate([self.tests, new_tests])
+        dates = np.concatenate([self.dates, new_dates])
+        values = np.concatenate([self.values, new_values])
+        # Stable sort by (test, date) keeps the newest report last among duplicates; keep that one.
+        order = np.lexsort((np.arange(len(tests)), dates, tests))
+        tests, dates, values = tests[order], dates[order], values[order]
+        keep = np.r_[(tests[1:] != tests[:-1]) | (dates[1:] != dates[:-1]), True]
+        self.tests, self.dates, self.values = tests[keep], dates[keep], values[keep]
+        return True
+
+    def trends(self) -> Dict[str, Dict]:
+        """Per-test first/previous/latest value, change and least-squares slope, computed per group at once."""
+        n = len(self.values)
+        if n == 0:
+            return {}
+        starts = np.flatnonzero(np.r_[True, self.tests[1:] != self.tests[:-1]])
+        ends = np.r_[starts[1:], n] - 1
+        counts = ends - starts + 1
+        days = (self.dates - np.repeat(self.dates[starts], counts)).astype(np.float64)
+        values = self.values.astype(np.float64)
+        sx, sy = np.add.reduceat(days, starts), np.add.reduceat(values, starts)
+        sxx, sxy = np.add.reduceat(days * days, starts), np.add.reduceat(days * values, starts)
+        denominator = counts * sxx - sx * sx
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(denominator > 0, (counts * sxy - sx * sy) / denominator, 0.0)
+            first, last = values[starts], values[ends]
+            change = np.where(first != 0, (last - first) / np.abs(first), np.nan)
+        previous = values[np.maximum(ends - 1, starts)]
+        span = days[ends]
+        return {
+            self.names[self.tests[start]]: {
+                "count": int(counts[i]),
+                "first": float(first[i]),
+                "previous": float(previous[i]),
+                "latest": float(last[i]),
+                "first_date": str(self.dates[start]),
+                "latest_date": str(self.dates[ends[i]]),
+                "days": int(span[i]),
+                "change": float(change[i]),
+                "slope_per_30d": float(slope[i] * 30),
+            }
+            for i, start in enumerate(starts)
+        }
+
+    def digest(self, max_tests: int = DIGEST_MAX_TESTS) -> str:
+        """Compact trend lines for tests with more than one result, largest relative change first."""
+        trends = {name: trend for name, trend in self.trends().items() if trend["count"] > 1}
+        if not trends:
+            return "No earlier results on file"
+        ranked = sorted(trends.items(), key=lambda item: -abs(np.nan_to_num(item[1]["change"])))[:max_tests]
+        lines = []
+        for name, trend in ranked:
+            unit = LAB_ANALYTES[name][1]
+            change = "" if np.isnan(trend["change"]) else f"{trend['change']:+.0%} "
+            middle = f" → {trend['previous']:.3g}" if trend["count"] > 2 else ""
+            lines.append(
+                f"- {name} ({unit}): {trend['first']:.3g} ({trend['first_date']}){middle} → {trend['latest']:.3g} "
+                f"({trend['latest_date']}); {change}over {trend['days']} days, {trend['count']} results"
+            )
+        return "\n".join(lines)
+
+
+class LabHistoryStore:
+    """Per-patient lab histories, one compressed .npz file each, named by a hash of the patient ID.
+
+    Updates hold an exclusive lock on the patient's `.lock` file (so worker processes sharing the
+    directory cannot lose each other's reports) and replace the file atomically.
+    """
+
+    def __init__(self, directory: str = LAB_HISTORY_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, patient_id: str) -> str:
+        digest = hashlib.sha256(patient_id.strip().lower().encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{digest}.npz")
+
+    @contextlib.contextmanager
+    def _locked(self, patient_id: str):
+        with self._lock, open(self._path(patient_id)[:-4] + ".lock", "w") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def load(self, patient_id: str) -> LabHistory:
+        path = self._path(patient_id)
+        if not os.path.exists(path):
+            return LabHistory()
+        with np.load(path) as data:
+            names = list(data["names"])
+            # Re-map stored test codes in case LAB_ANALYTES gained or reordered entries.
+            codes = np.array([LabHistory().names.index(name) if name in LAB_ANALYTES else -1 for name in names])
+            tests = codes[data["tests"]]
+            valid = tests >= 0
+            history = LabHistory(tests[valid], data["dates"][valid], data["values"][valid], data["reports"].tolist())
+        order = np.lexsort((history.dates, history.tests))
+        history.tests, history.dates, history.values = history.tests[order], history.dates[order], history.values[order]
+        return history
+
+    def save(self, patient_id: str, history: LabHistory) -> None:
+        path = self._path(patient_id)
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(
+                f,
+                names=np.array(history.names),
+                tests=history.tests,
+                dates=history.dates,
+                values=history.values,
+                reports=np.array(sorted(history.reports), dtype=str),
+            )
+        os.replace(path + ".tmp", path)
+
+    def record_report(self, patient_id: str, text: str, report_id: str, received: Optional[date] = None) -> LabHistory:
+        """Parse a report and add its results to the patient's history (once per report_id).
+
+        Results are dated by the report's collection date, else `received`. A report with neither
+        is left out: filing it under today's date would distort every trend it touches.
+        """
+        when = report_date(text) or received
+        if when is None:
+            logger.warning("Report %s has no collection date; not added to the lab history", report_id)
+            return self.load(patient_id)
+        with self._locked(patient_id):
+            history = self.load(patient_id)
+            if history.record(parse_lab_values(text), when, report_id):
+                self.save(patient_id, history)
+            return history
+
+    def patients(self) -> List[str]:
+        return [name[:-4] for name in os.listdir(self.directory) if name.endswith(".npz")]
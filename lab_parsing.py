@@ -0,0 +1,114 @@
+import re
+from typing import Dict, Optional, Tuple
+
+# Canonical analyte name -> (aliases, canonical unit, {alternate unit: factor to canonical})
+LAB_ANALYTES = {
+    "potassium": (("potassium", "k+", "k"), "mmol/L", {"meq/l": 1.0}),
+    "sodium": (("sodium", "na+", "na"), "mmol/L", {"meq/l": 1.0}),
+    "glucose": (("glucose", "blood sugar", "fbs", "rbs"), "mmol/L", {"mg/dl": 1 / 18.016}),
+    "creatinine": (("creatinine", "creat"), "mg/dL", {"umol/l": 1 / 88.42, "µmol/l": 1 / 88.42}),
+    "hemoglobin": (("hemoglobin", "haemoglobin", "hgb", "hb"), "g/dL", {"g/l": 0.1}),
+    "wbc": (
+        ("wbc", "white blood cells", "white cell count", "total leukocyte count", "tlc"),
+        "10^9/L",
+        {"/cumm": 0.001, "cells/cumm": 0.001, "/ul": 0.001, "cells/ul": 0.001, "/µl": 0.001,
+         "10^3/ul": 1.0, "k/ul": 1.0, "thou/cumm": 1.0},
+    ),
+    "platelets": (
+        ("platelets", "platelet count", "plt"),
+        "10^9/L",
+        {"/cumm": 0.001, "cells/cumm": 0.001, "/ul": 0.001, "/µl": 0.001, "10^3/ul": 1.0, "k/ul": 1.0,
+         "lakhs/cumm": 100.0, "lakh/cumm": 100.0, "lakhs/ul": 100.0},
+    ),
+    "lactate": (("lactate", "lactic acid"), "mmol/L", {"mg/dl": 1 / 9.01}),
+    "troponin": (("troponin i", "troponin t", "troponin", "hs-ctn", "ctni"), "ng/L", {"ng/ml": 1000.0, "ug/l": 1000.0}),
+    "crp": (("c-reactive protein", "crp"), "mg/L", {"mg/dl": 10.0}),
+    "inr": (("inr",), "", {}),
+}
+
+# Physiologically possible range of each analyte in its canonical unit. A reading outside it is
+# a mis-parse or a unit the parser does not know (e.g. glucose 95 with no unit is mg/dL, not
+# mmol/L) and is dropped rather than guessed.
+PLAUSIBLE_RANGES = {
+    "potassium": (1.0, 10.0),
+    "sodium": (90.0, 200.0),
+    "glucose": (0.5, 60.0),
+    "creatinine": (0.1, 25.0),
+    "hemoglobin": (2.0, 25.0),
+    "wbc": (0.1, 500.0),
+    "platelets": (5.0, 2000.0),
+    "lactate": (0.2, 30.0),
+    "troponin": (0.0, 100000.0),
+    "crp": (0.0, 600.0),
+    "inr": (0.5, 15.0),
+}
+
+# Aliases this short ("k", "na", "hb") also occur in unrelated names ("Vitamin K"), so they only
+# count when followed by a unit recognised for the analyte.
+SHORT_ALIAS_LENGTH = 2
+
+_UNIT_PATTERN = r"(?P<unit>[a-zA-Zµ%/^0-9.+\-]*\s*/\s*[a-zA-Zµ]+|[a-zA-Zµ%]+)?"
+_QUALIFIER_PATTERN = r"(?:fasting|random|serum|plasma|blood|total)"
+_COMPARATOR_PATTERN = r"(?P<comparator>[<>]=?|≤|≥)?"
+_NUMBER_PATTERN = r"(?P<value>-?\d+(?:\.\d+)?)"
+# A reference range printed between the value and its unit, as in "95 70-100 mg/dL".
+_RANGE_PATTERN = r"(?:\s*\(?\s*\d+(?:\.\d+)?\s*[-–]\s*\d+(?:\.\d+)?\s*\)?)?"
+_UNIT_LIKE = re.compile(r"[/^%0-9]")
+
+_ANALYTE_PATTERNS = []
+for _name, (_aliases, _unit, _conversions) in LAB_ANALYTES.items():
+    _alias_group = "|".join(re.escape(alias) for alias in sorted(_aliases, key=len, reverse=True))
+    _ANALYTE_PATTERNS.append((
+        _name,
+        re.compile(
+            rf"(?<![\w+])(?P<alias>{_alias_group})(?![\w+])(?:\s*,?\s*{_QUALIFIER_PATTERN})?\s*(?:\([^)]*\))?"
+            rf"\s*[:=\-]?\s*{_COMPARATOR_PATTERN}\s*{_NUMBER_PATTERN}{_RANGE_PATTERN}\s*{_UNIT_PATTERN}",
+            re.IGNORECASE
+        )
+    ))
+
+
+def _normalize_unit(unit: str) -> str:
+    unit = unit.replace(" ", "").replace("×", "x").lower()
+    return unit[1:] if unit.startswith("x") and len(unit) > 1 and unit[1].isdigit() else unit
+
+
+def _to_canonical(name: str, value: float, unit: Optional[str], short_alias: bool) -> Optional[float]:
+    """Value in the canonical unit, or None when the unit is unknown or the value implausible."""
+    _, canonical, conversions = LAB_ANALYTES[name]
+    normalized = _normalize_unit(unit) if unit else ""
+    if normalized and normalized == _normalize_unit(canonical):
+        factor = 1.0
+    elif normalized in conversions:
+        factor = conversions[normalized]
+    elif short_alias or (normalized and _UNIT_LIKE.search(normalized)):
+        # An unrecognised unit has an unknown scale; a short alias needs a unit to be trusted.
+        return None
+    else:
+        factor = 1.0  # no unit (or a trailing word such as a flag): only plausibility vouches for it
+    value *= factor
+    low, high = PLAUSIBLE_RANGES[name]
+    return value if low <= value <= high else None
+
+
+def parse_lab_values_with_units(text: str) -> Dict[str, Tuple[float, str]]:
+    """Extract the first usable reading of each known analyte, converted to its canonical unit.
+
+    "<0.01" and ">30" readings are taken at their bound.
+    """
+    values = {}
+    if not text:
+        return values
+    for name, pattern in _ANALYTE_PATTERNS:
+        for match in pattern.finditer(text):
+            short_alias = len(match.group("alias").rstrip("+")) <= SHORT_ALIAS_LENGTH
+            value = _to_canonical(name, float(match.group("value")), match.group("unit"), short_alias)
+            if value is not None:
+                values[name] = (round(value, 4), LAB_ANALYTES[name][1])
+                break
+    return values
+
+
+def parse_lab_values(text: str) -> Dict[str, float]:
+    """Extract known lab analytes from report text as {analyte: value in canonical unit}."""
+    return {name: value for name, (value, _) in parse_lab_values_with_units(text).items()}
@@ -0,0 +1,185 @@
+import importlib.util
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Pool configuration, shared by every LLM backend in the process.
+POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+TIMEOUT = httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+# HTTP/2 needs the optional `h2` package (pip install "httpx[http2]").
+HTTP2 = os.getenv("LLM_HTTP2", "1") == "1" and importlib.util.find_spec("h2") is not None
+
+_lock = threading.Lock()
+_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_metrics = {"requests": 0, "in_flight": 0, "peak_in_flight": 0, "errors": 0, "prewarmed": 0}
+# Callbacks told about every LLM response opened in the current context, so a cancelled call can
+# close its stream instead of waiting for the next token.
+_response_listeners: ContextVar[tuple] = ContextVar("llm_response_listeners", default=())
+
+
+@contextmanager
+def watch_responses(listener: Callable[[httpx.Response], None]):
+    """Call `listener` with each LLM response opened inside this block (and in contexts copied from it)."""
+    token = _response_listeners.set(_response_listeners.get() + (listener,))
+    try:
+        yield
+    finally:
+        _response_listeners.reset(token)
+
+
+def _started() -> None:
+    with _lock:
+        _metrics["requests"] += 1
+        _metrics["in_flight"] += 1
+        _metrics["peak_in_flight"] = max(_metrics["peak_in_flight"], _metrics["in_flight"])
+
+
+def _finished(response: Optional[httpx.Response]) -> None:
+    with _lock:
+        _metrics["in_flight"] -= 1
+        if response is None or response.status_code >= 500:
+            _metrics["errors"] += 1
+    if response is not None:
+        for listener in _response_listeners.get():
+            listener(response)
+
+
+class CountingTransport(httpx.BaseTransport):
+    """Pooled transport that counts requests in flight until their response headers arrive.
+
+    Unlike a response event hook, the count is released in a `finally`, so connect errors,
+    timeouts and cancelled requests do not leave `in_flight` permanently raised.
+    """
+
+    def __init__(self, **options):
+        self.inner = httpx.HTTPTransport(**options)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _started()
+        response = None
+        try:
+            response = self.inner.handle_request(request)
+            return response
+        finally:
+            _finished(response)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class AsyncCountingTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of CountingTransport."""
+
+    def __init__(self, **options):
+        self.inner = httpx.AsyncHTTPTransport(**options)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _started()
+        response = None
+        try:
+            response = await self.inner.handle_async_request(request)
+            return response
+        finally:
+            _finished(response)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def _transport_options() -> Dict:
+    return {
+        "http2": HTTP2,
+        "limits": httpx.Limits(
+            max_connections=POOL_SIZE,
+            max_keepalive_connections=POOL_SIZE,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """Return the process-wide pooled, keep-alive HTTP client for synchronous LLM calls."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(transport=CountingTransport(**_transport_options()), timeout=TIMEOUT)
+    return _client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled HTTP client for asynchronous LLM calls."""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                _async_client = httpx.AsyncClient(
+                    transport=AsyncCountingTransport(**_transport_options()), timeout=TIMEOUT
+                )
+    return _async_client
+
+
+def prewarm(base_url: str, connections: int = 4) -> int:
+    """Open `connections` keep-alive connections to `base_url` ahead of the first LLM call.
+
+    Each request holds its connection until all have a response, so every one lands on its own
+    connection; any HTTP response, including 4xx, counts as warmed. Returns how many succeeded.
+    """
+    client = get_http_client()
+    connections = min(connections, POOL_SIZE)
+    barrier = threading.Barrier(connections)
+
+    def touch(_):
+        try:
+            with client.stream("HEAD", base_url) as response:
+                try:
+                    barrier.wait(timeout=CONNECT_TIMEOUT)
+                except threading.BrokenBarrierError:
+                    pass
+                # Reading the (empty) body returns the connection to the pool instead of closing it.
+                response.read()
+            return True
+        except httpx.HTTPError as e:
+            barrier.abort()
+            logger.warning("Pre-warming %s failed: %s", base_url, e)
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        warmed = sum(executor.map(touch, range(connections)))
+    with _lock:
+        _metrics["prewarmed"] += warmed
+    logger.info("Pre-warmed %d/%d connections to %s in %.0f ms",
+                warmed, connections, base_url, (time.perf_counter() - start) * 1e3)
+    return warmed
+
+
+def pool_stats() -> Dict:
+    """Request counters plus open/idle connection counts of the shared synchronous pool."""
+    with _lock:
+        stats = dict(_metrics)
+    # httpx does not expose pool internals publicly; read them defensively.
+    pool = getattr(getattr(getattr(_client, "_transport", None), "inner", None), "_pool", None)
+    open_connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for connection in open_connections if connection.is_idle())
+    stats.update({
+        "pool_size": POOL_SIZE,
+        "http2": HTTP2,
+        "open_connections": len(open_connections),
+        "idle_connections": idle,
+        "utilisation": (len(open_connections) - idle) / POOL_SIZE if POOL_SIZE else 0.0,
+    })
+    return stats
@@ -0,0 +1,189 @@
+import copy
+import json
+import logging
+import math
+import os
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# JSON file overriding DEFAULT_ROUTES per chain type, e.g. {"summary": {"slo_ms": 9000}}; keys not
+# given keep their defaults. SLOs in particular are deployment-specific.
+ROUTES_FILE = os.getenv("MODEL_ROUTES_FILE")
+
+# Generation settings per chain type. `large_input_*` keys apply once the rendered inputs exceed
+# `large_input_chars`; `max_tokens` is the ceiling the learned budget never exceeds, unless a
+# completion cut off at it needed a larger budget on retry (the ceiling is then raised to that).
+DEFAULT_ROUTES = {
+    "diagnosis": {
+        "model": "llama-3.2-1b-preview",
+        "temperature": 0.7,
+        "max_tokens": 1000,
+        "slo_ms": 8000,
+        "large_input_chars": 12000,
+        "large_input_model": "llama-3.1-8b-instant",
+    },
+    "diagnosis_section": {
+        "model": "llama-3.2-1b-preview",
+        "temperature": 0.7,
+        "max_tokens": 300,
+        "slo_ms": 4000,
+        "large_input_chars": 12000,
+        "large_input_model": "llama-3.1-8b-instant",
+    },
+    "diagnosis_structured": {
+        "model": "llama-3.1-8b-instant",
+        "temperature": 0.3,
+        "max_tokens": 400,
+        "slo_ms": 5000,
+        "json_mode": True,
+    },
+    "follow_up": {
+        "model": "llama-3.2-1b-preview",
+        "temperature": 0.5,
+        "max_tokens": 500,
+        "slo_ms": 4000,
+    },
+    "summary": {
+        "model": "llama-3.2-1b-preview",
+        "temperature": 0.3,
+        "max_tokens": 600,
+        "slo_ms": 6000,
+    },
+}
+
+# Learned budgets: the `BUDGET_PERCENTILE` of observed completion lengths times `BUDGET_HEADROOM`,
+# used once a route has `MIN_SAMPLES` observations.
+MIN_SAMPLES = 20
+BUDGET_PERCENTILE = 95
+BUDGET_HEADROOM = 1.25
+MIN_BUDGET = 64
+WINDOW = 200
+# A completion cut off at max_tokens is retried once with twice the budget (at least the route's
+# ceiling), up to this many tokens; the retried length then feeds the learned budget.
+RETRY_MAX_TOKENS = 4096
+TRUNCATED_REASONS = ("length", "max_tokens")
+
+
+def load_routes(path: Optional[str] = ROUTES_FILE) -> Dict:
+    """DEFAULT_ROUTES with the per-chain overrides from the JSON file at `path`, if any."""
+    routes = copy.deepcopy(DEFAULT_ROUTES)
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+        for chain_type, settings in overrides.items():
+            routes.setdefault(chain_type, {}).update(settings)
+    return routes
+
+
+class FinishReasonRecorder(BaseCallbackHandler):
+    """Callback noting whether any completion of a call stopped because it hit max_tokens."""
+
+    def __init__(self):
+        self.truncated = False
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                info = generation.generation_info or {}
+                if info.get("finish_reason", info.get("done_reason")) in TRUNCATED_REASONS:
+                    self.truncated = True
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) for budgeting."""
+    return math.ceil(len(text or "") / 4)
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class ModelRouter:
+    """Pick model and generation budget per chain type and input size, learning from past calls."""
+
+    def __init__(self, routes: Optional[Dict] = None):
+        self.routes = routes or load_routes()
+        self._lock = threading.Lock()
+        self._completion_tokens: Dict[str, deque] = {}
+        self._latencies_ms: Dict[str, deque] = {}
+        self._slo_breaches: Dict[str, int] = {}
+        self._truncations: Dict[str, int] = {}
+        self._raised_ceilings: Dict[str, int] = {}
+
+    def route(self, chain_type: str, input_chars: int) -> Dict:
+        """Return the model, temperature and max_tokens to use for one call."""
+        config = self.routes[chain_type]
+        large = input_chars > config.get("large_input_chars", math.inf)
+        name = f"{chain_type}:{'large' if large else 'small'}"
+        ceiling = config.get("large_input_max_tokens", config["max_tokens"]) if large else config["max_tokens"]
+        with self._lock:
+            observed = list(self._completion_tokens.get(name, ()))
+            ceiling = max(ceiling, self._raised_ceilings.get(name, 0))
+        max_tokens = ceiling
+        if len(observed) >= MIN_SAMPLES:
+            learned = int(_percentile(observed, BUDGET_PERCENTILE) * BUDGET_HEADROOM)
+            max_tokens = min(ceiling, max(MIN_BUDGET, learned))
+        return {
+            "route": name,
+            "model": config.get("large_input_model", config["model"]) if large else config["model"],
+            "temperature": config["temperature"],
+            "max_tokens": max_tokens,
+            "slo_ms": config["slo_ms"],
+            "json_mode": config.get("json_mode", False),
+            "ceiling": ceiling,
+        }
+
+    def retry_decision(self, decision: Dict) -> Optional[Dict]:
+        """A copy of a decision whose completion was cut off, with a larger budget; None at RETRY_MAX_TOKENS."""
+        if decision["max_tokens"] >= RETRY_MAX_TOKENS:
+            return None
+        budget = min(RETRY_MAX_TOKENS, max(decision["ceiling"], 2 * decision["max_tokens"]))
+        return {**decision, "max_tokens": budget}
+
+    def record(self, decision: Dict, latency_ms: float, completion_tokens: int, truncated: bool = False) -> None:
+        """Feed back the observed latency and completion length of a routed call.
+
+        `truncated` marks a call that hit max_tokens before its retry; its length is only a lower
+        bound, so the caller records the retried call's length as the sample instead.
+        """
+        name = decision["route"]
+        with self._lock:
+            if truncated:
+                self._truncations[name] = self._truncations.get(name, 0) + 1
+                return
+            if decision["max_tokens"] > decision["ceiling"]:  # a retried budget that was enough
+                self._raised_ceilings[name] = max(self._raised_ceilings.get(name, 0), decision["max_tokens"])
+            self._completion_tokens.setdefault(name, deque(maxlen=WINDOW)).append(completion_tokens)
+            self._latencies_ms.setdefault(name, deque(maxlen=WINDOW)).append(latency_ms)
+            if latency_ms > decision["slo_ms"]:
+                self._slo_breaches[name] = self._slo_breaches.get(name, 0) + 1
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-route call count, latency percentiles, SLO breaches, truncations and learned budget."""
+        with self._lock:
+            names = list(self._latencies_ms)
+            snapshot = {
+                name: (list(self._latencies_ms[name]), list(self._completion_tokens[name]),
+                       self._slo_breaches.get(name, 0), self._truncations.get(name, 0))
+                for name in names
+            }
+        return {
+            name: {
+                "calls": len(latencies),
+                "p50_ms": _percentile(latencies, 50),
+                "p95_ms": _percentile(latencies, 95),
+                "slo_breaches": breaches,
+                "truncations": truncations,
+                "p95_completion_tokens": _percentile(tokens, 95),
+            }
+            for name, (latencies, tokens, breaches, truncations) in snapshot.items()
+        }
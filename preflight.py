@@ -0,0 +1,186 @@
+import functools
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+from langchain.prompts import PromptTemplate
+
+from model_router import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Tokenizer used for counting: taken from the local Hugging Face cache, else downloaded once (a few
+# MB) unless PREFLIGHT_TOKENIZER_DOWNLOAD=0. All Llama 3.x models served here share this
+# 128k-vocabulary tokenizer; the default is an ungated copy of it, so no licence or HF token is
+# needed. Without transformers or the files, counts fall back to character estimates.
+TOKENIZER_NAME = os.getenv("PREFLIGHT_TOKENIZER", "unsloth/Llama-3.2-1B")
+TOKENIZER_DOWNLOAD = os.getenv("PREFLIGHT_TOKENIZER_DOWNLOAD", "1") == "1"
+
+MODEL_CONTEXT_TOKENS = {
+    "llama-3.2-1b-preview": 8192,
+    "llama-3.1-8b-instant": 131072,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+
+# Per-section caps, and the order in which sections are cut further when the prompt still does
+# not fit (first = least important). History keeps its most recent text; everything else its start.
+# The patient profile goes last, and its safety-critical fields are never cut at all.
+SECTION_BUDGETS = {
+    "history": 2000,
+    "lab_report": 3000,
+    "symptoms": 1000,
+    "follow_up": 500,
+    "similar_cases": 400,
+    "lab_trends": 300,
+    "report_changes": 300,
+    "patient_data": 800,
+}
+TRUNCATION_PRIORITY = (
+    "similar_cases", "lab_trends", "report_changes", "history", "lab_report", "symptoms", "follow_up", "patient_data"
+)
+SAFETY_FIELDS = frozenset({"allergies", "current_medications", "medical_history"})
+KEEP_TAIL = {"history"}
+TRUNCATION_MARKER = "[…truncated…]"
+
+
+@functools.lru_cache(maxsize=1)
+def get_tokenizer():
+    """Load the counting tokenizer once (cache first, then download if allowed); None when unavailable.
+
+    Cached, so the fallback to character estimates is logged once per process.
+    """
+    try:
+        from transformers import AutoTokenizer
+        try:
+            return AutoTokenizer.from_pretrained(TOKENIZER_NAME, local_files_only=True)
+        except OSError:
+            if not TOKENIZER_DOWNLOAD:
+                raise
+            return AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+    except (ImportError, OSError) as e:
+        logger.warning("Tokenizer %s unavailable (%s); token counts are character estimates", TOKENIZER_NAME, e)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def truncate_tokens(text: str, max_tokens: int, keep_tail: bool = False) -> str:
+    """Cut `text` to at most `max_tokens` tokens, keeping its start (or end) and marking the cut."""
+    if max_tokens <= 0:
+        return TRUNCATION_MARKER if text else ""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        limit = max(0, max_tokens - estimate_tokens(TRUNCATION_MARKER)) * 4  # the marker counts too
+        return TRUNCATION_MARKER + text[len(text) - limit:] if keep_tail else text[:limit] + TRUNCATION_MARKER
+    ids = tokenizer.encode(text, add_special_tokens=False)
+    if len(ids) <= max_tokens:
+        return text
+    max_tokens = max(0, max_tokens - len(tokenizer.encode(TRUNCATION_MARKER, add_special_tokens=False)))
+    if keep_tail:
+        return TRUNCATION_MARKER + tokenizer.decode(ids[len(ids) - max_tokens:])
+    return tokenizer.decode(ids[:max_tokens]) + TRUNCATION_MARKER
+
+
+def truncate_patient_data(patient: Dict, max_tokens: int) -> Dict:
+    """Shrink the longest text or list fields of a patient profile until it renders in `max_tokens`.
+
+    SAFETY_FIELDS (allergies, medications, medical history) are always kept whole, so a profile
+    made mostly of them may stay over budget. Other lists lose their last items, with
+    TRUNCATION_MARKER in their place; text fields are cut and marked. Each step shrinks one
+    field, so this ends.
+    """
+    patient = dict(patient)
+    while True:
+        overflow = count_tokens(str(patient)) - max_tokens
+        fields = {
+            key: count_tokens(str(value)) for key, value in patient.items()
+            if key not in SAFETY_FIELDS and isinstance(value, (str, list))
+            and value not in ("", [], TRUNCATION_MARKER, [TRUNCATION_MARKER])
+        }
+        if overflow <= 0 or not fields:
+            return patient
+        key = max(fields, key=fields.get)
+        budget = max(0, fields[key] - overflow)
+        value = patient[key]
+        if isinstance(value, str):
+            truncated = truncate_tokens(value, budget)
+            patient[key] = truncated if len(truncated) < len(value) else TRUNCATION_MARKER
+            continue
+        items = [item for item in value if item != TRUNCATION_MARKER]
+        kept, used = [], 0
+        for item in items[:-1]:  # always drop at least the last item
+            used += count_tokens(str(item))
+            if used > budget:
+                break
+            kept.append(item)
+        patient[key] = kept + [TRUNCATION_MARKER]
+
+
+def _truncate(name: str, value, max_tokens: int):
+    if isinstance(value, dict):
+        return truncate_patient_data(value, max_tokens)
+    return truncate_tokens(value, max_tokens, keep_tail=name in KEEP_TAIL)
+
+
+def preflight(
+    chain_type: str,
+    prompt: PromptTemplate,
+    inputs: Dict,
+    model: str,
+    max_completion_tokens: int,
+    budgets: Optional[Dict[str, int]] = None,
+) -> Tuple[Dict, Dict]:
+    """Fit a prompt's inputs into the model's context window before sending it.
+
+    Applies per-section budgets, then trims sections in TRUNCATION_PRIORITY order until the
+    rendered prompt plus the completion budget fits. Returns the (possibly truncated) inputs
+    and a per-section token breakdown, which is also logged.
+    """
+    budgets = SECTION_BUDGETS if budgets is None else budgets
+    inputs = dict(inputs)
+    tokens = {name: count_tokens(str(value)) for name, value in inputs.items()}
+    truncated = []
+
+    for name, budget in budgets.items():
+        if isinstance(inputs.get(name), (str, dict)) and tokens[name] > budget:
+            inputs[name] = _truncate(name, inputs[name], budget)
+            tokens[name] = count_tokens(str(inputs[name]))
+            truncated.append(name)
+
+    context = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+    prompt_budget = context - max_completion_tokens
+    prompt_tokens = count_tokens(prompt.format(**inputs))
+    for name in TRUNCATION_PRIORITY:
+        overflow = prompt_tokens - prompt_budget
+        if overflow <= 0:
+            break
+        if not isinstance(inputs.get(name), (str, dict)) or not tokens[name]:
+            continue
+        inputs[name] = _truncate(name, inputs[name], tokens[name] - overflow)
+        tokens[name] = count_tokens(str(inputs[name]))
+        truncated.append(name)
+        prompt_tokens = count_tokens(prompt.format(**inputs))
+
+    breakdown = {
+        "chain": chain_type,
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "template_tokens": max(0, prompt_tokens - sum(tokens.values())),
+        "sections": tokens,
+        "completion_budget": max_completion_tokens,
+        "context_tokens": context,
+        "truncated": sorted(set(truncated)),
+        "exact_counts": get_tokenizer() is not None,
+        "fits": prompt_tokens <= prompt_budget,
+    }
+    logger.info("Preflight %s", breakdown)
+    if not breakdown["fits"]:
+        logger.warning("Prompt for %s still exceeds the %s context after truncation", chain_type, model)
+    return inputs, breakdown
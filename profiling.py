@@ -0,0 +1,175 @@
+import contextvars
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_MS", "5")) / 1000
+TRACEMALLOC_FRAMES = 10
+TOP_ALLOCATIONS = 25
+# Profiling is requested per deployment with PROFILE_REQUESTS. The `profile` query parameter is
+# honoured only where an operator allows it, so visitors cannot switch profiling on.
+PROFILE_ALLOW_QUERY = os.getenv("PROFILE_ALLOW_QUERY", "0") == "1"
+
+T = TypeVar("T")
+
+# tracemalloc and the sampler are process-wide, so only one request is profiled at a time.
+_active = threading.Lock()
+
+# Pool threads are shared by every session, so a worker is sampled only while it runs a task
+# submitted (directly or through other workers) by the profiled request: see `profiled_task`.
+_profile_id: contextvars.ContextVar = contextvars.ContextVar("profile_id", default=None)
+_thread_profiles: Dict[int, str] = {}
+
+
+def profiled_task(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wrap `fn`, about to be submitted to a worker pool, so the worker is sampled with this request.
+
+    Returns `fn` itself unless the calling thread is inside an active `profiled` block.
+    """
+    profile_id = _profile_id.get()
+    if profile_id is None:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        ident = threading.get_ident()
+        _thread_profiles[ident] = profile_id
+        token = _profile_id.set(profile_id)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _profile_id.reset(token)
+            _thread_profiles.pop(ident, None)
+
+    return run
+
+
+class StackSampler:
+    """Sample the Python stacks of selected threads at a fixed interval, counting identical stacks.
+
+    Selected are `thread_ids` plus any worker currently running a task tagged with `profile_id`.
+
+    The counts are written in the collapsed ("folded") format read by flamegraph.pl, speedscope
+    and inferno: one line per distinct stack, frames separated by semicolons, then the count.
+    """
+
+    def __init__(self, thread_ids: Iterable[int], profile_id: Optional[str] = None, interval: float = SAMPLE_INTERVAL):
+        self.thread_ids = set(thread_ids)
+        self.profile_id = profile_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                name = names.get(thread_id, str(thread_id))
+                tagged = self.profile_id is not None and _thread_profiles.get(thread_id) == self.profile_id
+                if thread_id == own or not (thread_id in self.thread_ids or tagged):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(name.split("_")[0])
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _write_allocations(path: str, label: str, elapsed: float, start: tracemalloc.Snapshot,
+                       end: tracemalloc.Snapshot, peak: int) -> None:
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    diff = end.filter_traces(ignore).compare_to(start.filter_traces(ignore), "lineno")
+    with open(path, "w") as f:
+        f.write(f"{label}: {elapsed * 1000:.1f} ms wall, traced peak {peak / 1024 / 1024:.1f} MB\n")
+        f.write(f"Top {TOP_ALLOCATIONS} allocation sites by net growth during the request:\n")
+        for stat in diff[:TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            f.write(f"{stat.size_diff / 1024:10.1f} KiB {stat.count_diff:+8d} blocks  {frame.filename}:{frame.lineno}\n")
+
+
+@contextmanager
+def profiled(label: str, enabled: bool):
+    """Profile the enclosed block with the stack sampler and tracemalloc when `enabled`.
+
+    Samples the calling thread and the workers running tasks it submitted through
+    `profiled_task`; other sessions' work on the same pools is left out.
+
+    Writes `<PROFILE_DIR>/<timestamp>_<label>.folded` (flamegraph input) and `.alloc.txt` (top
+    allocation sites). Disabled, it costs one boolean check; if another request is already
+    being profiled, the block runs unprofiled.
+    """
+    if not enabled or not _active.acquire(blocking=False):
+        yield None
+        return
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{label}")
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profile_id = os.path.basename(base)
+        sampler = StackSampler([threading.get_ident()], profile_id)
+        sampler.start()
+        token = _profile_id.set(profile_id)
+        start = time.perf_counter()
+        try:
+            yield base
+        finally:
+            elapsed = time.perf_counter() - start
+            _profile_id.reset(token)
+            sampler.stop()
+            after = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+            sampler.write_folded(base + ".folded")
+            _write_allocations(base + ".alloc.txt", label, elapsed, before, after, peak)
+            logger.info("Profiled %s in %.1f ms (%d samples): %s.{folded,alloc.txt}",
+                        label, elapsed * 1000, sampler.samples, base)
+    finally:
+        _active.release()
+
+
+def requested_mode(query_value: Optional[str]) -> Optional[str]:
+    """Profiling mode for this request: "run" (a whole rerun), "llm" (each MedicalAssistant call) or None.
+
+    Taken from the PROFILE_REQUESTS environment variable, or from the `profile` query parameter
+    where PROFILE_ALLOW_QUERY=1.
+    """
+    value = ((query_value if PROFILE_ALLOW_QUERY else None) or os.getenv("PROFILE_REQUESTS") or "").strip().lower()
+    if value in ("1", "true", "run", "main"):
+        return "run"
+    if value == "llm":
+        return "llm"
+    return None
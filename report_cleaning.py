@@ -0,0 +1,120 @@
+import hashlib
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Sequence
+
+from lab_parsing import LAB_ANALYTES
+from preflight import count_tokens
+
+# A line counts as boilerplate when it appears on at least this share of a report's pages.
+REPEATED_LINE_SHARE = 0.5
+MIN_TABLE_LINES = 2
+# Short lines ("mg/dL", "Negative", "250", "Urine protein") are results, units or test names,
+# never boilerplate.
+MIN_BOILERPLATE_CHARS = 24
+# Lines with digits ("Creatinine 1.4 mg/dL") only count as boilerplate when long, like a banner.
+MIN_BOILERPLATE_CHARS_WITH_DIGITS = 40
+
+# Explicit page markers only: "Page 2", "Page 2 of 5", "2/5". A bare number is never stripped.
+_PAGE_MARKER = re.compile(
+    r"^(?:page\s*(?P<page>\d+)(?:\s*(?:of|/)\s*(?P<pages>\d+))?|(?P<n>\d+)\s*/\s*(?P<m>\d+))$", re.IGNORECASE
+)
+_SPACES = re.compile(r"[ \t ]+")
+
+# Test names repeat on every page of serial results; a line naming an analyte is never boilerplate.
+_ANALYTE_NAME = re.compile(
+    r"\b(?:" + "|".join(
+        re.escape(alias) for aliases, _, _ in LAB_ANALYTES.values() for alias in aliases if len(alias) >= 3
+    ) + r")\b",
+    re.IGNORECASE,
+)
+
+
+def _normalize(line: str) -> str:
+    return _SPACES.sub(" ", line).strip()
+
+
+def _line_key(line: str) -> bytes:
+    return hashlib.blake2b(line.lower().encode("utf-8"), digest_size=8).digest()
+
+
+def is_page_marker(line: str) -> bool:
+    """Whether a line is a page marker; "N/M" counts only when N <= M, so "120/80" is kept."""
+    match = _PAGE_MARKER.match(line)
+    if not match:
+        return False
+    if match.group("n") is not None:
+        return 0 < int(match.group("n")) <= int(match.group("m"))
+    return match.group("pages") is None or int(match.group("page")) <= int(match.group("pages"))
+
+
+def _boilerplate_candidate(line: str) -> bool:
+    if _ANALYTE_NAME.search(line):
+        return False
+    if any(char.isdigit() for char in line):
+        return len(line) >= MIN_BOILERPLATE_CHARS_WITH_DIGITS
+    return len(line) >= MIN_BOILERPLATE_CHARS
+
+
+def repeated_lines(pages: Sequence[List[str]], share: float = REPEATED_LINE_SHARE) -> set:
+    """Hashes of normalized lines found on at least `share` of the pages (and on two or more)."""
+    if len(pages) < 2:
+        return set()
+    counts = Counter()
+    for lines in pages:
+        counts.update({_line_key(line) for line in lines if line and _boilerplate_candidate(line)})
+    threshold = max(2, math.ceil(share * len(pages)))
+    return {key for key, count in counts.items() if count >= threshold}
+
+
+def clean_pages(pages: Sequence[str]) -> tuple[str, Dict]:
+    """Join extracted page texts with per-page boilerplate and duplicate tables removed.
+
+    Lines repeated across pages (lab header, patient banner, disclaimers, footers) are kept only
+    where they first appear, page markers on a page's first or last line are dropped, whitespace
+    is collapsed and a block of lines identical to an earlier block (a table printed twice) is
+    dropped. Short or value-like lines are never treated as boilerplate. Returns the text and
+    the bytes/tokens removed.
+    """
+    raw = "\n".join(pages)
+    split = [[_normalize(line) for line in page.splitlines()] for page in pages]
+    boilerplate = repeated_lines(split)
+    seen_lines, seen_blocks = set(), set()
+    blocks, block = [], []
+
+    def close_block():
+        if block:
+            key = _line_key("\n".join(block))
+            if len(block) < MIN_TABLE_LINES or key not in seen_blocks:
+                seen_blocks.add(key)
+                blocks.append("\n".join(block))
+            block.clear()
+
+    removed_lines = 0
+    for lines in split:
+        filled = [position for position, line in enumerate(lines) if line]
+        edges = {filled[0], filled[-1]} if filled else set()
+        for position, line in enumerate(lines):
+            if not line:
+                close_block()
+                continue
+            key = _line_key(line)
+            if (position in edges and is_page_marker(line)) or (key in boilerplate and key in seen_lines):
+                removed_lines += 1
+                continue
+            seen_lines.add(key)
+            block.append(line)
+        close_block()
+    text = "\n\n".join(blocks).strip()
+
+    raw_bytes, clean_bytes = len(raw.encode("utf-8")), len(text.encode("utf-8"))
+    raw_tokens, clean_tokens = count_tokens(raw), count_tokens(text)
+    return text, {
+        "pages": len(pages),
+        "boilerplate_lines": removed_lines,
+        "bytes_before": raw_bytes,
+        "bytes_removed": raw_bytes - clean_bytes,
+        "tokens_before": raw_tokens,
+        "tokens_removed": raw_tokens - clean_tokens,
+    }
@@ -0,0 +1,89 @@
+import hashlib
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence
+
+from lab_history import report_date, report_patient
+from report_revisions import previous_version
+
+
+def content_hash(text: str) -> str:
+    """Hash of a report's text with case and whitespace differences removed."""
+    lines = (" ".join(line.lower().split()) for line in text.splitlines() if line.strip())
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def ingest_reports(
+    files: Sequence[tuple],
+    extract: Callable[[object], Dict],
+    on_file: Optional[Callable[[int, Dict], None]] = None,
+) -> Dict:
+    """Extract several uploaded reports, drop duplicates and merge them in date order.
+
+    `files` are `(name, sha256, source)` triples and `extract(source)` returns a dict with at least
+    the report's `text`; its other keys are kept on the document. Byte-identical uploads (same
+    sha256) are extracted once. When extraction also returns page `fingerprints`, a later upload
+    that revises an earlier one (same collection date and patient, almost all pages unchanged)
+    supersedes it (the revision is kept, with the replaced document under `supersedes`). Then a
+    report with the same collection date and the same text (ignoring case and whitespace) as an
+    earlier one is dropped as overlapping; serial reports that merely share most of their lines
+    are all kept. Files are extracted one after another: PDF parsing is CPU-bound, so threads
+    would not run it in parallel, and repeat uploads are served from the extraction cache.
+    `on_file(index, document)` is called as each file finishes, so it can update the UI. Returns
+    the merged `text` plus the kept `documents` and `skipped` ones.
+    """
+    documents = [
+        {"index": index, "name": name, "sha256": sha256, "status": "pending"}
+        for index, (name, sha256, _) in enumerate(files)
+    ]
+    first_by_hash: Dict[str, Dict] = {}
+    for document, (_, _, source) in zip(documents, files):
+        original = first_by_hash.setdefault(document["sha256"], document)
+        if original is not document:
+            document.update(status="duplicate", duplicate_of=original["name"])
+        else:
+            try:
+                document.update(extract(source), status="extracted")
+            except Exception as e:
+                document.update(status="failed", error=str(e), text="")
+        if on_file:
+            on_file(document["index"], document)
+
+    extracted = [document for document in documents if document["status"] == "extracted" and document["text"]]
+    current: Dict[int, Dict] = {}
+    for document in sorted(extracted, key=lambda document: document["index"]):
+        document["date"] = report_date(document["text"])
+        document["patient"] = report_patient(document["text"])
+        if "fingerprints" not in document:
+            continue
+        revised = previous_version(document["fingerprints"], current, document["date"], document["patient"])
+        if revised is not None:
+            superseded = current.pop(revised)
+            superseded.update(status="superseded", duplicate_of=document["name"])
+            document["supersedes"] = superseded
+            if on_file:
+                on_file(superseded["index"], superseded)
+        current[document["index"]] = document
+    kept: List[Dict] = []
+    seen: Dict[tuple, Dict] = {}
+    for document in extracted:
+        if document["status"] != "extracted":
+            continue
+        original = seen.setdefault((document["date"], content_hash(document["text"])), document)
+        if original is not document:
+            document.update(status="overlap", duplicate_of=original["name"])
+            if on_file:
+                on_file(document["index"], document)
+            continue
+        kept.append(document)
+
+    kept.sort(key=lambda document: (document["date"] or date.max, document["index"]))
+    merged = "\n\n".join(
+        f"=== Report {number}: {document['name']} ({document['date'] or 'undated'}) ===\n{document['text']}"
+        if len(kept) > 1 else document["text"]
+        for number, document in enumerate(kept, start=1)
+    )
+    return {
+        "text": merged,
+        "documents": kept,
+        "skipped": [document for document in documents if document["status"] != "extracted"],
+    }
@@ -0,0 +1,122 @@
+import hashlib
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence
+
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+from lab_parsing import LAB_ANALYTES
+
+# A new upload is treated as a revision of an earlier report when at least this share of its
+# pages are unchanged and it states the same collection date and patient. Serial reports from
+# one lab share template pages (letterhead, reference ranges), so the share alone is not enough.
+REVISION_PAGE_SHARE = 0.8
+
+
+def _hash_object(obj, cache: Dict, path: frozenset = frozenset()) -> bytes:
+    """Digest of a PDF object with indirect references resolved, streams included by content."""
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key in cache:
+            return cache[key]
+        if key in path:  # a cycle (e.g. an annotation pointing back at its page)
+            return repr(key).encode()
+        cache[key] = digest = _hash_object(obj.get_object(), cache, path | {key})
+        return digest
+    digest = hashlib.sha256(type(obj).__name__.encode())
+    if isinstance(obj, DictionaryObject):
+        for name in sorted(obj):
+            if name != "/Parent":
+                digest.update(name.encode() + _hash_object(obj.raw_get(name), cache, path))
+        if isinstance(obj, StreamObject):
+            digest.update(obj.get_data())
+    elif isinstance(obj, ArrayObject):
+        for item in obj:
+            digest.update(_hash_object(item, cache, path))
+    else:
+        digest.update(repr(obj).encode())
+    return digest.digest()
+
+
+def page_fingerprint(page, cache: Optional[Dict] = None) -> str:
+    """Hash of a PDF page's content stream, size and resolved resources.
+
+    Fonts (with their encodings and embedded font programs) and XObject streams are included,
+    since a page can keep its content stream while a changed font map or form XObject changes
+    the text it shows. The hash is stable across re-exports of an unchanged page. `cache` maps
+    indirect references to digests, so resources shared by several pages are hashed once.
+    """
+    cache = {} if cache is None else cache
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    digest.update(contents.get_data() if contents is not None else b"")
+    digest.update(repr([float(value) for value in page.mediabox]).encode())
+    resources = page.get("/Resources")
+    if resources is not None:
+        digest.update(_hash_object(resources, cache))
+    return digest.hexdigest()
+
+
+def extract_pages(
+    reader,
+    lookup: Callable[[str], Optional[str]],
+    store: Callable[[str, str], None],
+) -> tuple[List[str], List[str], int]:
+    """Text and fingerprint of every page, extracting only pages whose fingerprint is not cached.
+
+    Returns `(texts, fingerprints, reused)`, where `reused` counts pages served by `lookup`.
+    """
+    texts, fingerprints, reused, cache = [], [], 0, {}
+    for page in reader.pages:
+        fingerprint = page_fingerprint(page, cache)
+        text = lookup(fingerprint)
+        if text is None:
+            text = page.extract_text() or ""
+            store(fingerprint, text)
+        else:
+            reused += 1
+        texts.append(text)
+        fingerprints.append(fingerprint)
+    return texts, fingerprints, reused
+
+
+def previous_version(
+    fingerprints: Sequence[str],
+    versions: Dict[str, Dict],
+    when: Optional[date] = None,
+    patient: Optional[str] = None,
+) -> Optional[str]:
+    """Key of the earlier report that `fingerprints` most likely revises, if any.
+
+    `versions` maps a report key to a dict with its page `fingerprints`, collection `date` and
+    `patient`. Only a report with the same (known) date and the same patient can be revised;
+    an undated report never is. An identical page list is the same report, not a revision.
+    """
+    if when is None:
+        return None
+    pages = set(fingerprints)
+    best, best_share = None, 0.0
+    for key, version in versions.items():
+        if version.get("date") != when or version.get("patient") != patient:
+            continue
+        if list(version["fingerprints"]) == list(fingerprints):
+            continue
+        share = len(pages & set(version["fingerprints"])) / max(len(pages), 1)
+        if share >= REVISION_PAGE_SHARE and share > best_share:
+            best, best_share = key, share
+    return best
+
+
+def lab_value_changes(before: Dict[str, float], after: Dict[str, float]) -> List[str]:
+    """Readable lines for analytes whose value changed, appeared or disappeared between two versions."""
+    lines = []
+    for name, (_, unit, _) in LAB_ANALYTES.items():
+        old, new = before.get(name), after.get(name)
+        if old == new:
+            continue
+        if old is None:
+            lines.append(f"- {name}: added, {new:.3g} {unit}".rstrip())
+        elif new is None:
+            lines.append(f"- {name}: removed (was {f'{old:.3g} {unit}'.rstrip()})")
+        else:
+            lines.append(f"- {name}: {old:.3g} → {new:.3g} {unit}".rstrip())
+    return lines
@@ -0,0 +1,178 @@
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, MutableMapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def deep_sizeof(obj, _seen: Optional[set] = None) -> int:
+    """Approximate the resident size of an object graph in bytes."""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+class SessionManager:
+    """Track activity and memory per Streamlit session, evicting idle or oversized sessions.
+
+    `tracked_keys` are the session-state entries released on eviction; `measured_keys` (default:
+    all tracked keys) are the data entries whose size counts towards a session's footprint, so
+    executors and other runtime objects are never walked; `spill_keys` is the subset pickled to
+    `spill_dir` (when set) and restored the next time the session becomes active.
+    """
+
+    def __init__(
+        self,
+        tracked_keys: Iterable[str],
+        spill_keys: Iterable[str] = (),
+        measured_keys: Optional[Iterable[str]] = None,
+        idle_timeout: float = 30 * 60,
+        max_session_bytes: int = 50 * 1024 * 1024,
+        max_total_bytes: int = 1024 * 1024 * 1024,
+        spill_dir: Optional[str] = None,
+        trim_session: Optional[Callable[[MutableMapping, int], None]] = None,
+    ):
+        self.tracked_keys = tuple(tracked_keys)
+        self.spill_keys = tuple(spill_keys)
+        self.measured_keys = self.tracked_keys if measured_keys is None else tuple(measured_keys)
+        self.idle_timeout = idle_timeout
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.spill_dir = spill_dir
+        self.trim_session = trim_session
+        self._lock = threading.RLock()
+        self._sessions: Dict[str, Dict] = {}
+        self._spilled: set = set()
+        self._sweeper: Optional[threading.Thread] = None
+        self.metrics = {"evicted_idle": 0, "evicted_memory": 0, "trimmed": 0, "spilled": 0, "restored": 0}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def touch(self, session_id: str, state: MutableMapping) -> None:
+        """Record activity for a session, restoring it from disk if it was evicted.
+
+        The footprint from the last `measure` is kept; call `measure` once per run to update it.
+        """
+        with self._lock:
+            if session_id in self._spilled:
+                self._restore(session_id, state)
+            previous = self._sessions.get(session_id, {})
+            self._sessions[session_id] = {"state": state, "last_active": time.time(), "bytes": previous.get("bytes", 0)}
+
+    def measure(self, session_id: str) -> int:
+        """Re-measure a session's footprint and enforce the per-session and global ceilings."""
+        with self._lock:
+            if session_id not in self._sessions:
+                return 0
+            size = self._measure(session_id)
+            if size > self.max_session_bytes and self.trim_session:
+                self.trim_session(self._sessions[session_id]["state"], size - self.max_session_bytes)
+                self.metrics["trimmed"] += 1
+                size = self._measure(session_id)
+            self._enforce_total(keep=session_id)
+            return size
+
+    def sweep(self) -> int:
+        """Evict every session idle for longer than the timeout; returns how many were evicted."""
+        now = time.time()
+        with self._lock:
+            idle = [sid for sid, info in self._sessions.items() if now - info["last_active"] > self.idle_timeout]
+            for session_id in idle:
+                self._evict(session_id)
+                self.metrics["evicted_idle"] += 1
+            return len(idle)
+
+    def start_sweeper(self, interval: float = 60.0) -> None:
+        """Sweep idle sessions periodically from a daemon thread, so eviction does not wait for traffic."""
+        if self._sweeper is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep()
+                except Exception:
+                    logger.exception("Session sweep failed")
+
+        self._sweeper = threading.Thread(target=loop, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stats(self) -> Dict:
+        """Current resident/spilled session counts and memory footprint."""
+        with self._lock:
+            return {
+                "resident_sessions": len(self._sessions),
+                "spilled_sessions": len(self._spilled),
+                "resident_bytes": sum(info["bytes"] for info in self._sessions.values()),
+                **self.metrics,
+            }
+
+    def _measure(self, session_id: str) -> int:
+        info = self._sessions[session_id]
+        state = info["state"]
+        info["bytes"] = sum(deep_sizeof(state[key]) for key in self.measured_keys if key in state)
+        return info["bytes"]
+
+    def _enforce_total(self, keep: str) -> None:
+        total = sum(info["bytes"] for info in self._sessions.values())
+        by_age = sorted(
+            (sid for sid in self._sessions if sid != keep),
+            key=lambda sid: self._sessions[sid]["last_active"]
+        )
+        for session_id in by_age:
+            if total <= self.max_total_bytes:
+                break
+            total -= self._sessions[session_id]["bytes"]
+            self._evict(session_id)
+            self.metrics["evicted_memory"] += 1
+
+    def _evict(self, session_id: str) -> None:
+        info = self._sessions.pop(session_id)
+        state = info["state"]
+        if self.spill_dir:
+            snapshot = {key: state[key] for key in self.spill_keys if key in state}
+            try:
+                with open(self._spill_path(session_id), "wb") as f:
+                    pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+                self._spilled.add(session_id)
+                self.metrics["spilled"] += 1
+            except (OSError, pickle.PicklingError, TypeError, AttributeError):
+                logger.exception("Could not spill session %s; dropping its state", session_id)
+        for key in self.tracked_keys:
+            if key not in state:
+                continue
+            if hasattr(state[key], "shutdown"):
+                state[key].shutdown()
+            del state[key]
+        logger.info("Evicted session %s (%d bytes)", session_id, info["bytes"])
+
+    def _restore(self, session_id: str, state: MutableMapping) -> None:
+        path = self._spill_path(session_id)
+        self._spilled.discard(session_id)
+        try:
+            with open(path, "rb") as f:
+                for key, value in pickle.load(f).items():
+                    state[key] = value
+            os.remove(path)
+            self.metrics["restored"] += 1
+        except (OSError, pickle.UnpicklingError, EOFError):
+            logger.exception("Could not restore spilled session %s", session_id)
+
+    def _spill_path(self, session_id: str) -> str:
+        return os.path.join(self.spill_dir, f"session_{session_id}.pkl")
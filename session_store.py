@@ -0,0 +1,248 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, MutableMapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Session-state entries that make up a consultation and must survive a move to another worker.
+# `profile_inputs` travels with `patient_data` so a fresh worker does not overwrite the restored
+# profile with the form's defaults. Spooled uploads are left out: their files live in a
+# host-local directory that another worker cannot open.
+SESSION_KEYS = (
+    "history", "patient_data", "consultation_summary", "profile_inputs", "report_versions", "report_changes",
+    "last_assessment",
+)
+SWEEP_INTERVAL = 60.0  # seconds between expiry sweeps of the in-process store
+SAVE_ATTEMPTS = 3  # conditional writes tried before a save gives up on a contended consultation
+
+
+def _value_hash(value) -> bytes:
+    return hashlib.blake2b(json.dumps(value, sort_keys=True, default=str).encode("utf-8"), digest_size=16).digest()
+
+
+def payload_version(payload: Optional[str]) -> int:
+    """Version stored in a payload; 0 when there is none (or it predates versioning)."""
+    if payload is None:
+        return 0
+    return json.loads(payload).get("version", 0)
+
+
+def _decode(payload: str) -> tuple:
+    data = json.loads(payload)
+    if "version" not in data:  # written before payloads were versioned
+        return 0, data
+    return data["version"], data["values"]
+
+
+class SessionStore(ABC):
+    """Where a consultation's state lives between script runs, keyed by a consultation id.
+
+    Subclasses implement `_get`, a conditional `_put` and `delete` over serialised payloads.
+    `restore` and `save` copy SESSION_KEYS between the store and `st.session_state`. Each payload
+    carries a version; `save` writes only if the stored version is still the one this process
+    loaded, so two overlapping reruns (on one or several workers) cannot silently overwrite each
+    other. On a conflict, keys this run left unchanged take the stored values and the write is
+    retried. `save` skips the write when nothing changed (tracked by per-key hashes, not a second
+    copy of the payload).
+    """
+
+    def __init__(self, synced_capacity: int = 4096):
+        self._lock = threading.Lock()
+        self._synced: "OrderedDict[str, tuple]" = OrderedDict()
+        self._synced_capacity = synced_capacity
+        self.metrics = {
+            "loads": 0, "saves": 0, "skipped_saves": 0, "conflicts": 0, "bytes_saved": 0, "store_ms": 0.0
+        }
+
+    @abstractmethod
+    def _get(self, consultation_id: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def _put(self, consultation_id: str, payload: str, expected_version: int) -> bool:
+        """Store `payload` only if the stored version is `expected_version` (0: nothing stored)."""
+
+    @abstractmethod
+    def delete(self, consultation_id: str) -> None:
+        ...
+
+    def _remember(self, consultation_id: str, version: int, values: Dict) -> None:
+        hashes = {key: _value_hash(value) for key, value in values.items()}
+        with self._lock:
+            self._synced[consultation_id] = (version, hashes)
+            self._synced.move_to_end(consultation_id)
+            while len(self._synced) > self._synced_capacity:
+                self._synced.popitem(last=False)
+
+    def synced(self, consultation_id: str) -> tuple:
+        """The version and per-key hashes this process last loaded or saved, as a base for `save`.
+
+        Capture it right after `restore` when several runs of a consultation may overlap in this
+        process, so each run's save is checked against what that run loaded.
+        """
+        with self._lock:
+            return self._synced.get(consultation_id, (0, {}))
+
+    def restore(self, consultation_id: str, state: MutableMapping) -> bool:
+        """Load a stored consultation into `state`; False when the store has none."""
+        start = time.perf_counter()
+        payload = self._get(consultation_id)
+        self.metrics["loads"] += 1
+        self.metrics["store_ms"] += (time.perf_counter() - start) * 1000
+        if payload is None:
+            return False
+        version, values = _decode(payload)
+        for key, value in values.items():
+            state[key] = value
+        self._remember(consultation_id, version, values)
+        return True
+
+    def save(self, consultation_id: str, state: MutableMapping, base: Optional[tuple] = None) -> bool:
+        """Write the consultation's SESSION_KEYS back to the store if they changed since `base`
+        (by default, since this process last loaded or saved it)."""
+        values = {key: state[key] for key in SESSION_KEYS if key in state}
+        base_version, base_hashes = base if base is not None else self.synced(consultation_id)
+        changed = {key for key, value in values.items() if base_hashes.get(key) != _value_hash(value)}
+        changed |= set(base_hashes) - set(values)
+        if not changed:
+            self.metrics["skipped_saves"] += 1
+            return False
+
+        start = time.perf_counter()
+        expected = base_version
+        for _ in range(SAVE_ATTEMPTS):
+            payload = json.dumps({"version": expected + 1, "values": values}, sort_keys=True, default=str)
+            if self._put(consultation_id, payload, expected):
+                break
+            # Another run saved first: keep what this run changed, take everything else from the store.
+            self.metrics["conflicts"] += 1
+            stored = self._get(consultation_id)
+            expected, stored_values = _decode(stored) if stored is not None else (0, {})
+            for key, value in stored_values.items():
+                if key not in changed:
+                    values[key] = value
+                    state[key] = value
+        else:
+            logger.warning("Could not save consultation %s: %d concurrent updates", consultation_id, SAVE_ATTEMPTS)
+            return False
+        self.metrics["saves"] += 1
+        self.metrics["bytes_saved"] += len(payload)
+        self.metrics["store_ms"] += (time.perf_counter() - start) * 1000
+        self._remember(consultation_id, expected + 1, values)
+        return True
+
+    def stats(self) -> Dict:
+        calls = self.metrics["loads"] + self.metrics["saves"]
+        return {
+            "backend": type(self).__name__,
+            **self.metrics,
+            "avg_store_ms": self.metrics["store_ms"] / calls if calls else 0.0,
+        }
+
+
+class InProcessSessionStore(SessionStore):
+    """Default backend: consultations live in this process, as with plain `st.session_state`.
+
+    Stored as serialised payloads so that a restored session never shares mutable objects
+    with the session that saved it. Expired entries are dropped on access and by a sweep that
+    runs at most every `sweep_interval` seconds, so abandoned consultations do not accumulate.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, sweep_interval: float = SWEEP_INTERVAL):
+        super().__init__()
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.time() + sweep_interval
+        self._payloads: Dict[str, tuple] = {}  # consultation id -> (payload, version, expires_at)
+        self.metrics["expired"] = 0
+
+    def _sweep(self) -> None:
+        """Drop every expired consultation once per interval; call with the lock held."""
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval
+        expired = [key for key, (_, _, expires_at) in self._payloads.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self._payloads[key]
+            self._synced.pop(key, None)
+        self.metrics["expired"] += len(expired)
+
+    def _entry(self, consultation_id: str) -> Optional[tuple]:
+        entry = self._payloads.get(consultation_id)
+        if entry is not None and entry[2] is not None and entry[2] <= time.time():
+            del self._payloads[consultation_id]
+            return None
+        return entry
+
+    def _get(self, consultation_id: str) -> Optional[str]:
+        with self._lock:
+            self._sweep()
+            entry = self._entry(consultation_id)
+            return entry[0] if entry is not None else None
+
+    def _put(self, consultation_id: str, payload: str, expected_version: int) -> bool:
+        with self._lock:
+            self._sweep()
+            entry = self._entry(consultation_id)
+            if (entry[1] if entry is not None else 0) != expected_version:
+                return False
+            self._payloads[consultation_id] = (
+                payload, expected_version + 1, time.time() + self.ttl if self.ttl else None
+            )
+            return True
+
+    def delete(self, consultation_id: str) -> None:
+        with self._lock:
+            self._payloads.pop(consultation_id, None)
+            self._synced.pop(consultation_id, None)
+
+
+class RedisSessionStore(SessionStore):
+    """Networked backend: consultations in Redis (or anything speaking its protocol), shared by all workers.
+
+    Pass `url` (e.g. redis://host:6379/0) or a ready `client`, such as a fakeredis instance or
+    one connected to a local stand-in server. Entries expire `ttl` seconds after the last save.
+    Conditional writes use WATCH/MULTI/EXEC.
+    """
+
+    def __init__(self, url: Optional[str] = None, client=None, ttl: Optional[float] = None,
+                 prefix: str = "doctordemma:session:"):
+        super().__init__()
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url, socket_timeout=2, health_check_interval=30)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _get(self, consultation_id: str) -> Optional[str]:
+        payload = self.client.get(self.prefix + consultation_id)
+        return payload.decode("utf-8") if isinstance(payload, bytes) else payload
+
+    def _put(self, consultation_id: str, payload: str, expected_version: int) -> bool:
+        from redis.exceptions import WatchError
+
+        key = self.prefix + consultation_id
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                stored = pipe.get(key)
+                if payload_version(stored.decode("utf-8") if isinstance(stored, bytes) else stored) != expected_version:
+                    return False
+                pipe.multi()
+                pipe.set(key, payload, ex=int(self.ttl) if self.ttl else None)
+                pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    def delete(self, consultation_id: str) -> None:
+        self.client.delete(self.prefix + consultation_id)
+        with self._lock:
+            self._synced.pop(consultation_id, None)
@@ -0,0 +1,314 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+_MISSING = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at) WHERE expires_at IS NOT NULL;
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM entries;
+CREATE TABLE IF NOT EXISTS leases (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    namespace TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    computes INTEGER NOT NULL DEFAULT 0,
+    waits INTEGER NOT NULL DEFAULT 0,
+    evictions INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+STAT_COLUMNS = ("hits", "misses", "computes", "waits", "evictions")
+# Longest a caller waits on another worker's lease before computing the value itself. Kept well
+# below the lease timeout: the waiting thread is often a Streamlit script thread.
+MAX_WAIT = 10.0
+
+
+class WaitCancelled(Exception):
+    """Raised by `get_or_compute` when its cancel check fires while waiting on another worker."""
+# Hit/miss counters and last-access times are buffered per process and written at most this often.
+FLUSH_INTERVAL = 5.0
+
+
+class SharedCache:
+    """A size-bounded key/value cache in a SQLite file shared by every worker process on a host.
+
+    Entries are grouped by namespace (e.g. "report_text", "summary") and pickled. `get_or_compute`
+    takes a short-lived lease on a missing key so that only one worker computes it while the
+    others wait for the result, for at most `max_wait` seconds before computing it themselves. When the total size exceeds `max_bytes`, the least recently
+    used entries are evicted. Hit, miss, compute, wait and eviction counters are kept per
+    namespace in the same file, so `stats()` reports across all workers.
+
+    Reads take no write lock: hits, misses and access times are buffered in the process and
+    written in one transaction every `flush_interval` seconds, so LRU order and counters from
+    other workers can lag by that much. The total size is kept in a one-row table, updated
+    with each write, instead of being summed on every write.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        lease_timeout: float = 120.0,
+        poll_interval: float = 0.1,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_wait: float = MAX_WAIT,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lease_timeout = lease_timeout
+        self.max_wait = min(max_wait, lease_timeout)
+        self.poll_interval = poll_interval
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._pending_lock = threading.Lock()
+        self._pending_counts: Dict[tuple, int] = {}
+        self._pending_access: Dict[tuple, float] = {}
+        self._next_flush = time.time() + flush_interval
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Run a block as one write transaction, taking the database lock up front."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _count(self, conn: sqlite3.Connection, namespace: str, column: str, amount: int = 1) -> None:
+        conn.execute(
+            f"INSERT INTO stats (namespace, {column}) VALUES (?, ?) "
+            f"ON CONFLICT(namespace) DO UPDATE SET {column} = {column} + excluded.{column}",
+            (namespace, amount),
+        )
+
+    def _adjust_total(self, conn: sqlite3.Connection, delta: int) -> None:
+        if delta:
+            conn.execute("UPDATE totals SET bytes = bytes + ? WHERE id = 0", (delta,))
+
+    def _drop_expired(self, conn: sqlite3.Connection, now: float) -> None:
+        expired = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        ).fetchone()[0]
+        if expired:
+            conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            self._adjust_total(conn, -expired)
+
+    def _lookup(self, conn: sqlite3.Connection, namespace: str, key: str) -> Any:
+        row = conn.execute(
+            "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return _MISSING
+        return pickle.loads(row[0])
+
+    def _record(self, namespace: str, key: str, hit: bool) -> None:
+        """Buffer a lookup's counter and access time; flush the buffer once per interval."""
+        now = time.time()
+        with self._pending_lock:
+            counter = (namespace, "hits" if hit else "misses")
+            self._pending_counts[counter] = self._pending_counts.get(counter, 0) + 1
+            if hit:
+                self._pending_access[(namespace, key)] = now
+            due = now >= self._next_flush
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered counters and last-access times in one transaction."""
+        with self._pending_lock:
+            counts, self._pending_counts = self._pending_counts, {}
+            access, self._pending_access = self._pending_access, {}
+            self._next_flush = time.time() + self.flush_interval
+        if not counts and not access:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE entries SET last_access = MAX(last_access, ?) WHERE namespace = ? AND key = ?",
+                [(when, namespace, key) for (namespace, key), when in access.items()],
+            )
+            for (namespace, column), amount in counts.items():
+                self._count(conn, namespace, column, amount)
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        value = self._lookup(self._connection(), namespace, key)
+        self._record(namespace, key, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._transaction() as conn:
+            self._drop_expired(conn, now)  # expired entries may hold PHI: do not leave them on disk
+            previous = conn.execute(
+                "SELECT size FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, blob, len(blob), now + ttl if ttl else None, now),
+            )
+            self._adjust_total(conn, len(blob) - (previous[0] if previous else 0))
+            total = conn.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+        if total > self.max_bytes:
+            self._evict()
+
+    def get_or_compute(
+        self,
+        namespace: str,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: Optional[float] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> Any:
+        """Return the cached value, computing it at most once across workers when it is missing.
+
+        If another worker holds the lease on `key`, wait for its result; if the lease expires
+        (the worker died) take it over, and after `max_wait` seconds compute here without it.
+        `cancelled()` is checked on every poll; once it returns True, WaitCancelled is raised.
+        """
+        value = self._lookup(self._connection(), namespace, key)
+        if value is not _MISSING:
+            self._record(namespace, key, True)
+            return value
+        owner = uuid.uuid4().hex
+        waited = False
+        deadline = time.time() + self.max_wait
+        while True:
+            with self._transaction() as conn:
+                value = self._lookup(conn, namespace, key)
+                if value is not _MISSING:
+                    self._count(conn, namespace, "hits")
+                    return value
+                now = time.time()
+                lease = conn.execute(
+                    "SELECT expires_at FROM leases WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+                if lease is None or lease[0] <= now:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO leases (namespace, key, owner, expires_at) VALUES (?, ?, ?, ?)",
+                        (namespace, key, owner, now + self.lease_timeout),
+                    )
+                    self._count(conn, namespace, "misses")
+                    break
+                if not waited:
+                    self._count(conn, namespace, "waits")
+                    waited = True
+                if now >= deadline:
+                    # The lease holder is slow: compute a copy here rather than block the caller.
+                    self._count(conn, namespace, "misses")
+                    owner = None
+                    break
+            if cancelled is not None and cancelled():
+                raise WaitCancelled(f"{namespace}/{key}")
+            time.sleep(self.poll_interval)
+
+        try:
+            value = compute()
+            self.set(namespace, key, value, ttl)
+            with self._transaction() as conn:
+                self._count(conn, namespace, "computes")
+            return value
+        finally:
+            if owner is not None:
+                with self._transaction() as conn:
+                    conn.execute(
+                        "DELETE FROM leases WHERE namespace = ? AND key = ? AND owner = ?", (namespace, key, owner)
+                    )
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT size FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                self._adjust_total(conn, -row[0])
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones until the cache is back under max_bytes."""
+        self.flush()  # so this process's recent hits count towards LRU order
+        with self._transaction() as conn:
+            self._drop_expired(conn, time.time())
+            total = conn.execute("SELECT bytes FROM totals WHERE id = 0").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            evicted: Dict[str, int] = {}
+            target = self.max_bytes * 0.9
+            for namespace, key, size in conn.execute(
+                "SELECT namespace, key, size FROM entries ORDER BY last_access"
+            ).fetchall():
+                if total <= target:
+                    break
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                total -= size
+                self._adjust_total(conn, -size)
+                evicted[namespace] = evicted.get(namespace, 0) + 1
+            for namespace, count in evicted.items():
+                self._count(conn, namespace, "evictions", count)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-namespace entry count, bytes, hit rate and counters, aggregated over all workers."""
+        self.flush()
+        conn = self._connection()
+        sizes = {
+            namespace: (entries, size)
+            for namespace, entries, size in conn.execute(
+                "SELECT namespace, COUNT(*), SUM(size) FROM entries GROUP BY namespace"
+            )
+        }
+        counters = {row[0]: dict(zip(STAT_COLUMNS, row[1:])) for row in conn.execute(
+            f"SELECT namespace, {', '.join(STAT_COLUMNS)} FROM stats"
+        )}
+        result = {}
+        for namespace in sorted(set(sizes) | set(counters)):
+            entries, size = sizes.get(namespace, (0, 0))
+            counts = counters.get(namespace, dict.fromkeys(STAT_COLUMNS, 0))
+            lookups = counts["hits"] + counts["misses"]
+            result[namespace] = {
+                "entries": entries,
+                "bytes": size,
+                "hit_rate": counts["hits"] / lookups if lookups else 0.0,
+                **counts,
+            }
+        return result
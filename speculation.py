@@ -0,0 +1,114 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from hedging import StreamWatcher
+from profiling import profiled_task
+
+
+def summary_key(history: str, patient_data: Dict) -> str:
+    """Fingerprint the inputs a consultation summary depends on."""
+    payload = json.dumps({"history": history, "patient_data": patient_data}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SpeculativeSummary:
+    """Pre-generate the consultation summary in a worker thread after each turn.
+
+    `generate(callbacks)` must pass `callbacks` to its LLM call: they include a StreamWatcher, so
+    discarding a stale speculation aborts its stream mid-generation instead of letting it finish.
+    """
+
+    def __init__(self, max_workers: int = 1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summary-speculation")
+        self._lock = threading.Lock()
+        self._key: Optional[str] = None
+        self._future: Optional[Future] = None
+        self._watcher: Optional[StreamWatcher] = None
+        self._consumed = False
+        self.metrics = {
+            "started": 0,
+            "hits": 0,
+            "misses": 0,
+            "cancelled": 0,
+            "wasted": 0,
+            "failed": 0,
+        }
+
+    def start(self, key: str, generate: Callable[[List], str]) -> None:
+        """Start generating the summary for `key`, replacing any stale speculation."""
+        with self._lock:
+            if self._key == key and self._future is not None:
+                return
+            self._discard()
+            watcher = StreamWatcher()
+            self._key = key
+            self._watcher = watcher
+            self._consumed = False
+            self._future = self._executor.submit(profiled_task(self._run), generate, watcher)
+            self.metrics["started"] += 1
+
+    def get(self, key: str, generate: Callable[[], str], timeout: Optional[float] = None) -> str:
+        """Return the speculative summary for `key`, or generate it now on a miss."""
+        with self._lock:
+            future = self._future if self._key == key else None
+            if future is not None:
+                self._consumed = True
+        if future is not None:
+            try:
+                result = future.result(timeout=timeout)
+            except Exception:
+                result = None
+            if result is not None:
+                with self._lock:
+                    self.metrics["hits"] += 1
+                return result
+        with self._lock:
+            self.metrics["misses"] += 1
+        return generate()
+
+    def cancel(self) -> None:
+        """Abandon the current speculation, if any."""
+        with self._lock:
+            self._discard()
+
+    def shutdown(self) -> None:
+        """Cancel pending work and release the worker thread."""
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return self.metrics["hits"] / lookups if lookups else 0.0
+
+    def _run(self, generate: Callable[[List], str], watcher: StreamWatcher) -> Optional[str]:
+        if watcher.cancelled.is_set():
+            return None
+        watcher.start()
+        try:
+            with watcher.watching():
+                result = generate([watcher])
+        except Exception:
+            if not watcher.cancelled.is_set():
+                with self._lock:
+                    self.metrics["failed"] += 1
+            raise
+        return None if watcher.cancelled.is_set() else result
+
+    def _discard(self) -> None:
+        # Caller holds self._lock.
+        if self._future is None:
+            return
+        if self._future.cancel():
+            self.metrics["cancelled"] += 1
+        elif not self._consumed:
+            # The LLM call already ran (or is running): abort its stream; tokens so far are wasted.
+            self._watcher.cancel()
+            self.metrics["wasted"] += 1
+        self._key = None
+        self._future = None
+        self._watcher = None
+        self._consumed = False
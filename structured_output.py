@@ -0,0 +1,199 @@
+import json
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Closing line of every rendered assessment, whichever way it was generated.
+DISCLAIMER = "This is an AI-generated preliminary assessment and does not replace review by a clinician."
+
+SEVERITY_LEVELS = ("Low", "Medium", "High")
+
+SEVERITY_SYNONYMS = {
+    "low": "Low", "mild": "Low", "minor": "Low",
+    "medium": "Medium", "moderate": "Medium", "intermediate": "Medium",
+    "high": "High", "severe": "High", "critical": "High", "urgent": "High", "emergency": "High",
+}
+
+LIKELIHOOD_WORDS = {"very high": 0.9, "high": 0.75, "moderate": 0.5, "medium": 0.5, "low": 0.25, "very low": 0.1}
+
+# Instruction appended to the diagnosis prompt in structured mode.
+ASSESSMENT_SCHEMA_PROMPT = """Respond with a single JSON object and nothing else, using exactly this schema:
+{"diagnoses": [{"name": string, "likelihood": number between 0 and 1}],
+ "severity": "Low" | "Medium" | "High",
+ "next_steps": [string],
+ "red_flags": [string]}
+List diagnoses from most to least likely. Keep every string short."""
+
+
+def _close_partial(text: str) -> List[str]:
+    """Candidate completions of a truncated JSON document, most complete first."""
+    stack = []
+    in_string = escape = False
+    cut_points = []  # (index to cut at, closers needed at that point)
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            cut_points.append((i + 1, "".join(reversed(stack))))
+        elif char in "}]":
+            if stack:
+                stack.pop()
+        elif char == ",":
+            cut_points.append((i, "".join(reversed(stack))))
+    closers = "".join(reversed(stack))
+    candidates = [text + ('"' if in_string else "") + closers]
+    candidates.extend(text[:index] + cut_closers for index, cut_closers in reversed(cut_points[-3:]))
+    return candidates
+
+
+def parse_partial_json(text: str) -> Optional[Dict]:
+    """Parse a possibly truncated JSON object, closing open strings and brackets."""
+    start = text.find("{")
+    if start < 0:
+        return None
+    for candidate in _close_partial(text[start:].rstrip()):
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+def repair_json(text: str) -> Optional[Dict]:
+    """Best-effort recovery of a JSON object from model output (code fences, trailing commas, truncation)."""
+    text = re.sub(r"^```(?:json)?|```$", "", text.strip(), flags=re.MULTILINE).strip()
+    start, end = text.find("{"), text.rfind("}")
+    if start >= 0 and end > start:
+        candidate = re.sub(r",\s*([}\]])", r"\1", text[start:end + 1])
+        try:
+            value = json.loads(candidate)
+            if isinstance(value, dict):
+                return value
+        except json.JSONDecodeError:
+            pass
+    return parse_partial_json(text)
+
+
+def _string_list(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = [line.strip(" -•*\t") for line in value.splitlines()]
+    if not isinstance(value, list):
+        value = [value]
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def _likelihood(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        number = float(value)
+    elif isinstance(value, str):
+        text = value.strip().lower()
+        if text in LIKELIHOOD_WORDS:
+            return LIKELIHOOD_WORDS[text]
+        match = re.match(r"(\d+(?:\.\d+)?)\s*(%)?", text)
+        if not match:
+            return None
+        number = float(match.group(1)) / (100 if match.group(2) else 1)
+    else:
+        return None
+    if number > 1:
+        number /= 100
+    return round(min(max(number, 0.0), 1.0), 3)
+
+
+def validate_assessment(data: Optional[Dict]) -> Tuple[Dict, List[str]]:
+    """Coerce a parsed assessment onto the schema, returning it with a list of repairs made."""
+    data = data if isinstance(data, dict) else {}
+    errors = []
+
+    diagnoses = []
+    raw_diagnoses = data.get("diagnoses", [])
+    if not isinstance(raw_diagnoses, list):
+        raw_diagnoses = [raw_diagnoses]
+        errors.append("diagnoses was not a list")
+    for item in raw_diagnoses:
+        if isinstance(item, str):
+            item = {"name": item}
+            errors.append("diagnosis given as a bare string")
+        if not isinstance(item, dict) or not str(item.get("name", "")).strip():
+            errors.append("dropped a diagnosis without a name")
+            continue
+        likelihood = _likelihood(item.get("likelihood"))
+        if likelihood is None:
+            errors.append(f"missing likelihood for {item['name']}")
+        diagnoses.append({"name": str(item["name"]).strip(), "likelihood": likelihood})
+    diagnoses.sort(key=lambda d: -(d["likelihood"] or 0))
+
+    raw_severity = str(data.get("severity", "")).strip()
+    severity = SEVERITY_SYNONYMS.get(raw_severity.lower())
+    if severity is None:
+        errors.append(f"unrecognised severity {raw_severity!r}")
+    elif severity != raw_severity:
+        errors.append(f"severity {raw_severity!r} normalised to {severity}")
+
+    assessment = {
+        "diagnoses": diagnoses,
+        "severity": severity,
+        "next_steps": _string_list(data.get("next_steps")),
+        "red_flags": _string_list(data.get("red_flags")),
+    }
+    return assessment, errors
+
+
+def parse_assessment(text: str) -> Tuple[Dict, List[str]]:
+    """Parse, repair and validate a complete structured assessment."""
+    return validate_assessment(repair_json(text))
+
+
+def render_assessment(assessment: Dict) -> str:
+    """Render a structured assessment as readable text for the conversation history."""
+    diagnoses = "\n".join(
+        f"- {d['name']}" + (f" ({d['likelihood']:.0%})" if d["likelihood"] is not None else "")
+        for d in assessment["diagnoses"]
+    ) or "- None stated"
+    next_steps = "\n".join(f"- {step}" for step in assessment["next_steps"]) or "- None stated"
+    red_flags = "\n".join(f"- {flag}" for flag in assessment["red_flags"]) or "- None stated"
+    return (
+        f"1. Potential diagnoses\n{diagnoses}\n\n"
+        f"2. Severity assessment: {assessment['severity'] or 'Not stated'}\n\n"
+        f"3. Recommended next steps\n{next_steps}\n\n"
+        f"4. Red flags to watch for\n{red_flags}\n\n"
+        f"{DISCLAIMER}"
+    )
+
+
+class IncrementalJSONHandler(BaseCallbackHandler):
+    """Accumulate streamed tokens per LLM run and report the partially parsed object as it grows."""
+
+    def __init__(self, on_partial: Callable[[Dict], None], min_chars: int = 16):
+        self.on_partial = on_partial
+        self.min_chars = min_chars
+        self._lock = threading.Lock()
+        self._buffers: Dict = {}
+        self._parsed_at: Dict = {}
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        run_id = kwargs.get("run_id")
+        with self._lock:
+            buffer = self._buffers[run_id] = self._buffers.get(run_id, "") + token
+            # Re-parse only after enough new text or at a structural boundary.
+            if len(buffer) - self._parsed_at.get(run_id, 0) < self.min_chars and not token.strip().endswith(("}", "]", '",')):
+                return
+            self._parsed_at[run_id] = len(buffer)
+        partial = parse_partial_json(buffer)
+        if partial:
+            self.on_partial(partial)
@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pytest
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import HumanMessage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cassette import Cassette, CassetteMiss, RecordingChatModel, ReplayChatModel  # noqa: E402
+
+MODEL = "llama-3.2-1b-preview"
+
+
+class Tokens(BaseCallbackHandler):
+    def __init__(self):
+        self.tokens = []
+
+    def on_llm_new_token(self, token, **kwargs):
+        self.tokens.append(token)
+
+
+def _record(path, prompt, response):
+    recorder = RecordingChatModel(inner=FakeListChatModel(responses=[response]), cassette=Cassette(path), model_name=MODEL)
+    recorder.invoke([HumanMessage(content=prompt)])
+
+
+def test_replay_serves_the_recorded_response(tmp_path):
+    path = str(tmp_path / "session.jsonl.gz")
+    _record(path, "What is the dose?", "Take 500 mg twice daily.")
+    _record(path, "Any interactions?", "None known.")  # appended by a second writer
+    cassette = Cassette(path)
+    assert len(cassette) == 2
+    tokens = Tokens()
+    replay = ReplayChatModel(cassette=cassette, model_name=MODEL, latency="zero")
+    message = replay.invoke([HumanMessage(content="What is the dose?")], config={"callbacks": [tokens]})
+    assert message.content == "Take 500 mg twice daily."
+    assert "".join(tokens.tokens) == message.content
+    assert cassette.metrics["hits"] == 1
+
+
+def test_strict_replay_raises_on_a_miss(tmp_path):
+    path = str(tmp_path / "session.jsonl.gz")
+    _record(path, "What is the dose?", "Take 500 mg twice daily.")
+    cassette = Cassette(path)
+    replay = ReplayChatModel(cassette=cassette, model_name=MODEL, latency="zero")
+    with pytest.raises(CassetteMiss):
+        replay.invoke([HumanMessage(content="A prompt never recorded")])
+    assert cassette.metrics["misses"] == 1
+
+
+def test_lenient_replay_stands_in_a_recording_of_the_same_model(tmp_path):
+    path = str(tmp_path / "session.jsonl.gz")
+    _record(path, "What is the dose?", "Take 500 mg twice daily.")
+    cassette = Cassette(path)
+    replay = ReplayChatModel(cassette=cassette, model_name=MODEL, latency="zero", strict=False)
+    assert replay.invoke([HumanMessage(content="A prompt never recorded")]).content == "Take 500 mg twice daily."
+    assert cassette.metrics["near_hits"] == 1
@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("pyarrow.dataset", exc_type=ImportError)  # also skips a pyarrow built for another NumPy
+
+import pyarrow.dataset as ds  # noqa: E402
+
+import consultation_export  # noqa: E402
+from consultation_export import export  # noqa: E402
+
+
+def _save(directory, n):
+    """n consultations, alternating between March and April 2026."""
+    for i in range(n):
+        timestamp = f"20260{3 + i % 2}01_1200{i:02d}"
+        record = {
+            "timestamp": timestamp,
+            "patient_data": {"age": 60 + i, "vital_signs": {"temperature": 37.0}},
+            "consultation_summary": "Severity: Low",
+        }
+        with open(os.path.join(directory, f"consultation_{timestamp}.json"), "w") as f:
+            json.dump(record, f)
+
+
+def _rows(dest):
+    return ds.dataset(dest, partitioning="hive").count_rows()
+
+
+def test_months_are_zero_padded(tmp_path):
+    _save(tmp_path, 2)
+    dest = tmp_path / "export"
+    assert export(str(tmp_path), str(dest)) == 2
+    assert sorted(os.listdir(dest / "year=2026")) == ["month=03", "month=04"]
+
+
+def test_interrupted_batch_is_not_exported_twice(tmp_path, monkeypatch):
+    _save(tmp_path, 4)
+    dest = str(tmp_path / "export")
+
+    write_table, calls = consultation_export.pq.write_table, []
+
+    def crash_on_second_part(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise KeyboardInterrupt  # the batch's first month is written, the manifest is not
+        return write_table(*args, **kwargs)
+
+    monkeypatch.setattr(consultation_export.pq, "write_table", crash_on_second_part)
+    with pytest.raises(KeyboardInterrupt):
+        export(str(tmp_path), dest, batch_size=4)
+    monkeypatch.undo()
+    export(str(tmp_path), dest, batch_size=4)
+    assert _rows(dest) == 4
+    assert export(str(tmp_path), dest, batch_size=4) == 0
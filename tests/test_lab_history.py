@@ -0,0 +1,29 @@
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lab_history import LabHistoryStore  # noqa: E402
+
+
+def _record(directory, day):
+    LabHistoryStore(directory).record_report("MRN 1001", f"Collected: 2026-03-{day:02d}\nHemoglobin 12.{day} g/dL", f"r{day}")
+
+
+def test_undated_report_is_not_filed_under_today(tmp_path):
+    store = LabHistoryStore(str(tmp_path))
+    store.record_report("MRN 1001", "Collected: 2026-03-01\nHemoglobin 12.1 g/dL", "r1")
+    history = store.record_report("MRN 1001", "Hemoglobin 9.0 g/dL", "undated")
+    assert history.reports == {"r1"}
+    assert [str(day) for day in store.load("MRN 1001").dates] == ["2026-03-01"]
+
+
+def test_concurrent_processes_keep_every_report(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_record, args=(str(tmp_path), day)) for day in range(1, 9)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert LabHistoryStore(str(tmp_path)).load("MRN 1001").reports == {f"r{day}" for day in range(1, 9)}
@@ -0,0 +1,41 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lab_parsing import parse_lab_values  # noqa: E402
+from triage import VITAL_COLUMNS, assess  # noqa: E402
+
+
+def test_unitless_values_outside_plausible_range_dropped():
+    assert parse_lab_values("Glucose 95") == {}
+    assert parse_lab_values("Platelets 2.5") == {}
+
+
+def test_reference_range_and_regional_units():
+    assert abs(parse_lab_values("Glucose Fasting 95 70-100 mg/dL")["glucose"] - 95 / 18.016) < 0.01
+    assert parse_lab_values("Platelet Count 2.5 lakhs/cumm")["platelets"] == 250
+
+
+def test_short_aliases_need_word_boundary_and_unit():
+    assert parse_lab_values("Vitamin K: 5 ng/mL") == {}
+    assert parse_lab_values("Hb 7") == {}
+    assert parse_lab_values("K+ 6.8 mmol/L")["potassium"] == 6.8
+
+
+def test_comparator_readings_taken_at_bound():
+    assert parse_lab_values("Troponin I: <0.01 ng/mL")["troponin"] == 10
+
+
+def test_lab_flags_do_not_make_a_vital_emergency():
+    triage = assess({"heart_rate": 80}, {"potassium": 7.0})
+    assert triage["emergency"] and not triage["vital_emergency"]
+
+
+def test_news2_scores_consciousness_and_oxygen():
+    vitals = {"respiratory_rate": 18, "oxygen_saturation": 97, "blood_pressure": "120/80", "heart_rate": 80,
+              "temperature": 37.0, "consciousness": "New confusion", "supplemental_oxygen": True}
+    triage = assess(vitals)
+    assert triage["news2"] == 5
+    assert not triage["news2_partial"] and triage["news2_recorded"] == len(VITAL_COLUMNS)
+    assert assess({"heart_rate": 80})["news2_partial"]
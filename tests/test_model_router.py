@@ -0,0 +1,27 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_router import DEFAULT_ROUTES, ModelRouter, load_routes  # noqa: E402
+
+
+def test_routes_file_overrides_slos(tmp_path):
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps({"summary": {"slo_ms": 9000}}))
+    routes = load_routes(str(path))
+    assert routes["summary"]["slo_ms"] == 9000
+    assert routes["summary"]["max_tokens"] == DEFAULT_ROUTES["summary"]["max_tokens"]
+    assert DEFAULT_ROUTES["summary"]["slo_ms"] == 6000
+
+
+def test_truncated_completion_raises_the_budget():
+    router = ModelRouter(load_routes(None))
+    decision = router.route("summary", 100)
+    router.record(decision, 100.0, decision["max_tokens"], truncated=True)
+    retry = router.retry_decision(decision)
+    assert retry["max_tokens"] == 2 * decision["max_tokens"]
+    router.record(retry, 100.0, decision["max_tokens"] + 300)
+    assert router.route("summary", 100)["max_tokens"] == retry["max_tokens"]
+    assert router.stats()["summary:small"]["truncations"] == 1
@@ -0,0 +1,44 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.prompts import PromptTemplate  # noqa: E402
+
+from preflight import TRUNCATION_MARKER, count_tokens, preflight, truncate_patient_data  # noqa: E402
+
+PROMPT = PromptTemplate(
+    input_variables=["similar_cases", "lab_report", "patient_data"],
+    template="Similar: {similar_cases}\nLabs: {lab_report}\nPatient: {patient_data}",
+)
+PATIENT = {
+    "age": 70,
+    "notes": "lives alone, " * 200,
+    "medical_history": [f"condition {i}" for i in range(40)],
+    "current_medications": [f"drug {i} 10 mg" for i in range(40)],
+    "allergies": ["penicillin", "sulfa"],
+}
+
+
+def test_patient_data_never_loses_safety_fields():
+    truncated = truncate_patient_data(PATIENT, 50)
+    assert truncated["notes"].endswith(TRUNCATION_MARKER) or truncated["notes"] == TRUNCATION_MARKER
+    for key in ("medical_history", "current_medications", "allergies"):
+        assert truncated[key] == PATIENT[key]
+
+
+def test_sections_are_cut_in_priority_order():
+    inputs = {"similar_cases": "past case " * 400, "lab_report": "Hb 9.1 g/dL " * 400, "patient_data": PATIENT}
+    total = count_tokens(PROMPT.format(**inputs))
+    # Room for everything but part of similar_cases: only that section is cut.
+    fitted, breakdown = preflight("test", PROMPT, inputs, "unknown-model", 8192 - total + 200, budgets={})
+    assert breakdown["fits"]
+    assert breakdown["truncated"] == ["similar_cases"]
+    assert fitted["lab_report"] == inputs["lab_report"]
+
+    # Room for hardly anything: similar_cases and lab_report go before the patient profile.
+    fitted, breakdown = preflight("test", PROMPT, inputs, "unknown-model", 8192 - 500, budgets={})
+    assert fitted["similar_cases"] == TRUNCATION_MARKER
+    assert fitted["lab_report"].endswith(TRUNCATION_MARKER)
+    assert fitted["patient_data"]["allergies"] == PATIENT["allergies"]
+    assert fitted["patient_data"]["current_medications"] == PATIENT["current_medications"]
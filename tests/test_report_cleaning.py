@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lab_parsing import parse_lab_values  # noqa: E402
+from report_cleaning import clean_pages, is_page_marker  # noqa: E402
+
+HEADER = "ACME Diagnostics Laboratory, 12 High Street, Tel 555-1234"
+DISCLAIMER = "Results must be interpreted by a qualified physician."
+
+
+def test_single_line_value_kept_in_one_page_report():
+    text, stats = clean_pages(["Platelet Count\n250\n10^9/L"])
+    assert "250" in text.splitlines()
+    assert stats["boilerplate_lines"] == 0
+    assert parse_lab_values(text)["platelets"] == 250
+
+
+def test_single_line_values_kept_across_pages():
+    pages = [
+        f"{HEADER}\nSodium\n140\nmmol/L\n{DISCLAIMER}\nPage 1 of 2",
+        f"{HEADER}\nGlucose\n95\nmg/dL\n{DISCLAIMER}\nPage 2 of 2",
+    ]
+    text, _ = clean_pages(pages)
+    lines = text.splitlines()
+    assert "140" in lines and "95" in lines
+    values = parse_lab_values(text)
+    assert values["sodium"] == 140
+    assert abs(values["glucose"] - 95 / 18.016) < 0.01
+
+
+def test_repeated_short_value_and_unit_lines_kept():
+    pages = [f"{HEADER}\nUrine protein\nNegative\nmg/dL\nPlatelet Count\n25{n}" for n in range(3)]
+    text, _ = clean_pages(pages)
+    assert text.count(HEADER) == 1
+    assert text.count("Negative") == 3
+    assert text.count("mg/dL") == 3
+    assert text.count("Platelet Count") == 3
+
+
+def test_page_markers_stripped_only_at_page_edges():
+    pages = [f"Page {n} of 2\nHemoglobin\n1{n}.9\ng/dL\n{n}/2" for n in (1, 2)]
+    text, _ = clean_pages(pages)
+    assert "Page 1 of 2" not in text and "1/2" not in text
+    assert "11.9" in text and "12.9" in text
+
+
+def test_page_marker_rules():
+    assert is_page_marker("Page 3")
+    assert is_page_marker("page 2 of 5")
+    assert is_page_marker("2/5")
+    assert not is_page_marker("250")
+    assert not is_page_marker("120/80")
+    assert not is_page_marker("Page 6 of 5")
@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_ingest import ingest_reports  # noqa: E402
+
+LETTERHEAD = "letterhead"
+
+
+def _report(collected, pages, patient="MRN: 1001"):
+    lines = [patient, f"Collected: {collected}"] + [f"{page} result line" for page in pages]
+    return {"text": "\n".join(lines), "fingerprints": list(pages)}
+
+
+def _ingest(*reports):
+    files = [(f"report{n}.pdf", f"sha{n}", report) for n, report in enumerate(reports)]
+    return ingest_reports(files, lambda report: dict(report))
+
+
+def test_shared_template_page_is_not_a_revision():
+    first = _report("2026-03-01", [LETTERHEAD, "cbc-march"])
+    second = _report("2026-04-01", [LETTERHEAD, "cbc-april"])
+    result = _ingest(first, second)
+    assert [d["name"] for d in result["documents"]] == ["report0.pdf", "report1.pdf"]
+    assert not any(d.get("supersedes") for d in result["documents"])
+
+
+def test_same_pages_on_different_dates_never_supersede():
+    pages = [LETTERHEAD, "ranges", "a", "b", "c"]
+    first = _report("2026-03-01", pages)
+    second = _report("2026-03-08", pages[:-1] + ["c2"])
+    assert len(_ingest(first, second)["documents"]) == 2
+
+
+def test_different_patients_never_supersede():
+    pages = [LETTERHEAD, "ranges", "a", "b", "c"]
+    first = _report("2026-03-01", pages, patient="MRN: 1001")
+    second = _report("2026-03-01", pages[:-1] + ["c2"], patient="MRN: 2002")
+    assert len(_ingest(first, second)["documents"]) == 2
+
+
+def test_same_date_revision_supersedes_earlier_upload():
+    pages = [LETTERHEAD, "ranges", "a", "b", "c"]
+    first = _report("2026-03-01", pages)
+    revised = _report("2026-03-01", pages[:-1] + ["c-corrected"])
+    result = _ingest(first, revised)
+    assert [d["name"] for d in result["documents"]] == ["report1.pdf"]
+    assert result["documents"][0]["supersedes"]["name"] == "report0.pdf"
+    assert result["skipped"][0]["status"] == "superseded"
+
+
+def test_identical_text_on_the_same_date_is_dropped():
+    first = {"text": "MRN: 1001\nCollected: 2026-03-01\nHb 12.1 g/dL"}
+    second = {"text": "mrn: 1001\n\nCollected:  2026-03-01\nHb 12.1   g/dL\n"}
+    result = _ingest(first, second)
+    assert [d["name"] for d in result["documents"]] == ["report0.pdf"]
+    assert result["skipped"][0]["status"] == "overlap"
+
+
+def test_serial_reports_sharing_most_lines_are_kept():
+    panel = [f"Test {n}: normal" for n in range(20)]
+    first = {"text": "\n".join(["MRN: 1001", "Collected: 2026-03-01"] + panel + ["Hb 12.1 g/dL"])}
+    second = {"text": "\n".join(["MRN: 1001", "Collected: 2026-03-08"] + panel + ["Hb 10.4 g/dL"])}
+    assert len(_ingest(first, second)["documents"]) == 2
@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import SESSION_KEYS, InProcessSessionStore  # noqa: E402
+
+
+def test_unchanged_state_is_not_rewritten():
+    store = InProcessSessionStore()
+    state = {"history": "User: hi\nBot: hello"}
+    assert store.save("c1", state)
+    assert not store.save("c1", state)
+    assert store.stats()["skipped_saves"] == 1
+
+
+def test_overlapping_runs_keep_each_others_changes():
+    store = InProcessSessionStore()
+    store.save("c1", {"history": "turn 1", "consultation_summary": None})
+    first, second = {}, {}
+    store.restore("c1", first)
+    first_base = store.synced("c1")
+    store.restore("c1", second)
+    second_base = store.synced("c1")
+    first["history"] = "turn 1\n\nturn 2"
+    second["consultation_summary"] = "summary"
+    assert store.save("c1", first, first_base)
+    assert store.save("c1", second, second_base)  # stale version: merged instead of overwriting
+    restored = {}
+    store.restore("c1", restored)
+    assert restored["history"] == "turn 1\n\nturn 2"
+    assert restored["consultation_summary"] == "summary"
+    assert store.stats()["conflicts"] == 1
+
+
+def test_expired_sessions_are_swept():
+    store = InProcessSessionStore(ttl=0.01, sweep_interval=0.01)
+    store.save("old", {"history": "x"})
+    time.sleep(0.02)
+    store.save("new", {"history": "y"})
+    assert store.stats()["expired"] == 1
+    assert not store.restore("old", {})
+
+
+def test_spooled_uploads_are_not_persisted():
+    assert "spooled_reports" not in SESSION_KEYS
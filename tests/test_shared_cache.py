@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_cache import SharedCache, WaitCancelled  # noqa: E402
+
+
+def _hold_lease(cache, namespace, key, seconds):
+    """Simulate another worker computing `key`."""
+    with cache._transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO leases (namespace, key, owner, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, "other-worker", time.time() + seconds),
+        )
+
+
+def test_expired_entries_are_missing_and_purged(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite"))
+    cache.set("report", "a", "text", ttl=0.05)
+    assert cache.get("report", "a") == "text"
+    time.sleep(0.06)
+    assert cache.get("report", "a") is None
+    cache.set("report", "b", "other")
+    rows = cache._connection().execute("SELECT key FROM entries").fetchall()
+    assert rows == [("b",)]
+
+
+def test_waiter_gets_the_lease_holders_result(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    holder, waiter = SharedCache(path), SharedCache(path, poll_interval=0.01)
+    started, calls = threading.Event(), []
+
+    def slow():
+        started.set()
+        time.sleep(0.2)
+        calls.append("holder")
+        return "summary"
+
+    thread = threading.Thread(target=lambda: holder.get_or_compute("summary", "k", slow))
+    thread.start()
+    started.wait(5)
+    assert waiter.get_or_compute("summary", "k", lambda: calls.append("waiter") or "mine") == "summary"
+    thread.join()
+    assert calls == ["holder"]
+    assert waiter.stats()["summary"]["waits"] == 1
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite"), poll_interval=0.01)
+    _hold_lease(cache, "summary", "k", 0.05)
+    assert cache.get_or_compute("summary", "k", lambda: "computed here") == "computed here"
+    assert cache.get("summary", "k") == "computed here"
+
+
+def test_wait_is_capped_below_the_lease_timeout(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite"), poll_interval=0.01, max_wait=0.1)
+    _hold_lease(cache, "summary", "k", 60)
+    start = time.time()
+    assert cache.get_or_compute("summary", "k", lambda: "local copy") == "local copy"
+    assert time.time() - start < 1
+    lease = cache._connection().execute("SELECT owner FROM leases WHERE key = 'k'").fetchone()
+    assert lease == ("other-worker",)  # the holder's lease is left alone
+
+
+def test_cancelled_wait_raises(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite"), poll_interval=0.01)
+    _hold_lease(cache, "summary", "k", 60)
+    cancel = threading.Event()
+    threading.Timer(0.05, cancel.set).start()
+    with pytest.raises(WaitCancelled):
+        cache.get_or_compute("summary", "k", lambda: "unused", cancelled=cancel.is_set)
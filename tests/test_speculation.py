@@ -0,0 +1,66 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("groq")
+
+from hedging import GenerationCancelled  # noqa: E402
+from speculation import SpeculativeSummary, summary_key  # noqa: E402
+
+
+def _streaming(text, release=None):
+    """A generate(callbacks) that streams `text` word by word, optionally waiting for `release` first."""
+    def generate(callbacks):
+        if release is not None:
+            release.wait(5)
+        for word in text.split():
+            for callback in callbacks:
+                callback.on_llm_new_token(word)
+        return text
+    return generate
+
+
+def test_hit_returns_the_speculated_summary():
+    speculator = SpeculativeSummary()
+    key = summary_key("User: cough\nBot: how long?", {"age": 40})
+    speculator.start(key, _streaming("speculated summary"))
+    assert speculator.get(key, lambda: "generated now", timeout=5) == "speculated summary"
+    assert speculator.metrics["hits"] == 1 and speculator.metrics["misses"] == 0
+    speculator.shutdown()
+
+
+def test_stale_inputs_generate_afresh():
+    speculator = SpeculativeSummary()
+    speculator.start(summary_key("turn 1", {}), _streaming("old summary"))
+    assert speculator.get(summary_key("turn 1\nturn 2", {}), lambda: "fresh summary") == "fresh summary"
+    assert speculator.metrics["misses"] == 1
+    speculator.shutdown()
+
+
+def test_discarded_speculation_aborts_its_stream():
+    speculator = SpeculativeSummary()
+    started, release, finished = threading.Event(), threading.Event(), threading.Event()
+    outcome = []
+
+    def generate(callbacks):
+        started.set()
+        try:
+            return _streaming("never " * 50, release)(callbacks)
+        except GenerationCancelled:
+            outcome.append("cancelled")
+            raise
+        finally:
+            finished.set()
+
+    speculator.start("first", generate)
+    assert started.wait(5)
+    speculator.start("second", _streaming("second summary"))  # new turn: the first is stale
+    release.set()
+    assert finished.wait(5)
+    assert outcome == ["cancelled"]
+    assert speculator.metrics["wasted"] == 1 and speculator.metrics["failed"] == 0
+    speculator.shutdown()
@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from structured_output import DISCLAIMER, parse_assessment, parse_partial_json, render_assessment, repair_json  # noqa: E402
+
+
+def test_truncated_stream_closes_open_strings_and_brackets():
+    partial = parse_partial_json('{"diagnoses": [{"name": "Pneumonia", "likelihood": 0.6}, {"name": "Bronch')
+    assert partial["diagnoses"][0] == {"name": "Pneumonia", "likelihood": 0.6}
+    assert partial["diagnoses"][1]["name"] == "Bronch"
+
+
+def test_truncated_stream_drops_a_dangling_key():
+    partial = parse_partial_json('{"severity": "High", "next_steps": ["Chest X-ray"], "red_fl')
+    assert partial == {"severity": "High", "next_steps": ["Chest X-ray"]}
+
+
+def test_no_object_yet():
+    assert parse_partial_json("Sure, here is") is None
+
+
+def test_code_fences_and_trailing_commas_are_repaired():
+    text = '```json\n{"severity": "high", "red_flags": ["SpO2 < 90",],}\n```'
+    assert repair_json(text) == {"severity": "high", "red_flags": ["SpO2 < 90"]}
+
+
+def test_parse_assessment_reports_its_repairs():
+    assessment, repairs = parse_assessment('{"diagnoses": ["Asthma", {"name": "COPD", "likelihood": "40%"}], '
+                                           '"severity": "moderate", "next_steps": "- Spirometry\\n- Review"}')
+    assert [d["name"] for d in assessment["diagnoses"]] == ["COPD", "Asthma"]
+    assert assessment["diagnoses"][0]["likelihood"] == 0.4
+    assert assessment["severity"] == "Medium"
+    assert assessment["next_steps"] == ["Spirometry", "Review"]
+    assert "diagnosis given as a bare string" in repairs
+    assert render_assessment(assessment).endswith(DISCLAIMER)
@@ -0,0 +1,322 @@
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Column order for vital-sign matrices (one row per patient).
+VITAL_COLUMNS = (
+    "respiratory_rate",
+    "oxygen_saturation",
+    "blood_pressure_systolic",
+    "heart_rate",
+    "temperature",
+    "consciousness",
+    "supplemental_oxygen",
+)
+
+# Levels of the ACVPU scale; anything but "Alert" (new confusion, voice, pain, unresponsive) scores.
+CONSCIOUSNESS_LEVELS = ("Alert", "New confusion", "Voice", "Pain", "Unresponsive")
+
+# NEWS2 bands per column: np.digitize edges and the score of each resulting band (SpO2 scale 1).
+NEWS2_BANDS = {
+    "respiratory_rate": ([9, 12, 21, 25], [3, 1, 0, 2, 3]),
+    "oxygen_saturation": ([92, 94, 96], [3, 2, 1, 0]),
+    "blood_pressure_systolic": ([91, 101, 111, 220], [3, 2, 1, 0, 3]),
+    "heart_rate": ([41, 51, 91, 111, 131], [3, 1, 0, 1, 2, 3]),
+    "temperature": ([35.05, 36.05, 38.05, 39.05], [3, 1, 0, 1, 2]),
+    "consciousness": ([0.5], [0, 3]),          # 0 alert, 1 confused/V/P/U
+    "supplemental_oxygen": ([0.5], [0, 2]),    # 0 room air, 1 on oxygen
+}
+
+# Red-flag thresholds: (low, high) outside of which a finding is critical.
+VITAL_RED_FLAGS = {
+    "respiratory_rate": (8, 30),
+    "oxygen_saturation": (90, None),
+    "blood_pressure_systolic": (90, 220),
+    "heart_rate": (40, 130),
+    "temperature": (35.0, 40.0),
+}
+
+LAB_RED_FLAGS = {
+    "potassium": (2.5, 6.0),         # mmol/L
+    "sodium": (120, 160),            # mmol/L
+    "glucose": (3.0, 30.0),          # mmol/L
+    "hemoglobin": (7.0, None),       # g/dL
+    "lactate": (None, 4.0),          # mmol/L
+    "troponin": (None, 52.0),        # ng/L
+    "platelets": (20, None),         # 10^9/L
+    "inr": (None, 5.0),
+}
+
+SYMPTOM_RED_FLAGS = (
+    "chest pain",
+    "crushing",
+    "can't breathe",
+    "cannot breathe",
+    "unconscious",
+    "unresponsive",
+    "seizure",
+    "slurred speech",
+    "facial droop",
+    "vomiting blood",
+    "suicidal",
+)
+
+# Plausible input ranges used to validate vital signs (inclusive).
+VITAL_RANGES = {
+    "temperature": (35.0, 42.0),  # °C
+    "heart_rate": (40, 200),      # bpm
+    "blood_pressure_systolic": (70, 200),  # mmHg
+    "blood_pressure_diastolic": (40, 130), # mmHg
+    "oxygen_saturation": (70, 100),        # %
+    "respiratory_rate": (8, 40)            # breaths per minute
+}
+
+# Aggregate NEWS2 score at or above which the case is treated as an emergency.
+NEWS2_EMERGENCY_THRESHOLD = 7
+
+_EDGES = [np.asarray(NEWS2_BANDS[column][0], dtype=float) for column in VITAL_COLUMNS]
+_SCORES = [np.asarray(NEWS2_BANDS[column][1], dtype=np.int8) for column in VITAL_COLUMNS]
+
+
+def parse_blood_pressure(value) -> tuple[float, float]:
+    """Split a "120/80" blood-pressure string into (systolic, diastolic)."""
+    try:
+        systolic, diastolic = str(value).split("/", 1)
+        return float(systolic), float(diastolic)
+    except (TypeError, ValueError):
+        return np.nan, np.nan
+
+
+def split_blood_pressure(values) -> tuple[np.ndarray, np.ndarray]:
+    """Vectorized split of an array of "120/80" strings into systolic and diastolic float arrays."""
+    raw = np.asarray(values)
+    if raw.dtype.kind not in "SU":
+        raw = raw.astype(str)
+    n = len(raw)
+    systolic = np.full(n, np.nan)
+    diastolic = np.full(n, np.nan)
+    if n == 0 or raw.dtype.itemsize == 0:
+        return systolic, diastolic
+
+    # Parse plain "digits/digits" entries straight from the character codes.
+    code_type = np.uint8 if raw.dtype.kind == "S" else np.uint32
+    chars = raw.view(code_type).reshape(n, -1)
+    chars = chars[:, :max(int(chars.any(axis=0).nonzero()[0].max(initial=0)) + 1, 1)].astype(np.int16)
+    digits = chars - ord("0")
+    is_digit = (digits >= 0) & (digits <= 9)
+    is_slash = chars == ord("/")
+    is_used = chars != 0
+    length = is_used.sum(axis=1)
+    slash_at = np.argmax(is_slash, axis=1)
+    simple = (
+        (is_slash.sum(axis=1) == 1)
+        & ((is_digit | is_slash) == is_used).all(axis=1)
+        & (slash_at > 0)
+        & (slash_at < length - 1)
+    )
+    powers = 10.0 ** np.arange(chars.shape[1])
+    position = np.arange(chars.shape[1])
+    sys_exponent = slash_at[:, None] - 1 - position
+    dia_exponent = length[:, None] - 1 - position
+    digits = np.where(is_digit, digits, 0)
+    systolic[simple] = np.where(sys_exponent >= 0, digits * powers[sys_exponent.clip(0)], 0).sum(axis=1)[simple]
+    diastolic[simple] = np.where(
+        (sys_exponent < -1) & (dia_exponent >= 0), digits * powers[dia_exponent.clip(0)], 0
+    ).sum(axis=1)[simple]
+
+    # Anything else ("120 / 80", decimals, blanks) goes through the scalar parser.
+    for i in np.flatnonzero(~simple):
+        value = raw[i].decode("utf-8", "replace") if raw.dtype.kind == "S" else raw[i]
+        systolic[i], diastolic[i] = parse_blood_pressure(value)
+    return systolic, diastolic
+
+
+def vital_number(key: str, value) -> float:
+    """One vital-sign reading as a number; ACVPU and oxygen entries map to 0/1, missing to NaN."""
+    if value is None or value == "":
+        return np.nan
+    if key == "consciousness":
+        return 0.0 if str(value).strip().lower() == "alert" else 1.0
+    if key == "supplemental_oxygen":
+        if isinstance(value, str):
+            return 0.0 if value.strip().lower() in ("no", "false", "room air", "air") else 1.0
+        return float(bool(value))
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def normalize_vitals(vitals: Dict) -> Dict[str, float]:
+    """Expand the sidebar vital-sign dict into numeric, per-column readings."""
+    normalized = {}
+    for key, value in vitals.items():
+        if key == "blood_pressure":
+            systolic, diastolic = parse_blood_pressure(value)
+            normalized["blood_pressure_systolic"] = systolic
+            normalized["blood_pressure_diastolic"] = diastolic
+        else:
+            normalized[key] = vital_number(key, value)
+    return normalized
+
+
+def vitals_matrix(vitals_list: List[Dict]) -> np.ndarray:
+    """Stack vital-sign dicts into an (n_patients, len(VITAL_COLUMNS)) float matrix, NaN when missing."""
+    matrix = np.full((len(vitals_list), len(VITAL_COLUMNS)), np.nan)
+    for row, vitals in enumerate(vitals_list):
+        normalized = normalize_vitals(vitals)
+        for col, column in enumerate(VITAL_COLUMNS):
+            matrix[row, col] = normalized.get(column, np.nan)
+    return matrix
+
+
+def vitals_columns(records: List[Dict]) -> Dict[str, np.ndarray]:
+    """Convert per-patient vital-sign dicts into columnar arrays, splitting blood-pressure strings."""
+    keys = set(VITAL_RANGES)
+    for record in records:
+        keys.update(record)
+    columns = {}
+    for key in keys:
+        raw = [record.get(key) for record in records]
+        if key == "blood_pressure":
+            present = [value if value is not None else "" for value in raw]
+            columns["blood_pressure_systolic"], columns["blood_pressure_diastolic"] = split_blood_pressure(present)
+        elif key not in columns:
+            columns[key] = np.array([vital_number(key, value) for value in raw], dtype=float)
+    return columns
+
+
+def validate_vital_signs_batch(vitals, ranges: Optional[Dict] = None) -> Dict:
+    """Range-check a whole cohort at once.
+
+    `vitals` is either a list of per-patient dicts (as built by the sidebar) or a mapping of
+    vital name to equal-length arrays; a "blood_pressure" column of "120/80" strings is split
+    automatically. Returns per-patient, per-vital boolean masks in the order of `columns`.
+    """
+    ranges = ranges or VITAL_RANGES
+    if isinstance(vitals, dict):
+        columns = {key: np.asarray(value) for key, value in vitals.items()}
+        if "blood_pressure" in columns:
+            columns["blood_pressure_systolic"], columns["blood_pressure_diastolic"] = split_blood_pressure(
+                columns.pop("blood_pressure")
+            )
+    else:
+        columns = vitals_columns(vitals)
+
+    names = tuple(ranges)
+    n_patients = len(next(iter(columns.values()))) if columns else 0
+    values = np.full((n_patients, len(names)), np.nan)
+    for col, name in enumerate(names):
+        if name in columns:
+            values[:, col] = columns[name].astype(float)
+
+    low = np.array([ranges[name][0] for name in names], dtype=float)
+    high = np.array([ranges[name][1] for name in names], dtype=float)
+    missing = np.isnan(values)
+    with np.errstate(invalid="ignore"):
+        violations = ((values < low) | (values > high)) & ~missing
+    return {
+        "columns": names,
+        "values": values,
+        "violations": violations,
+        "missing": missing,
+        "valid": ~violations.any(axis=1),
+    }
+
+
+def news2_components(matrix: np.ndarray) -> np.ndarray:
+    """Score every vital of every patient against the NEWS2 bands; missing readings score 0."""
+    matrix = np.atleast_2d(matrix)
+    components = np.zeros(matrix.shape, dtype=np.int8)
+    for col in range(len(VITAL_COLUMNS)):
+        values = matrix[:, col]
+        present = ~np.isnan(values)
+        components[present, col] = _SCORES[col][np.digitize(values[present], _EDGES[col])]
+    return components
+
+
+def news2_risk(total: int, max_component: int) -> str:
+    """Map an aggregate NEWS2 score to its clinical risk band."""
+    if total >= 7:
+        return "high"
+    if total >= 5:
+        return "medium"
+    if max_component >= 3:
+        return "low-medium"
+    return "low"
+
+
+def _outside(value: float, low: Optional[float], high: Optional[float]) -> Optional[str]:
+    if low is not None and value < low:
+        return "low"
+    if high is not None and value > high:
+        return "high"
+    return None
+
+
+def assess(vitals: Dict, lab_values: Optional[Dict[str, float]] = None, symptoms: str = "") -> Dict:
+    """Compute NEWS2 and red-flag alerts for one patient without calling the LLM.
+
+    Parameters that were not recorded score 0, so the NEWS2 total is a lower bound whenever
+    `news2_partial` is set. `vital_emergency` covers NEWS2 and critical vitals only; `emergency`
+    also includes critical lab values.
+    """
+    start = time.perf_counter()
+    matrix = vitals_matrix([vitals])
+    components = news2_components(matrix)[0]
+    total = int(components.sum())
+    recorded = int((~np.isnan(matrix[0])).sum())
+    red_flags = []
+
+    for col, column in enumerate(VITAL_COLUMNS):
+        value = matrix[0, col]
+        if np.isnan(value) or column not in VITAL_RED_FLAGS:
+            continue
+        direction = _outside(value, *VITAL_RED_FLAGS[column])
+        if direction:
+            red_flags.append(f"{column.replace('_', ' ')} critically {direction} ({value:g})")
+    vital_critical = bool(red_flags)
+
+    for analyte, value in (lab_values or {}).items():
+        if analyte in LAB_RED_FLAGS:
+            direction = _outside(value, *LAB_RED_FLAGS[analyte])
+            if direction:
+                red_flags.append(f"{analyte} critically {direction} ({value:g})")
+
+    # Symptom keywords raise alerts but are too coarse to skip the LLM on their own.
+    critical = bool(red_flags)
+    symptoms_lower = (symptoms or "").lower()
+    red_flags.extend(f"reported {phrase}" for phrase in SYMPTOM_RED_FLAGS if phrase in symptoms_lower)
+
+    risk = news2_risk(total, int(components.max(initial=0)))
+    vital_emergency = total >= NEWS2_EMERGENCY_THRESHOLD or vital_critical
+    return {
+        "news2": total,
+        "news2_components": dict(zip(VITAL_COLUMNS, components.tolist())),
+        "news2_recorded": recorded,
+        "news2_partial": recorded < len(VITAL_COLUMNS),
+        "risk": risk,
+        "red_flags": red_flags,
+        "vital_emergency": vital_emergency,
+        "emergency": vital_emergency or critical,
+        "elapsed_us": (time.perf_counter() - start) * 1e6,
+    }
+
+
+def _partial_note(triage: Dict) -> str:
+    if not triage.get("news2_partial"):
+        return ""
+    return f" (partial: {triage['news2_recorded']}/{len(VITAL_COLUMNS)} parameters recorded)"
+
+
+def emergency_assessment(triage: Dict) -> str:
+    """Render a rule-based assessment used in place of the LLM for emergency cases."""
+    flags = "\n".join(f"- {flag}" for flag in triage["red_flags"]) or "- None beyond the NEWS2 score"
+    return (
+        "⚠️ EMERGENCY — rule-based triage (AI assessment skipped)\n\n"
+        f"NEWS2 score: {triage['news2']}{_partial_note(triage)} ({triage['risk']} clinical risk)\n\n"
+        f"Red flags:\n{flags}\n\n"
+        "Recommended next steps: escalate immediately for urgent clinical review or emergency care. "
+        "This automated triage is not a diagnosis."
+    )
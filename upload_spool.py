@@ -0,0 +1,75 @@
+import gc
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import BinaryIO, Dict
+
+SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "doctordemma_uploads"))
+SPOOL_TTL = float(os.getenv("UPLOAD_SPOOL_TTL", str(24 * 3600)))  # seconds a spilled upload is kept
+CHUNK_SIZE = 1024 * 1024
+
+
+def spill(fileobj: BinaryIO, directory: str = SPOOL_DIR) -> Dict:
+    """Copy an upload to the spool in fixed-size chunks, hashing it on the way.
+
+    Files are named by content hash, so the same report uploaded twice (by any session) is
+    stored once. Returns the spilled file's `path`, `sha256` and `size`.
+    """
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    partial = os.path.join(directory, f".{uuid.uuid4().hex}.part")
+    fileobj.seek(0)
+    with open(partial, "wb") as f:
+        while True:
+            chunk = fileobj.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+    sha256 = digest.hexdigest()
+    path = os.path.join(directory, f"{sha256}.pdf")
+    if os.path.exists(path):
+        os.remove(partial)
+        os.utime(path)
+    else:
+        os.replace(partial, path)
+    return {"path": path, "sha256": sha256, "size": size}
+
+
+@contextmanager
+def open_mapped(path: str):
+    """Read-only memory map of a spilled file; pages are loaded by the OS only as the parser touches them.
+
+    PdfReader's object graph is cyclic (pages link back to their parents), so the streams it read
+    are freed only by the cycle collector; collecting on exit keeps per-upload memory from
+    accumulating until the next automatic collection.
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+            gc.collect()
+
+
+def purge(directory: str = SPOOL_DIR, max_age: float = SPOOL_TTL) -> int:
+    """Delete spilled uploads not used for `max_age` seconds; returns how many were removed."""
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    return removed